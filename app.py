@@ -14,18 +14,11 @@ if missing_secrets:
     st.stop()
 
 # --- 2. IMPORT MODULI ---
-# Force reload for debugging (safe to keep for now)
-import importlib
-import engine.core
-importlib.reload(engine.core)
-
-from services.api import StravaService
-from services.db import DatabaseService
+from services.registry import get_registry
 from ui.style import apply_custom_style
 
-# Views
+# Views (la dashboard, con pandas/altair, si importa solo dopo il login)
 from views.landing import render_landing
-from views.dashboard import render_dashboard
 
 # --- 3. PAGE SETUP ---
 st.set_page_config(
@@ -81,14 +74,12 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # --- 4. SERVIZI ---
-strava_creds = Config.get_strava_creds()
-supa_creds = Config.get_supabase_creds()
-auth_svc = StravaService(strava_creds["client_id"], strava_creds["client_secret"])
-db_svc = DatabaseService(supa_creds["url"], supa_creds["key"])
+# Creati una volta per processo (st.cache_resource), non a ogni rerun
+services = get_registry()
+auth_svc = services.strava
 
 # --- 5. STATE ---
 if "strava_token" not in st.session_state: st.session_state.strava_token = None
-if "data" not in st.session_state: st.session_state.data = db_svc.get_history()
 if "demo_mode" not in st.session_state: st.session_state.demo_mode = False
 
 # Callback Strava
@@ -106,4 +97,5 @@ if "code" in st.query_params and not st.session_state.strava_token:
 if not st.session_state.strava_token:
     render_landing(auth_svc)
 else:
-    render_dashboard(auth_svc, db_svc)
+    from views.dashboard import render_dashboard
+    render_dashboard(auth_svc, services.db)
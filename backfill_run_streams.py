@@ -0,0 +1,43 @@
+"""
+Backfill degli stream da runs.raw_data alla tabella run_streams (migrations/v4_4_run_streams.sql).
+
+Uso:
+    python backfill_run_streams.py [--batch 50] [--pause 0.5] [--after ID]
+
+Scorre runs per id a lotti (keyset, niente OFFSET) e per ogni lotto:
+copia watts/hr in run_streams, poi riscrive raw_data lasciando solo i dettagli.
+Ogni scrittura è una transazione breve: l'app resta utilizzabile durante il backfill.
+Interrompibile e rilanciabile: le corse già migrate vengono saltate,
+--after riparte dall'ultimo id stampato.
+"""
+import time
+import argparse
+from config import Config
+from services.db import DatabaseService
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill runs.raw_data -> run_streams")
+    parser.add_argument("--batch", type=int, default=50, help="corse per lotto")
+    parser.add_argument("--pause", type=float, default=0.5, help="secondi di pausa tra i lotti")
+    parser.add_argument("--after", type=int, default=0, help="riparti dopo questo run id")
+    args = parser.parse_args()
+
+    logger = Config.setup_logging()
+    creds = Config.get_supabase_creds()
+    db = DatabaseService(creds["url"], creds["key"])
+
+    last_id, moved, batches = args.after, 0, 0
+    while True:
+        next_id, n = db.backfill_streams_batch(last_id, args.batch)
+        if next_id is None:
+            break
+        last_id, moved, batches = next_id, moved + n, batches + 1
+        logger.info(f"[BACKFILL] lotto {batches}: {n} corse migrate (ultimo id {last_id})")
+        time.sleep(args.pause)
+
+    logger.info(f"[BACKFILL] completato: {moved} corse migrate in {batches} lotti")
+
+
+if __name__ == "__main__":
+    main()
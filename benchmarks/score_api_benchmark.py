@@ -0,0 +1,199 @@
+"""
+Test di carico dell'API di scoring locale (score_api.py) su localhost.
+
+Uso (dalla root del repo):
+    python -m benchmarks.score_api_benchmark                    # 16 client, 2000 richieste per caso
+    python -m benchmarks.score_api_benchmark --clients 64 --requests 10000
+    python -m benchmarks.score_api_benchmark --streams --out results.jsonl
+
+Il server gira in un processo separato (come in produzione); i client sono
+thread con connessioni keep-alive che mandano summary di SyntheticAthlete.
+Casi: richieste singole senza micro-batching (--max-batch 1), richieste
+singole con micro-batching (default di Config) e endpoint /score/batch.
+Per ogni caso: richieste e corse al secondo, latenza p50/p95/p99 lato client
+e dimensione media dei micro-batch letta da /metrics.
+Ogni risultato è una riga JSON appesa al file di output.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import platform
+import threading
+import subprocess
+import http.client
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from config import Config
+from offline.fixtures import SyntheticAthlete
+
+DEFAULT_OUT = os.path.join("benchmarks", "results", "score_api_benchmark.jsonl")
+BATCH_SIZE = 64
+
+
+def _git_rev() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return "unknown"
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _records(n: int, streams: bool) -> List[Dict[str, Any]]:
+    ath = SyntheticAthlete(athlete_id=1, n_activities=n)
+    recs = []
+    for a in ath.activities:
+        rec = dict(a)
+        if streams:
+            rec["streams"] = ath.streams(a["id"]) or {}
+        recs.append(rec)
+    return recs
+
+
+def _request(conn: http.client.HTTPConnection, method: str, path: str, body: Optional[bytes] = None) -> Dict[str, Any]:
+    conn.request(method, path, body=body, headers={"Content-Type": "application/json"} if body else {})
+    resp = conn.getresponse()
+    data = resp.read()
+    if resp.status != 200:
+        raise RuntimeError(f"{path}: HTTP {resp.status} {data[:200]!r}")
+    return json.loads(data)
+
+
+class ServerProcess:
+    def __init__(self, *args: str):
+        self.port = _free_port()
+        self.proc = subprocess.Popen(
+            [sys.executable, "score_api.py", "--port", str(self.port), *args],
+            cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+
+    def __enter__(self):
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            try:
+                _request(http.client.HTTPConnection("127.0.0.1", self.port, timeout=1), "GET", "/healthz")
+                return self
+            except OSError:
+                time.sleep(0.1)
+        self.proc.kill()
+        raise RuntimeError("score_api.py did not start")
+
+    def __exit__(self, *exc):
+        self.proc.terminate()
+        self.proc.wait(timeout=10)
+
+    def metrics(self) -> Dict[str, Any]:
+        return _request(http.client.HTTPConnection("127.0.0.1", self.port, timeout=5), "GET", "/metrics")
+
+
+def run_load(port: int, bodies: List[bytes], path: str, clients: int) -> Dict[str, Any]:
+    """Manda tutti i body con 'clients' connessioni concorrenti. Latenze in ms."""
+    latencies: List[float] = []
+    errors: List[str] = []
+    lock = threading.Lock()
+    next_idx = iter(range(len(bodies)))
+
+    def client():
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        mine = []
+        for i in next_idx:   # iteratore condiviso: next() è atomico sotto il GIL
+            t0 = time.perf_counter()
+            try:
+                _request(conn, "POST", path, bodies[i])
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+                continue
+            mine.append((time.perf_counter() - t0) * 1000)
+        conn.close()
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+
+    latencies.sort()
+    pct = lambda q: round(latencies[min(int(q * len(latencies)), len(latencies) - 1)], 2) if latencies else 0
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "wall_s": round(wall, 3),
+        "req_per_s": round(len(latencies) / wall, 1) if wall > 0 else 0,
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99)
+    }
+
+
+def run_case(name: str, server_args: List[str], recs: List[Dict[str, Any]], n_requests: int, clients: int) -> Dict[str, Any]:
+    if name == "batch":
+        chunks = [recs[(i * BATCH_SIZE) % len(recs):][:BATCH_SIZE] for i in range(max(n_requests // BATCH_SIZE, 1))]
+        bodies = [json.dumps(c).encode("utf-8") for c in chunks]
+        path, runs_per_req = "/score/batch", sum(len(c) for c in chunks) / len(chunks)
+    else:
+        bodies = [json.dumps(recs[i % len(recs)]).encode("utf-8") for i in range(n_requests)]
+        path, runs_per_req = "/score", 1
+
+    with ServerProcess(*server_args) as server:
+        run_load(server.port, bodies[:clients * 4], path, clients)   # warm-up: import scipy, connessioni
+        res = run_load(server.port, bodies, path, clients)
+        m = server.metrics()
+    res["runs_per_s"] = round(res["req_per_s"] * runs_per_req, 1)
+    res["avg_batch_size"] = m["avg_batch_size"]
+    res["server_p95_ms"] = m["latency_ms"]["p95"]
+    return dict({"case": name, "clients": clients}, **res)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test dell'API di scoring locale")
+    parser.add_argument("--clients", type=int, default=16, help="connessioni concorrenti")
+    parser.add_argument("--requests", type=int, default=2000, help="richieste singole per caso")
+    parser.add_argument("--streams", action="store_true", help="includi gli stream 1 Hz nei record (drift calcolato dal server)")
+    parser.add_argument("--out", default=DEFAULT_OUT)
+    args = parser.parse_args()
+
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    meta = {
+        "ts": datetime.now().isoformat(timespec="seconds"),
+        "git": _git_rev(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "engine": Config.ENGINE_VERSION,
+        "streams": args.streams
+    }
+    recs = _records(200 if args.streams else 1000, args.streams)
+    cases = [
+        ("single (no batching)", ["--max-batch", "1", "--max-wait-ms", "0"]),
+        ("single (micro-batch)", []),
+        ("batch", []),
+    ]
+
+    print(f"{'case':<24}{'req/s':>9}{'runs/s':>9}{'p50':>8}{'p95':>8}{'p99':>8}{'batch':>7}{'err':>5}")
+    for name, server_args in cases:
+        row = dict(meta, **run_case(name, server_args, recs, args.requests, args.clients))
+        with open(args.out, "a", encoding="utf-8") as f:
+            f.write(json.dumps(row) + "\n")
+        print(f"{name:<24}{row['req_per_s']:>9}{row['runs_per_s']:>9}{row['p50_ms']:>8}{row['p95_ms']:>8}"
+              f"{row['p99_ms']:>8}{row['avg_batch_size']:>7}{row['errors']:>5}")
+    print(f"\nRisultati appesi a {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Benchmark del tempo di import (avvio a freddo) dei moduli di verify_imports.py.
+
+Uso (dalla root del repo):
+    python -m benchmarks.startup_benchmark                 # budget di default
+    python -m benchmarks.startup_benchmark --repeat 7 --scale 1.5
+    python -m benchmarks.startup_benchmark --out results.jsonl
+
+Ogni modulo è importato in un interprete nuovo (come un container appena
+partito): si misura il tempo dell'import e quali dipendenze pesanti finiscono
+in sys.modules. Fallisce (exit 1) se un modulo supera il budget in ms o carica
+una dipendenza che dovrebbe essere caricata solo dalla funzionalità che la usa
+(coach Gemini, grafici, percentili esatti, client Supabase).
+Ogni risultato è una riga JSON appesa al file di output.
+"""
+import os
+import sys
+import json
+import platform
+import argparse
+import statistics
+import subprocess
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from verify_imports import MODULES
+
+DEFAULT_OUT = os.path.join("benchmarks", "results", "startup_benchmark.jsonl")
+
+# Dipendenze da caricare solo al primo uso della funzionalità
+HEAVY = ("streamlit", "pandas", "altair", "scipy", "google.generativeai", "supabase")
+UI_LAZY = ("pandas", "altair", "scipy", "google.generativeai", "supabase")
+
+# Primo disegno: gli import che app.py fa prima della landing
+APP_LANDING = ("streamlit", "config", "services.registry", "ui.style", "views.landing", "services.api")
+
+# modulo -> (budget ms, dipendenze vietate)
+BUDGETS: Dict[str, Tuple[float, Tuple[str, ...]]] = {
+    "config": (50, HEAVY),
+    "engine.core": (300, HEAVY),
+    "services.api": (300, HEAVY),
+    "services.db": (150, HEAVY),
+    "controllers.sync_controller": (400, HEAVY),
+    "components.header": (600, UI_LAZY),
+    "components.athlete": (600, UI_LAZY),
+    "components.kpi": (600, UI_LAZY),
+    "views.landing": (600, UI_LAZY),
+    "views.dashboard": (1200, ("altair", "scipy", "google.generativeai", "supabase")),
+    "app (landing)": (800, UI_LAZY),
+}
+
+PROBE = """
+import sys, time, json
+t0 = time.perf_counter()
+for m in {modules!r}:
+    __import__(m)
+ms = (time.perf_counter() - t0) * 1000
+print(json.dumps({{"ms": ms, "loaded": [h for h in {heavy!r} if h in sys.modules]}}))
+"""
+
+
+def _git_rev() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return "unknown"
+
+
+def probe(modules: Tuple[str, ...]) -> Dict[str, Any]:
+    code = PROBE.format(modules=list(modules), heavy=list(HEAVY))
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def run_case(name: str, modules: Tuple[str, ...], repeat: int, scale: float) -> Dict[str, Any]:
+    probe(modules)  # warm-up: bytecode in __pycache__, cache del filesystem
+    runs = [probe(modules) for _ in range(repeat)]
+    budget, lazy = BUDGETS.get(name, (float("inf"), ()))
+    ms = statistics.median(r["ms"] for r in runs)
+    loaded = runs[-1]["loaded"]
+    eager = [h for h in lazy if h in loaded]
+    return {
+        "module": name,
+        "import_ms": round(ms, 1),
+        "min_ms": round(min(r["ms"] for r in runs), 1),
+        "budget_ms": budget * scale,
+        "loaded": loaded,
+        "eager": eager,
+        "ok": ms <= budget * scale and not eager
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark tempo di import a freddo")
+    parser.add_argument("--repeat", type=int, default=5, help="interpreti nuovi per modulo (mediana)")
+    parser.add_argument("--scale", type=float, default=1.0, help="moltiplicatore dei budget (macchine lente)")
+    parser.add_argument("--out", default=DEFAULT_OUT)
+    args = parser.parse_args()
+
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    meta = {
+        "ts": datetime.now().isoformat(timespec="seconds"),
+        "git": _git_rev(),
+        "python": platform.python_version()
+    }
+
+    cases: List[Tuple[str, Tuple[str, ...]]] = [(m, (m,)) for _, m, _ in MODULES]
+    cases.append(("app (landing)", APP_LANDING))
+
+    print(f"{'module':<30}{'ms':>9}{'budget':>9}  eager")
+    failed = []
+    for name, modules in cases:
+        row = dict(meta, **run_case(name, modules, args.repeat, args.scale))
+        with open(args.out, "a", encoding="utf-8") as f:
+            f.write(json.dumps(row) + "\n")
+        mark = "✅" if row["ok"] else "❌"
+        print(f"{name:<30}{row['import_ms']:>9}{row['budget_ms']:>9.0f}  {mark} {', '.join(row['eager'])}")
+        if not row["ok"]:
+            failed.append(name)
+
+    print(f"\nRisultati appesi a {args.out}")
+    if failed:
+        print(f"Fuori budget: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
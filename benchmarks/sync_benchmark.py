@@ -0,0 +1,153 @@
+"""
+Benchmark end-to-end della sync Strava sugli stand-in offline.
+
+Uso (dalla root del repo):
+    python -m benchmarks.sync_benchmark                   # 50, 500, 5000 attività
+    python -m benchmarks.sync_benchmark --sizes 50 500 --paths job
+    python -m benchmarks.sync_benchmark --out results.jsonl --no-memory
+    python -m benchmarks.sync_benchmark --storage sqlite  # DB embedded al posto dello stand-in
+
+Per ogni (path, dimensione) misura: tempo reale, corse scorate al secondo,
+richieste HTTP e chiamate DB per corsa, secondi di sleep (virtuali, non
+aspettati davvero) contro secondi di lavoro, picco di memoria Python.
+Ogni risultato è una riga JSON appesa al file di output.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+import platform
+import subprocess
+import tracemalloc
+from datetime import datetime
+from typing import Any, Dict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from engine.core import ScoreEngine
+from controllers.sync_controller import SyncController
+from services.strava_sync import safe_strava_sync
+from offline.fixtures import SyntheticAthlete
+from offline.stack import OfflineStack
+from services.sqlite_client import SQLiteClient
+
+DEFAULT_OUT = os.path.join("benchmarks", "results", "sync_benchmark.jsonl")
+PHYS = {"weight": 70.0, "hr_max": 185, "hr_rest": 50, "age": 30, "sex": "M"}
+
+
+def _git_rev() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return "unknown"
+
+
+def run_case(path: str, n_activities: int, measure_memory: bool = True, storage: str = "memory") -> Dict[str, Any]:
+    journal_dir = tempfile.mkdtemp(prefix="score_bench_")
+    client = SQLiteClient(os.path.join(journal_dir, "bench.sqlite")) if storage == "sqlite" else None
+    stack = OfflineStack(SyntheticAthlete(athlete_id=1, n_activities=n_activities), client=client)
+    # Journal del job nella dir temporanea del caso, solo per la durata del caso
+    real_journal_dir = Config.SYNC_JOURNAL_DIR
+    Config.SYNC_JOURNAL_DIR = journal_dir
+
+    if measure_memory:
+        tracemalloc.start()
+    t0 = time.perf_counter()
+    cpu0 = time.process_time()
+    try:
+        with stack.active():
+            if path == "job":
+                res = safe_strava_sync(
+                    stack.auth, stack.db, ScoreEngine(), stack.token, 1,
+                    PHYS["weight"], PHYS["hr_max"], PHYS["hr_rest"], PHYS["age"], PHYS["sex"],
+                    days_to_fetch=3650
+                )
+            else:
+                count, msg = SyncController(stack.auth, stack.db).run_sync(
+                    stack.token, 1, PHYS, 3650, existing_ids=[], history_scores=[]
+                )
+                res = {"new": count, "message": msg}
+    finally:
+        Config.SYNC_JOURNAL_DIR = real_journal_dir
+        wall = time.perf_counter() - t0
+        cpu = time.process_time() - cpu0
+        peak = tracemalloc.get_traced_memory()[1] if measure_memory else None
+        if measure_memory:
+            tracemalloc.stop()
+
+    runs = stack.client.table("runs").select("score,stream_status").execute().data
+    if client is not None:
+        client.close()
+    shutil.rmtree(journal_dir, ignore_errors=True)
+    scored = sum(1 for r in runs if (r.get("score") or 0) > 0)
+    with_streams = sum(1 for r in runs if r.get("stream_status") == "fetched")
+    per_run = max(len(runs), 1)
+    # Contatori di round trip solo sullo stand-in in memoria
+    db_calls = getattr(stack.client, "round_trips", None)
+
+    return {
+        "path": path,
+        "storage": storage,
+        "activities": n_activities,
+        "runs_written": len(runs),
+        "runs_scored": scored,
+        "runs_with_streams": with_streams,
+        "wall_s": round(wall, 3),
+        "cpu_s": round(cpu, 3),
+        "runs_per_s": round(scored / wall, 2) if wall > 0 else None,
+        "http_requests": stack.transport.http_requests,
+        "http_per_run": round(stack.transport.http_requests / per_run, 2),
+        "http_by_route": dict(stack.transport.calls),
+        "http_429": stack.transport.status.get(429, 0),
+        "db_calls": db_calls,
+        "db_per_run": round(db_calls / per_run, 2) if db_calls is not None else None,
+        "db_bytes_read": getattr(stack.client, "bytes_read", None),
+        # Gli sleep sono virtuali: wall_s è tutto lavoro, sleep_s è l'attesa che avrebbe fatto in produzione
+        "sleep_s": round(stack.clock.slept, 2),
+        "sleep_calls": stack.clock.sleeps,
+        "sleep_share": round(stack.clock.slept / (stack.clock.slept + wall), 4) if (stack.clock.slept + wall) > 0 else 0.0,
+        "peak_mem_mb": round(peak / 1e6, 1) if peak is not None else None,
+        "result": res
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sync Strava offline")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 500, 5000])
+    parser.add_argument("--paths", nargs="+", choices=["job", "controller"], default=["job", "controller"],
+                        help="job = safe_strava_sync, controller = SyncController.run_sync")
+    parser.add_argument("--storage", choices=["memory", "sqlite"], default="memory",
+                        help="memory = stand-in Supabase in memoria, sqlite = backend embedded")
+    parser.add_argument("--out", default=DEFAULT_OUT)
+    parser.add_argument("--no-memory", action="store_true", help="salta tracemalloc (più veloce)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+
+    meta = {
+        "ts": datetime.now().isoformat(timespec="seconds"),
+        "git": _git_rev(),
+        "engine": Config.ENGINE_VERSION,
+        "python": platform.python_version()
+    }
+
+    print(f"{'path':<11}{'acts':>6}{'runs':>6}{'wall s':>9}{'runs/s':>9}{'http/run':>10}{'db/run':>8}{'sleep s':>10}{'peak MB':>9}")
+    for path in args.paths:
+        for n in args.sizes:
+            row = dict(meta, **run_case(path, n, measure_memory=not args.no_memory, storage=args.storage))
+            with open(args.out, "a", encoding="utf-8") as f:
+                f.write(json.dumps(row, default=str) + "\n")
+            print(f"{path:<11}{n:>6}{row['runs_written']:>6}{row['wall_s']:>9}{row['runs_per_s'] or 0:>9}"
+                  f"{row['http_per_run']:>10}{row['db_per_run'] or '-':>8}{row['sleep_s']:>10}{row['peak_mem_mb'] or '-':>9}")
+
+    print(f"\nRisultati appesi a {args.out}")
+
+
+if __name__ == "__main__":
+    main()
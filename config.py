@@ -1,4 +1,5 @@
-import streamlit as st
+import os
+import sys
 
 class Config:
     # --- GLOBAL CONSTANTS ---
@@ -48,6 +49,35 @@ class Config:
     DEFAULT_AGE = 30
     
     # --- SECRETS & KEYS ---
+    ENV_SECRETS_PREFIX = "SCORE_"   # headless: SCORE_<SEZIONE>_<CHIAVE>, es. SCORE_SUPABASE_URL
+
+    @staticmethod
+    def _secrets():
+        """
+        st.secrets se streamlit è già caricato (app) e ha dei secrets; altrimenti
+        le variabili d'ambiente SCORE_<SEZIONE>_<CHIAVE> (CLI, job notturni, notebook).
+        Streamlit non viene mai importato da qui.
+        """
+        if "streamlit" in sys.modules:
+            import streamlit as st
+            try:
+                if len(st.secrets):
+                    return st.secrets
+            except Exception:
+                pass  # nessun secrets.toml: si passa all'ambiente
+        return Config._env_secrets()
+
+    @staticmethod
+    def _env_secrets():
+        secrets = {}
+        for name, value in os.environ.items():
+            if not name.startswith(Config.ENV_SECRETS_PREFIX):
+                continue
+            section, _, key = name[len(Config.ENV_SECRETS_PREFIX):].lower().partition("_")
+            if section and key:
+                secrets.setdefault(section, {})[key] = value
+        return secrets
+
     @staticmethod
     def check_secrets():
         """
@@ -55,31 +85,38 @@ class Config:
         Returns a list of missing keys.
         """
         missing = []
+        secrets = Config._secrets()
         
         # Strava
-        if not st.secrets.get("strava", {}).get("client_id"): missing.append("strava.client_id")
-        if not st.secrets.get("strava", {}).get("client_secret"): missing.append("strava.client_secret")
+        if not secrets.get("strava", {}).get("client_id"): missing.append("strava.client_id")
+        if not secrets.get("strava", {}).get("client_secret"): missing.append("strava.client_secret")
         
-        # Supabase
-        if not st.secrets.get("supabase", {}).get("url"): missing.append("supabase.url")
-        if not st.secrets.get("supabase", {}).get("key"): missing.append("supabase.key")
+        # Supabase (non serve con lo storage embedded)
+        if Config.get_storage_backend() == "supabase":
+            if not secrets.get("supabase", {}).get("url"): missing.append("supabase.url")
+            if not secrets.get("supabase", {}).get("key"): missing.append("supabase.key")
         
         # Gemini (Optional but recommended)
-        if not st.secrets.get("gemini", {}).get("api_key"): missing.append("gemini.api_key")
+        if not secrets.get("gemini", {}).get("api_key"): missing.append("gemini.api_key")
         
         return missing
 
     @staticmethod
     def get_strava_creds():
-        return st.secrets.get("strava", {})
+        return Config._secrets().get("strava", {})
 
     @staticmethod
     def get_supabase_creds():
-        return st.secrets.get("supabase", {})
+        return Config._secrets().get("supabase", {})
+
+    @staticmethod
+    def get_storage_backend():
+        """'supabase' (default) o 'sqlite' (embedded, nessuna rete) da [storage] backend"""
+        return Config._secrets().get("storage", {}).get("backend", Config.STORAGE_BACKEND)
 
     @staticmethod
     def get_gemini_key():
-        return st.secrets.get("gemini", {}).get("api_key")
+        return Config._secrets().get("gemini", {}).get("api_key")
 
     # --- LOGGING ---
     @staticmethod
@@ -98,6 +135,71 @@ class Config:
     OPEN_METEO_URL = "https://archive-api.open-meteo.com/v1/archive"
     STRAVA_BASE_URL = "https://www.strava.com/api/v3"
 
+    # Batch Weather (Open-Meteo range queries)
+    WEATHER_CLUSTER_DEG = 0.1      # ~11 km: corse partite dalla stessa zona
+    WEATHER_MAX_RANGE_DAYS = 366   # giorni massimi per singola richiesta
+    WEATHER_MAX_GAP_DAYS = 45      # buchi più lunghi aprono una nuova richiesta
+
+    # --- SYNC JOBS ---
+    SYNC_JOURNAL_DIR = ".score_state/sync_jobs"  # journal riprendibili (uno per atleta)
+    SYNC_WORKERS = 2                # thread del worker condiviso dal processo
+    SYNC_POLL_SECONDS = 2           # refresh della barra di avanzamento
+    SYNC_MAX_ATTEMPTS = 3           # tentativi per corsa in un job, poi la ripianifica la sync successiva
+
+    # --- DASHBOARD (storico progressivo) ---
+    HISTORY_FIRST_PAGE = 60         # corse del primo disegno (KPI, trend, medie 7/28)
+    HISTORY_PAGE_SIZE = 250         # corse per pagina caricate in background
+    HISTORY_POLL_SECONDS = 1        # intervallo tra una pagina e la successiva
+    ARCHIVE_PAGE_SIZE = 25          # righe per pagina dell'archivio (query lato DB)
+    ARCHIVE_DISTANCE_BANDS = {      # fasce dei filtri archivio, km [min, max) come engine.core.dist_label
+        "5k": (0, 8), "10k": (8, 16), "Mezza": (16, 30), "Maratona+": (30, None)
+    }
+
+    # --- STORAGE ---
+    STORAGE_BACKEND = "supabase"    # sovrascrivibile da secrets [storage] backend
+    SQLITE_PATH = ".score_state/score.sqlite"
+
+    # --- MIRROR LOCALE STORICO (SQLite per atleta) ---
+    MIRROR_ENABLED = True
+    MIRROR_DIR = ".score_state/mirror"
+    MIRROR_TTL_SEC = 300            # entro questo tempo (e senza scritture) niente query delta
+    MIRROR_OVERLAP_SEC = 120        # margine sul watermark per commit concorrenti
+    MIRROR_RECONCILE_SEC = 900      # ogni quanto confrontare gli id (cancellazioni da altri processi)
+
+    # --- STREAM SCHEDULER (budget API Strava) ---
+    STRAVA_LIMIT_15MIN = 100        # default app Strava (letture), sovrascritto dagli header
+    STRAVA_LIMIT_DAILY = 1000
+    STREAM_BUDGET_RESERVE = 10      # chiamate lasciate libere per paginazione/profilo
+    STREAM_DASHBOARD_RUNS = 10      # corse più recenti visibili in dashboard
+    STREAM_LONG_RUN_SEC = 3600      # da qui il decoupling diventa significativo
+    STREAM_PRIORITY_WEIGHTS = {"recency": 1.0, "dashboard": 1.5, "long_run": 0.8}
+    STREAM_CACHE_MAX_MB = 64        # stream compatti (int16/float32) in cache LRU, per processo
+
+    # --- GRAFICI STREAM (ui/chart_data.py) ---
+    CHART_LTTB_POINTS = 400         # punti per serie temporale (LTTB), qualunque durata
+    CHART_BINS = (40, 30)           # griglia watt x bpm della densità Power vs HR
+    CHART_CACHE_RUNS = 64           # corse con dati grafico in cache
+
+    # --- MEMO DEGLI SCORE (engine/score_memo.py) ---
+    SCORE_MEMO_ENTRIES = 4096       # voci LRU in memoria
+    SCORE_MEMO_PERSIST = True       # secondo livello su SQLite, sopravvive ai riavvii
+    SCORE_MEMO_PATH = ".score_state/score_memo.sqlite"
+
+    # --- API DI SCORING LOCALE (score_api.py) ---
+    SCORE_API_HOST = "127.0.0.1"
+    SCORE_API_PORT = 8765
+    SCORE_API_MAX_BATCH = 64        # corse per passaggio vettoriale dell'engine
+    SCORE_API_MAX_WAIT_MS = 5       # attesa massima per riempire un micro-batch
+    SCORE_API_TIMEOUT_SEC = 10      # risposta 503 se lo scoring non arriva entro
+    SCORE_API_MAX_BODY = 8 * 1024 * 1024
+
+    # --- RESILIENZA HTTP (retry / circuit breaker) ---
+    RETRY_BASE_SEC = 2.0            # primo backoff su errori di rete/5xx
+    RETRY_MAX_WAIT_SEC = 60.0       # tetto del backoff esponenziale
+    RETRY_JITTER_SEC = 3.0          # jitter massimo aggiunto ad ogni attesa
+    BREAKER_FAILURES = 3            # errori consecutivi per aprire il circuito
+    BREAKER_COOLDOWN_SEC = 120      # per quanto un host "aperto" viene saltato
+
     # --- ALGORITHM TUNING ---
     SCALING_FACTOR = 280.0
     ELITE_SPEED_M_S = 5.8
@@ -111,5 +213,7 @@ class Config:
     
     # --- DEV MODE ---
     DEV_IDS = {12345678, 59049495} # Saverio's ID added
+    PROFILER_ENABLED = True         # tempi per blocco dei rerun (services/profiler.py)
+    PROFILER_HISTORY = 200          # rerun tenuti per sessione (percentili in Dev Console)
 
 
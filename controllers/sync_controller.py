@@ -2,13 +2,15 @@ import time
 from datetime import datetime
 from config import Config
 from engine.core import ScoreEngine, RunMetrics
-from services.api import WeatherService
+from services.weather_batch import resolve_weather_batch
+from services.strava_sync import score_activity
+from services.stream_scheduler import StreamScheduler, has_stream_data, STREAM_PENDING, STREAM_FETCHED, STREAM_UNAVAILABLE
 
 class SyncController:
-    def __init__(self, auth_svc, db_svc):
+    def __init__(self, auth_svc, db_svc, engine=None):
         self.auth = auth_svc
         self.db = db_svc
-        self.engine = ScoreEngine()
+        self.engine = engine or ScoreEngine()
 
     def run_sync(self, token, athlete_id, physical_params, days_back, existing_ids, history_scores, progress_bar=None, last_import_timestamp=None):
         """
@@ -55,22 +57,15 @@ class SyncController:
         cutoff = datetime.now() - timedelta(days=days_back)
         
         # --- SAFE SYNC LOGIC (DROP-IN) ---
-        MAX_STREAMS = 5
-        RETRY = 3
         stream_count = 0
 
         import time 
         import logging
         logger = logging.getLogger("sCore.Sync")
 
-        for i, s in enumerate(activities_list):
-            if progress_bar:
-                progress_bar.progress((i + 1) / total)
-            
-        for i, s in enumerate(activities_list):
-            if progress_bar:
-                progress_bar.progress((i + 1) / total)
-            
+        # --- 1b. FILTRI + METEO BATCH ---
+        to_process = []
+        for s in activities_list:
             # --- 1. SIMPLE FILTERS (Come agli inizi) ---
             # Solo Corsa
             if s.get('type') != 'Run': 
@@ -85,30 +80,52 @@ class SyncController:
             # ID Check
             if str(s['id']) in existing_ids_str: continue 
             if self.db.run_exists(s["id"]): continue
+
+            to_process.append((s, dt))
+
+        # --- 1c. STREAM SCHEDULER (budget API) ---
+        # Corse già salvate con stream ancora 'pending' (rimandate da sync precedenti)
+        pending_ids = set(str(rid) for rid in self.db.get_run_ids_by_stream_status(athlete_id, STREAM_PENDING))
+        new_ids = set(str(s['id']) for s, _ in to_process)
+        carry_over = [s for s in activities_list if s.get('type') == 'Run' and str(s['id']) in pending_ids and str(s['id']) not in new_ids]
+
+        # Senza sensori non si spende budget: 'unavailable' subito
+        no_data = [s['id'] for s in carry_over if not has_stream_data(s)]
+        self.db.mark_stream_status(no_data, STREAM_UNAVAILABLE, athlete_id)
+        carry_over = [s for s in carry_over if has_stream_data(s)]
+
+        candidates = [s for s, _ in to_process if has_stream_data(s)] + carry_over
+        runs_newest = [s for s in activities_list if s.get('type') == 'Run'][::-1]
+        dashboard_ids = [s['id'] for s in runs_newest[:Config.STREAM_DASHBOARD_RUNS]]
+
+        scheduler = StreamScheduler(getattr(self.auth, "rate_limits", None))
+        windows = scheduler.schedule(candidates, dashboard_ids)
+        fetch_now = set(s['id'] for s in windows[0])
+        deferred = len(candidates) - len(fetch_now)
+
+        # Meteo: poche richieste range per cluster invece di una per corsa
+        weather = resolve_weather_batch([s for s, _ in to_process] + carry_over)
+        total = max(len(to_process), 1)
+
+        for i, (s, dt) in enumerate(to_process):
+            if progress_bar:
+                progress_bar.progress((i + 1) / total)
             
-            # --- 2. FETCH STREAMS (SAFE LIMIT) ---
+            # --- 2. FETCH STREAMS (SCHEDULER) ---
             streams = {"watts": {"data": []}, "heartrate": {"data": []}}
+            stream_status = STREAM_PENDING if has_stream_data(s) else STREAM_UNAVAILABLE
             
-            # Scarichiamo streams solo per le prime N attività (Anti-Ban)
-            if stream_count < MAX_STREAMS:
-                for r in range(RETRY):
-                    try:
-                         # Fetch streams con backoff
-                         st_raw = self.auth.fetch_streams(token, s['id'])
-                         if st_raw:
-                             streams = st_raw
-                             stream_count += 1
-                             break
-                    except Exception:
-                         time.sleep(2 ** (r + 1)) 
+            # Solo le corse della finestra corrente; le altre restano 'pending'
+            if s['id'] in fetch_now:
+                st_raw = self._fetch_streams(token, s['id'])
+                if st_raw:
+                    streams = st_raw
+                    stream_count += 1
+                    stream_status = STREAM_FETCHED
             
             # --- 3. BUILD RUN OBJECT (ROBUST) ---
             # Meteo (Optional)
-            t, h = 20.0, 50.0 
-            if s.get('start_latlng'):
-                 try:
-                    t, h = WeatherService.get_weather(s['start_latlng'][0], s['start_latlng'][1], dt.strftime("%Y-%m-%d"), dt.hour)
-                 except: pass
+            t, h = weather.get(s['id'], (20.0, 50.0))
 
             m = RunMetrics(
                 s.get('average_watts', 0),
@@ -151,6 +168,7 @@ class SyncController:
                 "Device": s.get("device_name", "Unknown"),
                 "raw_watts": streams.get("watts", {}).get("data", []),
                 "raw_hr": streams.get("heartrate", {}).get("data", []),
+                "Streams": stream_status,
                 "Achievements": gaming["achievements"],
                 "Trend": gaming["trend"],
                 "Comparison": gaming["comparison"]
@@ -162,7 +180,39 @@ class SyncController:
             # Simpler rate limit sleep
             time.sleep(0.5)
 
+        # --- 4. CARRY-OVER: stream rimandati dalle sync precedenti ---
+        phys = {"weight": weight, "hr_max": hr_max, "hr_rest": hr_rest, "age": age, "sex": sex}
+        for s in carry_over:
+            if s['id'] not in fetch_now:
+                continue
+            st_raw = self._fetch_streams(token, s['id'])
+            if not st_raw:
+                continue
+            stream_count += 1
+            watts = st_raw.get("watts", {}).get("data", [])
+            hr = st_raw.get("heartrate", {}).get("data", [])
+            t, h = weather.get(s['id'], (20.0, 50.0))
+            run_obj = score_activity(self.engine, s, watts, hr, phys, t, h)
+            run_obj.update({"raw_watts": watts, "raw_hr": hr, "Streams": STREAM_FETCHED})
+            self.db.update_run_streams(s['id'], run_obj, athlete_id)
+            time.sleep(0.5)
+
         if count_new > 0:
             self.db.update_streak(athlete_id)
-        
-        return count_new, f"Sync terminata: {count_new} nuove attività (Streams utilizzati: {stream_count})"
+
+        msg = f"Sync terminata: {count_new} nuove attività (Streams utilizzati: {stream_count})"
+        if deferred > 0:
+            msg += f" — {deferred} stream in coda dalle {scheduler.window_start(1).strftime('%H:%M')}"
+        return count_new, msg
+
+    def _fetch_streams(self, token, run_id, retry: int = 3):
+        """Fetch streams con backoff; None se non disponibili"""
+        for r in range(retry):
+            try:
+                st_raw = self.auth.fetch_streams(token, run_id)
+                if st_raw:
+                    return st_raw
+                return None
+            except Exception:
+                time.sleep(2 ** (r + 1))
+        return None
@@ -1,12 +1,46 @@
+import sys
 import numpy as np
 import logging
 from typing import Dict, Any, Tuple, List, Optional
 from config import Config
-from scipy.stats import norm
 
 # Setup Logger
 logger = logging.getLogger("sCore.Engine")
 
+
+def _dev_capturing() -> bool:
+    """True solo dentro un rerun Streamlit (headless streamlit non viene importato né toccato)."""
+    if sys.modules.get("streamlit") is None:
+        return False
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        return get_script_run_ctx(suppress_warning=True) is not None
+    except Exception:
+        return False
+
+
+def _dev_capture(key: str, payload):
+    """
+    Debug per la Dev Console in st.session_state, solo dentro un rerun Streamlit.
+    payload: callable, costruito solo se serve.
+    """
+    if not _dev_capturing():
+        return
+    try:
+        sys.modules["streamlit"].session_state[key] = payload()
+    except Exception:
+        pass
+
+
+def _dev_captured(key: str):
+    """Ultimo payload catturato per key (None fuori da un rerun Streamlit)."""
+    if not _dev_capturing():
+        return None
+    try:
+        return sys.modules["streamlit"].session_state.get(key)
+    except Exception:
+        return None
+
 # ============================================================
 # 1. MODELLI BASE (μ0, σ0) PER DISTANZA E SESSO
 # ============================================================
@@ -63,6 +97,7 @@ def percentile(distance, sex, age, T_act):
     mu0, sigma0 = BASE_PARAMS[(distance, sex)]
     mu, sigma = age_params(mu0, sigma0, age, sex)
     z = (np.log(T_act) - mu) / sigma
+    from scipy.stats import norm  # import pesante: solo al primo percentile
     return norm.cdf(z)
 
 # ============================================================
@@ -115,6 +150,34 @@ def T_ref(distance, age, sex, p, surface, temp_c):
         * F_env(temp_c)
     )
 
+# ============================================================
+# 7. VERSIONI VETTORIALI (batch di corse)
+# ============================================================
+
+def dist_label(distance_m):
+    if distance_m < 8000: return "5k"
+    if distance_m < 16000: return "10k"
+    if distance_m < 30000: return "hm"
+    return "m"
+
+def percentile_batch(labels, sexes, ages, T_act):
+    """percentile() su array: un solo norm.cdf per tutto il batch."""
+    known = np.array([(d, s) in BASE_PARAMS for d, s in zip(labels, sexes)], dtype=bool)
+    base = np.array([BASE_PARAMS.get((d, s), (0.0, 1.0)) for d, s in zip(labels, sexes)], dtype=float).reshape(-1, 2)
+    is_m = np.array([s == "M" for s in sexes], dtype=bool)
+    k_mu = np.where(is_m, 0.006, 0.007)
+    mu = base[:, 0] + k_mu * (ages - 30)
+    sigma = base[:, 1] + 0.001 * np.maximum(0, ages - 30)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = (np.log(T_act) - mu) / sigma
+    from scipy.stats import norm
+    p = norm.cdf(z)
+    p = np.where(T_act <= 10, 0.99, p)
+    return np.where(known, p, 0.5)
+
+def F_level_batch(p):
+    return np.select([p < 0.05, p < 0.15, p < 0.30, p < 0.50], [1.00, 1.05, 1.12, 1.20], 1.35)
+
 class RunMetrics:
     def __init__(self, avg_power: float, avg_hr: float, distance: float, moving_time: int, 
                  elevation_gain: float, weight: float, hr_max: int, hr_rest: int, 
@@ -132,9 +195,22 @@ class RunMetrics:
         self.age = age
         self.sex = sex
 
+def _memo_inputs(m: RunMetrics, decoupling_decimal: float) -> Dict[str, Any]:
+    return dict(vars(m), decoupling=decoupling_decimal)
+
+# Risultato di compute_score quando la matematica fallisce: mai memoizzato
+# (confronto per identità, quindi sempre questo oggetto)
+SCORE_FAILED = (0.0, {}, 1.0, 0.0, {})
+
+
+def _score_ok(result) -> bool:
+    return result is not SCORE_FAILED
+
 class ScoreEngine:
-    def __init__(self):
+    def __init__(self, memo=None):
         self.version = Config.ENGINE_VERSION
+        # engine.score_memo.ScoreMemo opzionale: input già visti non si riscorano
+        self.memo = memo
     
     def calculate_decoupling(
         self,
@@ -172,33 +248,24 @@ class ScoreEngine:
         drift = (cost2 - cost1) / cost1
         
         # Dev Console Capture
-        try:
-            import streamlit as st
-            st.session_state.last_drift_debug = {
-                "p1": round(p1,1), "h1": round(h1,1), "cost1": round(cost1,4),
-                "p2": round(p2,1), "h2": round(h2,1), "cost2": round(cost2,4),
-                "drift_raw": drift
-            }
-        except: pass
+        _dev_capture("last_drift_debug", lambda: {
+            "p1": round(p1,1), "h1": round(h1,1), "cost1": round(cost1,4),
+            "p2": round(p2,1), "h2": round(h2,1), "cost2": round(cost2,4),
+            "drift_raw": drift
+        })
 
         return float(max(0.0, drift))
 
     def calculate_zones(self, watts_stream: List[int], ftp: int) -> Dict[str, float]:
-        """Calcola distribuzione zone per i grafici"""
-        if not watts_stream or not ftp: return {}
-        zones = [0]*7
-        # Coggan Zones
+        """Calcola distribuzione zone per i grafici (liste o array NumPy)"""
+        if watts_stream is None or len(watts_stream) == 0 or not ftp: return {}
+        # Coggan Zones: Z(i+1) = quanti limiti sono <= w
         limits = [0.55, 0.75, 0.90, 1.05, 1.20, 1.50] 
-        for w in watts_stream:
-            if w < ftp * limits[0]: zones[0]+=1
-            elif w < ftp * limits[1]: zones[1]+=1
-            elif w < ftp * limits[2]: zones[2]+=1
-            elif w < ftp * limits[3]: zones[3]+=1
-            elif w < ftp * limits[4]: zones[4]+=1
-            elif w < ftp * limits[5]: zones[5]+=1
-            else: zones[6]+=1
+        bounds = np.array([ftp * l for l in limits])
+        idx = np.searchsorted(bounds, np.asarray(watts_stream), side="right")
+        zones = np.bincount(idx, minlength=7)
         total = len(watts_stream)
-        return {f"Z{i+1}": round(c/total*100, 1) for i, c in enumerate(zones)}
+        return {f"Z{i+1}": round(int(c)/total*100, 1) for i, c in enumerate(zones)}
 
     def compute_score_4_1_math(self, W_avg: float, ascent: float, distance_m: float, HR_avg: float, 
                                HR_rest: int, HR_max: int, T_act_sec: float, D: float, 
@@ -262,21 +329,18 @@ class ScoreEngine:
         SCORE = np.clip(score_logistic, 0.0, 100.0)
 
         # Dev Console Capture
-        try:
-             import streamlit as st
-             st.session_state.last_score_math = {
-                 "W_eff": round(W_eff, 3),
-                 "P_eff": round(P_eff, 3),
-                 "HRR_eff": round(HRR_eff, 3),
-                 "stability": round(stability, 3),
-                 "raw_score": round(raw_score, 3),
-                 "logistic_score": round(score_logistic, 3),
-                 "final_score": round(SCORE, 2),
-                 "inputs": {
-                     "W_avg": W_avg, "T_act": T_act_sec, "HR": HR_avg
-                 }
-             }
-        except: pass
+        _dev_capture("last_score_math", lambda: {
+            "W_eff": round(W_eff, 3),
+            "P_eff": round(P_eff, 3),
+            "HRR_eff": round(HRR_eff, 3),
+            "stability": round(stability, 3),
+            "raw_score": round(raw_score, 3),
+            "logistic_score": round(score_logistic, 3),
+            "final_score": round(SCORE, 2),
+            "inputs": {
+                "W_avg": W_avg, "T_act": T_act_sec, "HR": HR_avg
+            }
+        })
 
         return SCORE, p, Tref, WCF
 
@@ -284,14 +348,43 @@ class ScoreEngine:
         """
         Wrapper che collega l'app alla matematica 4.1
         """
+        if self.memo is None:
+            return self._compute_score(m, decoupling_decimal)
+        inputs = _memo_inputs(m, decoupling_decimal)
+        computed = []
+
+        def compute():
+            computed.append(True)
+            return self._compute_score(m, decoupling_decimal)
+
+        result = tuple(self.memo.get_or_compute("score", inputs, compute, cacheable=_score_ok))
+        if _dev_capturing():
+            self._capture_score_math(inputs, result, bool(computed), lambda: self._compute_score(m, decoupling_decimal))
+        return result
+
+    def _capture_score_math(self, inputs: Dict[str, Any], result, computed: bool, recompute):
+        """
+        Formula tab della Dev Console anche sugli hit del memo: la matematica
+        della corsa è memoizzata accanto allo score (kind "score_math") e
+        riproposta; se manca (score memoizzato fuori da un rerun) si ricalcola una volta.
+        """
+        from engine.score_memo import memo_key
+        key = memo_key("score_math", inputs)
+        if not computed:
+            payload = self.memo.get(key)
+            if payload is not None:
+                _dev_capture("last_score_math", lambda: payload)
+                return
+            result = recompute()
+        if _score_ok(result):
+            payload = _dev_captured("last_score_math")
+            if payload:
+                self.memo.put(key, payload)
+
+    def _compute_score(self, m: RunMetrics, decoupling_decimal: float) -> Tuple[float, Dict[str, Any], float, float, Dict[str, Any]]:
         try:
             # Infer Distance Label
-            d = m.distance_meters
-            dist_label = "10k" # Default fallback
-            if d < 8000: dist_label = "5k"
-            elif d < 16000: dist_label = "10k"
-            elif d < 30000: dist_label = "hm"
-            else: dist_label = "m"
+            label = dist_label(m.distance_meters)
 
             # Preparazione Dati per l'algoritmo
             
@@ -317,44 +410,139 @@ class ScoreEngine:
                 T_hours=t_hours,
                 temp_c=m.temperature,
                 humidity=m.humidity,
-                dist_label=dist_label,
+                dist_label=label,
                 sex=m.sex,
                 age=m.age,
                 surface="road" 
             )
 
-            # --- GAMING LAYER ---
-            quality = self.run_quality(final_score)
-
-            # --- POST PROCESSING ---
-            # Percentuale (p è probabilità di essere PIÙ VELOCI dell'utente)
-            # Scala: 0.0 (Elite) -> 1.0 (Lento)
-            # Vogliamo visualizzarlo come "Better than X%": 
-            # Se p=0.99 (99% sono più veloci), il rank è 1%.
-            # Se p=0.01 (1% sono più veloci), il rank è 99%.
-            wr_pct = (1 - p) * 100
-
-            # Costruzione Dettagli per la UI
-            # CORREZIONE 5: Formattazione Ore
-            t_ref_int = int(t_ref)
-            h = int(t_ref_int // 3600)
-            mins = int((t_ref_int % 3600) // 60)
-            s = int(t_ref_int % 60)
-            t_ref_fmt = f"{h}:{mins:02d}:{s:02d}" if h > 0 else f"{mins}:{s:02d}"
-
-            details = {
-                "Potenza": round(w_kg * 10, 1),           # Proxy visivo
-                "Volume": round(t_hours * 10, 1),         # Proxy visivo
-                "Intensità": round(m.avg_hr / m.hr_max * 100, 0),
-                "Target": t_ref_fmt,
-                "Malus Efficienza": f"-{round(abs(decoupling_decimal * 100), 1)}%" if decoupling_decimal > 0.05 else "OK"
-            }
+            return self._score_result(m, decoupling_decimal, final_score, p, t_ref, wcf)
 
-            return final_score, details, wcf, wr_pct, quality
-            
         except Exception as e:
             logger.error(f"Error computing score: {e}")
-            return 0.0, {}, 1.0, 0.0, {}
+            return SCORE_FAILED
+
+    def _score_result(self, m: RunMetrics, decoupling_decimal: float, final_score, p, t_ref, wcf):
+        """Tupla di compute_score dai valori dell'algoritmo (comune a singolo e batch)."""
+        w_kg = m.avg_power / m.weight
+        t_hours = m.moving_time / 3600.0
+
+        # --- GAMING LAYER ---
+        quality = self.run_quality(final_score)
+
+        # --- POST PROCESSING ---
+        # Percentuale (p è probabilità di essere PIÙ VELOCI dell'utente)
+        # Scala: 0.0 (Elite) -> 1.0 (Lento)
+        # Vogliamo visualizzarlo come "Better than X%": 
+        # Se p=0.99 (99% sono più veloci), il rank è 1%.
+        # Se p=0.01 (1% sono più veloci), il rank è 99%.
+        wr_pct = (1 - p) * 100
+
+        # Costruzione Dettagli per la UI
+        # CORREZIONE 5: Formattazione Ore
+        t_ref_int = int(t_ref)
+        h = int(t_ref_int // 3600)
+        mins = int((t_ref_int % 3600) // 60)
+        s = int(t_ref_int % 60)
+        t_ref_fmt = f"{h}:{mins:02d}:{s:02d}" if h > 0 else f"{mins}:{s:02d}"
+
+        details = {
+            "Potenza": round(w_kg * 10, 1),           # Proxy visivo
+            "Volume": round(t_hours * 10, 1),         # Proxy visivo
+            "Intensità": round(m.avg_hr / m.hr_max * 100, 0),
+            "Target": t_ref_fmt,
+            "Malus Efficienza": f"-{round(abs(decoupling_decimal * 100), 1)}%" if decoupling_decimal > 0.05 else "OK"
+        }
+
+        return final_score, details, wcf, wr_pct, quality
+
+    def compute_score_batch(self, runs: List[RunMetrics], decouplings: List[float]) -> List[Tuple[float, Dict[str, Any], float, float, Dict[str, Any]]]:
+        """
+        compute_score su N corse in un colpo solo (server di scoring, job batch).
+        Stessa matematica 4.1 su array numpy: il costo fisso per corsa (scalari
+        numpy, norm.cdf) si paga una volta per batch. Risultati identici a
+        [compute_score(m, d) for m, d in zip(runs, decouplings)].
+        """
+        if not runs:
+            return []
+        if self.memo is None:
+            return self._compute_score_batch(runs, decouplings)
+        results = self.memo.get_or_compute_many(
+            "score", [_memo_inputs(m, d) for m, d in zip(runs, decouplings)],
+            lambda idx: self._compute_score_batch([runs[i] for i in idx], [decouplings[i] for i in idx]),
+            cacheable=_score_ok
+        )
+        return [tuple(r) for r in results]
+
+    def _compute_score_batch(self, runs: List[RunMetrics], decouplings: List[float]):
+        try:
+            final, p, t_ref, wcf = self._score_4_1_batch(runs, decouplings)
+        except Exception as e:
+            # Input non numerici: il percorso singolo isola la corsa che fallisce
+            logger.error(f"Error computing score batch, falling back to single runs: {e}")
+            return [self.compute_score(m, d) for m, d in zip(runs, decouplings)]
+
+        results = []
+        for i, (m, dec) in enumerate(zip(runs, decouplings)):
+            try:
+                results.append(self._score_result(m, dec, final[i], p[i], t_ref[i], float(wcf[i])))
+            except Exception as e:
+                logger.error(f"Error computing score: {e}")
+                results.append(SCORE_FAILED)
+        return results
+
+    def _score_4_1_batch(self, runs: List[RunMetrics], decouplings: List[float],
+                         alpha: float = Config.SCORE_ALPHA, beta: float = 3.0, gamma: float = 2.0):
+        """compute_score_4_1_math su array (superficie "road", come compute_score)."""
+        def col(attr):
+            return np.array([float(getattr(m, attr)) for m in runs])
+
+        distance_m, T_act = col("distance_meters"), col("moving_time")
+        HR_avg, HR_rest, HR_max = col("avg_hr"), col("hr_rest"), col("hr_max")
+        temp_c, humidity, ages = col("temperature"), col("humidity"), col("age")
+        W_avg = col("avg_power") / col("weight")
+        ascent = col("elevation_gain")
+        D = np.array([float(d) for d in decouplings])
+        sexes = [m.sex for m in runs]
+        labels = [dist_label(d) for d in distance_m]
+
+        # ---- percentile reale e tempo di riferimento dinamico
+        p = percentile_batch(labels, sexes, ages, T_act)
+        wr_sec = np.array([WR.get(l, 26*60 + 11) for l in labels], dtype=float)
+        f_sex = np.where(np.array([s == "M" for s in sexes], dtype=bool), 1.0, 1.10)
+        Tref = (
+            wr_sec
+            * (1 + 0.15 * ((ages - 30) / 30) ** 2)
+            * f_sex
+            * F_level_batch(p)
+            * F_surface("road")
+            * (1 + np.maximum(0, temp_c - 15) * 0.01)
+        )
+
+        # ---- performance, potenza efficace, HRR
+        P = Tref / np.maximum(T_act, 1)
+        P_eff = np.log(1 + gamma * np.clip(P, 0.6, 1.2))
+
+        W_ref = getattr(Config, "W_REF", 6.0)
+        G = ascent / np.maximum(distance_m, 1)
+        W_eff = np.log(1 + (W_avg * (1 + G)) / W_ref)
+
+        den = np.maximum(HR_max - HR_rest, 10)
+        HRR = np.clip((HR_avg - HR_rest) / den, 0.30, 0.95)
+        HRR_eff = np.log(1 + beta * HRR)
+
+        # ---- meteo e stabilità
+        WCF = (
+            1
+            + np.maximum(0, 0.012 * (temp_c - 20))
+            + np.maximum(0, 0.005 * (humidity - 60))
+        )
+        stability = np.exp(-alpha * D)
+
+        raw_score = W_eff * (WCF * P_eff / HRR_eff) * stability
+        K = 2.5
+        SCORE = np.clip(100 * (1 - np.exp(-K * raw_score)), 0.0, 100.0)
+        return SCORE, p, Tref, WCF
 
     def get_rank(self, score: float) -> Tuple[str, str]:
         # Use config thresholds if available
@@ -561,7 +749,7 @@ class ScoreEngine:
                 else: dist_label = "m"
 
             # 3. Calcolo Math
-            score, p, tref, wcf = self.compute_score_4_1_math(
+            inputs = dict(
                 W_avg=w_kg,
                 ascent=run.get('elevation', 0),
                 distance_m=run.get('distance_km', 10) * 1000,
@@ -577,6 +765,12 @@ class ScoreEngine:
                 sex=run.get('sex', 'M'),
                 age=run.get('age', Config.DEFAULT_AGE)
             )
+            if self.memo is None:
+                score, p, tref, wcf = self.compute_score_4_1_math(**inputs)
+            else:
+                score, p, tref, wcf = self.memo.get_or_compute(
+                    "replay", inputs, lambda: self.compute_score_4_1_math(**inputs)
+                )
             
             return {
                 "score_version": self.version,
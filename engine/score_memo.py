@@ -0,0 +1,179 @@
+"""
+Memo degli score indirizzato per contenuto.
+
+Chiave = sha256 degli input normalizzati (numeri come float, chiavi
+ordinate) + Config.ENGINE_VERSION + parametri di tuning dello SCORE: input
+identici non vengono mai riscorati, e un bump dell'engine (o di alpha/W_REF)
+cambia tutte le chiavi senza bisogno di invalidare nulla a mano.
+
+Due livelli:
+- LRU in memoria (SCORE_MEMO_ENTRIES voci), condiviso dal processo;
+- opzionale, una tabella SQLite su disco (SCORE_MEMO_PATH) che sopravvive ai
+  riavvii. All'apertura si cancellano le righe di versioni engine diverse.
+
+I valori sono salvati come JSON e deserializzati ad ogni hit: il chiamante
+riceve sempre una copia (details è un dict che finisce nei run_obj).
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from config import Config
+
+logger = logging.getLogger("sCore.ScoreMemo")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS score_memo (
+    key TEXT PRIMARY KEY,
+    engine TEXT NOT NULL,
+    result TEXT NOT NULL,
+    created_at REAL NOT NULL
+)
+"""
+
+
+def _normalize(v: Any) -> Any:
+    # 70 e 70.0, int e numpy scalari: stesso input, stessa chiave
+    if isinstance(v, bool) or v is None or isinstance(v, str):
+        return v
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return repr(v)
+
+
+def memo_key(kind: str, inputs: Dict[str, Any]) -> str:
+    payload = {
+        "kind": kind,
+        "engine": Config.ENGINE_VERSION,
+        "params": [Config.SCORE_ALPHA, getattr(Config, "W_REF", 6.0)],
+        "inputs": {k: _normalize(v) for k, v in inputs.items()}
+    }
+    raw = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ScoreMemo:
+    def __init__(self, max_entries: int = Config.SCORE_MEMO_ENTRIES, path: Optional[str] = None):
+        self.max_entries = max(int(max_entries), 1)
+        self._lru: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0}
+        self._db: Optional[sqlite3.Connection] = None
+        if path:
+            self._open(path)
+
+    def _open(self, path: str):
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            db = sqlite3.connect(path, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=OFF")   # è una cache: una scrittura persa si ricalcola
+            db.execute(SCHEMA)
+            purged = db.execute("DELETE FROM score_memo WHERE engine != ?", (Config.ENGINE_VERSION,)).rowcount
+            db.commit()
+            self._db = db
+            if purged:
+                logger.info(f"[MEMO] {purged} score di engine precedenti rimossi")
+        except Exception as e:
+            # Senza disco (filesystem read-only, ...) resta il solo livello in memoria
+            logger.warning(f"Score memo on disk disabled ({path}): {e}")
+
+    # --- LIVELLI ---
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            raw = self._lru.get(key)
+            if raw is not None:
+                self._lru.move_to_end(key)
+                self.stats["hits"] += 1
+            elif self._db is not None:
+                row = self._db.execute("SELECT result FROM score_memo WHERE key = ?", (key,)).fetchone()
+                if row:
+                    raw = row[0]
+                    self._remember(key, raw)
+                    self.stats["disk_hits"] += 1
+        return json.loads(raw) if raw is not None else None
+
+    def put(self, key: str, result: Any):
+        self.put_many([(key, result)])
+
+    def put_many(self, items: List[Tuple[str, Any]]):
+        """Scrive più risultati con un solo commit (batch di scoring)."""
+        rows = []
+        for key, result in items:
+            try:
+                rows.append((key, Config.ENGINE_VERSION, json.dumps(result, default=float), time.time()))
+            except (TypeError, ValueError) as e:
+                logger.warning(f"Score memo: result not serializable, not cached: {e}")
+        with self._lock:
+            for key, _, raw, _ in rows:
+                self._remember(key, raw)
+            if self._db is not None and rows:
+                try:
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO score_memo (key, engine, result, created_at) VALUES (?, ?, ?, ?)", rows
+                    )
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    logger.warning(f"Score memo write failed: {e}")
+
+    def _remember(self, key: str, raw: str):
+        self._lru[key] = raw
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    # --- USO DALL'ENGINE ---
+    def get_or_compute(self, kind: str, inputs: Dict[str, Any], compute: Callable[[], Any],
+                       cacheable: Optional[Callable[[Any], bool]] = None) -> Any:
+        """cacheable(risultato) False = non memoizzare (es. fallback di un errore)."""
+        key = memo_key(kind, inputs)
+        hit = self.get(key)
+        if hit is not None:
+            return hit
+        with self._lock:
+            self.stats["misses"] += 1
+        result = compute()
+        if cacheable is None or cacheable(result):
+            self.put(key, result)
+        return result
+
+    def get_or_compute_many(self, kind: str, inputs: List[Dict[str, Any]],
+                            compute_many: Callable[[List[int]], List[Any]],
+                            cacheable: Optional[Callable[[Any], bool]] = None) -> List[Any]:
+        """compute_many(indici mancanti) -> risultati nello stesso ordine."""
+        keys = [memo_key(kind, i) for i in inputs]
+        out = [self.get(k) for k in keys]
+        missing = [i for i, r in enumerate(out) if r is None]
+        if missing:
+            with self._lock:
+                self.stats["misses"] += len(missing)
+            results = compute_many(missing)
+            for i, result in zip(missing, results):
+                out[i] = result
+            self.put_many([(keys[i], r) for i, r in zip(missing, results) if cacheable is None or cacheable(r)])
+        return out
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.stats["hits"] + self.stats["disk_hits"] + self.stats["misses"]
+            return dict(self.stats, entries=len(self._lru), persistent=self._db is not None,
+                        hit_rate=round((total - self.stats["misses"]) / total, 3) if total else 0)
+
+    def clear(self):
+        with self._lock:
+            self._lru.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM score_memo")
+                self._db.commit()
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,12 @@
+-- Migration: stato download stream per corsa (scheduler a budget API)
+
+-- 1. pending = in coda, fetched = scaricati, unavailable = nessun sensore / nessuno stream
+ALTER TABLE runs ADD COLUMN IF NOT EXISTS stream_status TEXT DEFAULT 'pending';
+
+-- 2. Backfill dai dati già presenti
+UPDATE runs SET stream_status = 'fetched'
+WHERE stream_status = 'pending'
+  AND jsonb_array_length(COALESCE(raw_data->'watts', '[]'::jsonb)) > 0;
+
+-- Indexes for performance (lo scheduler legge solo le pending di un atleta)
+CREATE INDEX IF NOT EXISTS idx_runs_stream_pending ON runs(athlete_id) WHERE stream_status = 'pending';
@@ -0,0 +1,20 @@
+-- Migration: stream fuori da runs.raw_data
+-- Gli stream (watts/hr a 1 Hz) pesano centinaia di KB per corsa: in una tabella
+-- dedicata le scansioni di runs (storico, streak) leggono solo righe sottili.
+
+-- 1. Una riga per (corsa, tipo stream)
+CREATE TABLE IF NOT EXISTS run_streams (
+    run_id BIGINT NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    stream_type TEXT NOT NULL,              -- 'watts' | 'hr'
+    data JSONB NOT NULL DEFAULT '[]'::jsonb,
+    sample_count INTEGER,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (run_id, stream_type)
+);
+
+-- 2. Backfill: NON qui. Le corse esistenti si spostano a lotti con
+--    python backfill_run_streams.py  (keyset su runs.id, un lotto = transazioni brevi,
+--    nessun lock di tabella). Finché una corsa non è migrata, DatabaseService
+--    legge ancora raw_data->'watts'/'hr'.
+--    Il backfill scorre runs per chiave primaria: nessun indice dedicato
+--    (un indice parziale su raw_data ? 'watts' non lo userebbe il keyset su id).
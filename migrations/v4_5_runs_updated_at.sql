@@ -0,0 +1,21 @@
+-- Migration: runs.updated_at per il mirror locale dello storico (refresh incrementale)
+
+-- 1. Colonna + backfill (le righe esistenti partono tutte dallo stesso istante)
+ALTER TABLE runs ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW();
+UPDATE runs SET updated_at = NOW() WHERE updated_at IS NULL;
+
+-- 2. Trigger: ogni INSERT/UPDATE (upsert compresi) sposta il watermark
+CREATE OR REPLACE FUNCTION runs_touch_updated_at() RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at = NOW();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_runs_updated_at ON runs;
+CREATE TRIGGER trg_runs_updated_at
+    BEFORE INSERT OR UPDATE ON runs
+    FOR EACH ROW EXECUTE FUNCTION runs_touch_updated_at();
+
+-- Indexes for performance (query delta: athlete_id = ? AND updated_at >= ?)
+CREATE INDEX IF NOT EXISTS idx_runs_athlete_updated ON runs(athlete_id, updated_at);
@@ -0,0 +1,91 @@
+-- Migration: aggregati dashboard calcolati in Postgres (RPC via client.rpc)
+-- La dashboard riceve poche centinaia di byte invece di scaricare tutto lo storico.
+-- Emulazione per i backend embedded/offline: services/stats_rpc.py
+
+-- 1. Trend: medie mobili 7/28 corse sull'intero storico, ritorna le ultime p_limit corse
+CREATE OR REPLACE FUNCTION athlete_score_trend(p_athlete_id BIGINT, p_limit INT DEFAULT 60)
+RETURNS TABLE (id BIGINT, date TEXT, score FLOAT, ma_7 FLOAT, ma_28 FLOAT)
+LANGUAGE sql STABLE AS $$
+    SELECT t.id, t.date, t.score, t.ma_7, t.ma_28
+    FROM (
+        SELECT r.id, r.date::text AS date, r.score,
+               AVG(r.score) OVER (ORDER BY r.date, r.id ROWS BETWEEN 6 PRECEDING AND CURRENT ROW) AS ma_7,
+               AVG(r.score) OVER (ORDER BY r.date, r.id ROWS BETWEEN 27 PRECEDING AND CURRENT ROW) AS ma_28,
+               r.date AS sort_date
+        FROM runs r
+        WHERE r.athlete_id = p_athlete_id AND r.score IS NOT NULL
+    ) t
+    ORDER BY t.sort_date DESC, t.id DESC
+    LIMIT p_limit;
+$$;
+
+-- 2. Streak: corse consecutive (dalla più recente, max 10) con SCORE non in calo
+CREATE OR REPLACE FUNCTION athlete_streak(p_athlete_id BIGINT)
+RETURNS INT
+LANGUAGE sql STABLE AS $$
+    WITH last10 AS (
+        SELECT r.score, ROW_NUMBER() OVER (ORDER BY r.date DESC, r.id DESC) AS rn
+        FROM runs r
+        WHERE r.athlete_id = p_athlete_id
+        ORDER BY r.date DESC, r.id DESC
+        LIMIT 10
+    ), steps AS (
+        SELECT rn, score, LAG(score) OVER (ORDER BY rn) AS newer FROM last10
+    )
+    SELECT COALESCE(
+        (SELECT MIN(rn) - 1 FROM steps WHERE newer < score),
+        GREATEST((SELECT COUNT(*) FROM last10), 1)
+    )::INT;
+$$;
+
+-- 3. Streak salvata su athletes in un solo round trip (sostituisce SELECT + UPDATE)
+CREATE OR REPLACE FUNCTION refresh_athlete_streak(p_athlete_id BIGINT)
+RETURNS INT
+LANGUAGE plpgsql VOLATILE AS $$
+DECLARE
+    s INT := athlete_streak(p_athlete_id);
+BEGIN
+    UPDATE athletes SET streak = s WHERE id = p_athlete_id;
+    RETURN s;
+END;
+$$;
+
+-- 4. KPI header: ultimo SCORE, medie mobili, delta MA7, streak, riepilogo del periodo
+CREATE OR REPLACE FUNCTION athlete_dashboard_stats(p_athlete_id BIGINT, p_since DATE DEFAULT NULL)
+RETURNS JSON
+LANGUAGE sql STABLE AS $$
+    WITH t AS (
+        SELECT *, ROW_NUMBER() OVER (ORDER BY date DESC, id DESC) AS pos FROM athlete_score_trend(p_athlete_id, 2)
+    ), p AS (
+        SELECT COUNT(*) AS runs, AVG(r.score) AS avg_score, MAX(r.score) AS best_score,
+               SUM(r.distance_km) AS distance_km, AVG(r.decoupling) AS avg_decoupling
+        FROM runs r
+        WHERE r.athlete_id = p_athlete_id AND (p_since IS NULL OR r.date::date >= p_since)
+    )
+    SELECT json_build_object(
+        'last_score', (SELECT score FROM t WHERE pos = 1),
+        'last_date', (SELECT date FROM t WHERE pos = 1),
+        'ma_7', (SELECT ma_7 FROM t WHERE pos = 1),
+        'ma_28', (SELECT ma_28 FROM t WHERE pos = 1),
+        'ma7_delta', COALESCE((SELECT ma_7 FROM t WHERE pos = 1) - (SELECT ma_7 FROM t WHERE pos = 2), 0),
+        'streak', athlete_streak(p_athlete_id),
+        'period_runs', p.runs,
+        'period_avg_score', p.avg_score,
+        'period_best_score', p.best_score,
+        'period_distance_km', p.distance_km,
+        'period_avg_decoupling', p.avg_decoupling
+    )
+    FROM p;
+$$;
+
+-- 5. Riepilogo per periodo ('week' | 'month' | 'year')
+CREATE OR REPLACE FUNCTION athlete_period_summary(p_athlete_id BIGINT, p_period TEXT DEFAULT 'month', p_since DATE DEFAULT NULL)
+RETURNS TABLE (period_start DATE, run_count BIGINT, avg_score FLOAT, best_score FLOAT, total_km FLOAT, avg_decoupling FLOAT)
+LANGUAGE sql STABLE AS $$
+    SELECT date_trunc(p_period, r.date::date)::date AS period_start,
+           COUNT(*), AVG(r.score), MAX(r.score), SUM(r.distance_km), AVG(r.decoupling)
+    FROM runs r
+    WHERE r.athlete_id = p_athlete_id AND (p_since IS NULL OR r.date::date >= p_since)
+    GROUP BY 1
+    ORDER BY 1 DESC;
+$$;
@@ -0,0 +1,152 @@
+-- Migration: riepilogo materializzato per atleta (athlete_summary)
+-- Mantenuto dal trigger su runs nella stessa transazione di ogni scrittura:
+-- contatori aggiornati per differenza OLD/NEW, finestra delle ultime 28 corse
+-- riletta dall'indice (athlete_id, date). La dashboard fa una lookup per PK.
+-- Emulazione per i backend embedded/offline: services/athlete_summary.py
+
+-- 1. Tabella
+CREATE TABLE IF NOT EXISTS athlete_summary (
+    athlete_id BIGINT PRIMARY KEY,
+    total_runs INTEGER NOT NULL DEFAULT 0,
+    total_km FLOAT NOT NULL DEFAULT 0,
+    best_score FLOAT,
+    best_run_id BIGINT,
+    last_run_id BIGINT,
+    last_run_date TEXT,
+    last_score FLOAT,
+    ma_7 FLOAT,
+    ma_28 FLOAT,
+    ma7_delta FLOAT DEFAULT 0,
+    streak INTEGER DEFAULT 0,
+    recent JSONB NOT NULL DEFAULT '[]'::jsonb,   -- [{id, date, score}] dalla più recente
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- 2. Campi della finestra (ultime 28 corse): last_*, medie mobili, delta MA7, streak
+CREATE OR REPLACE FUNCTION athlete_summary_refresh_window(p_athlete_id BIGINT)
+RETURNS VOID
+LANGUAGE plpgsql VOLATILE AS $$
+BEGIN
+    UPDATE athlete_summary s SET
+        recent = w.recent,
+        last_run_id = w.last_id,
+        last_run_date = w.last_date,
+        last_score = w.last_score,
+        ma_7 = w.ma_7,
+        ma_28 = w.ma_28,
+        ma7_delta = w.ma7_delta,
+        streak = CASE WHEN w.last_id IS NULL THEN 0 ELSE athlete_streak(p_athlete_id) END,
+        updated_at = NOW()
+    FROM (
+        WITH last28 AS (
+            SELECT r.id, r.date::text AS date, r.score,
+                   ROW_NUMBER() OVER (ORDER BY r.date DESC, r.id DESC) AS pos
+            FROM runs r
+            WHERE r.athlete_id = p_athlete_id
+            ORDER BY r.date DESC, r.id DESC
+            LIMIT 28
+        ), scored AS (
+            SELECT score, ROW_NUMBER() OVER (ORDER BY pos) AS k FROM last28 WHERE score IS NOT NULL
+        )
+        SELECT
+            COALESCE((SELECT jsonb_agg(jsonb_build_object('id', id, 'date', date, 'score', score) ORDER BY pos) FROM last28), '[]'::jsonb) AS recent,
+            (SELECT id FROM last28 WHERE pos = 1) AS last_id,
+            (SELECT date FROM last28 WHERE pos = 1) AS last_date,
+            (SELECT score FROM last28 WHERE pos = 1) AS last_score,
+            (SELECT AVG(score) FROM scored WHERE k <= 7) AS ma_7,
+            (SELECT AVG(score) FROM scored) AS ma_28,
+            CASE WHEN (SELECT COUNT(*) FROM scored) > 1
+                 THEN (SELECT AVG(score) FROM scored WHERE k <= 7) - (SELECT AVG(score) FROM scored WHERE k BETWEEN 2 AND 8)
+                 ELSE 0 END AS ma7_delta
+    ) w
+    WHERE s.athlete_id = p_athlete_id;
+
+    -- Colonne storiche su athletes (lette da codice più vecchio)
+    UPDATE athletes a SET streak = s.streak, last_run_date = s.last_run_date::timestamptz
+    FROM athlete_summary s
+    WHERE a.id = p_athlete_id AND s.athlete_id = p_athlete_id;
+END;
+$$;
+
+-- 3. Trigger su runs: aggiornamento incrementale nella stessa transazione
+CREATE OR REPLACE FUNCTION runs_apply_athlete_summary() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO athlete_summary (athlete_id) VALUES (OLD.athlete_id) ON CONFLICT (athlete_id) DO NOTHING;
+        UPDATE athlete_summary
+        SET total_runs = total_runs - 1, total_km = total_km - COALESCE(OLD.distance_km, 0)
+        WHERE athlete_id = OLD.athlete_id;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO athlete_summary (athlete_id) VALUES (NEW.athlete_id) ON CONFLICT (athlete_id) DO NOTHING;
+        UPDATE athlete_summary
+        SET total_runs = total_runs + 1,
+            total_km = total_km + COALESCE(NEW.distance_km, 0),
+            best_run_id = CASE WHEN NEW.score IS NOT NULL AND (best_score IS NULL OR NEW.score > best_score) THEN NEW.id ELSE best_run_id END,
+            best_score = CASE WHEN NEW.score IS NOT NULL AND (best_score IS NULL OR NEW.score > best_score) THEN NEW.score ELSE best_score END
+        WHERE athlete_id = NEW.athlete_id;
+    END IF;
+
+    -- Corsa migliore cancellata, spostata o peggiorata: si rilegge il massimo
+    IF TG_OP = 'DELETE' OR (TG_OP = 'UPDATE' AND (NEW.athlete_id <> OLD.athlete_id OR NEW.score IS NULL OR NEW.score < OLD.score)) THEN
+        UPDATE athlete_summary s
+        SET (best_score, best_run_id) = (
+            SELECT r.score, r.id FROM runs r
+            WHERE r.athlete_id = OLD.athlete_id AND r.score IS NOT NULL
+            ORDER BY r.score DESC LIMIT 1
+        )
+        WHERE s.athlete_id = OLD.athlete_id AND s.best_run_id = OLD.id;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM athlete_summary_refresh_window(OLD.athlete_id);
+    END IF;
+    IF TG_OP = 'INSERT' OR (TG_OP = 'UPDATE' AND NEW.athlete_id <> OLD.athlete_id) THEN
+        PERFORM athlete_summary_refresh_window(NEW.athlete_id);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_runs_athlete_summary ON runs;
+CREATE TRIGGER trg_runs_athlete_summary
+    AFTER INSERT OR DELETE OR UPDATE OF athlete_id, date, score, distance_km ON runs
+    FOR EACH ROW EXECUTE FUNCTION runs_apply_athlete_summary();
+
+-- 4. Riparazione: ricostruzione da zero (un atleta, o tutti con p_athlete_id NULL)
+CREATE OR REPLACE FUNCTION rebuild_athlete_summary(p_athlete_id BIGINT DEFAULT NULL)
+RETURNS INT
+LANGUAGE plpgsql VOLATILE AS $$
+DECLARE
+    a BIGINT;
+    n INT := 0;
+BEGIN
+    FOR a IN
+        SELECT DISTINCT r.athlete_id FROM runs r WHERE p_athlete_id IS NULL OR r.athlete_id = p_athlete_id
+        UNION SELECT s.athlete_id FROM athlete_summary s WHERE p_athlete_id IS NULL OR s.athlete_id = p_athlete_id
+        UNION SELECT p_athlete_id WHERE p_athlete_id IS NOT NULL
+    LOOP
+        INSERT INTO athlete_summary (athlete_id, total_runs, total_km, best_score, best_run_id)
+        SELECT a, COUNT(*), COALESCE(SUM(r.distance_km), 0),
+               (SELECT b.score FROM runs b WHERE b.athlete_id = a AND b.score IS NOT NULL ORDER BY b.score DESC LIMIT 1),
+               (SELECT b.id FROM runs b WHERE b.athlete_id = a AND b.score IS NOT NULL ORDER BY b.score DESC LIMIT 1)
+        FROM runs r WHERE r.athlete_id = a
+        ON CONFLICT (athlete_id) DO UPDATE SET
+            total_runs = EXCLUDED.total_runs,
+            total_km = EXCLUDED.total_km,
+            best_score = EXCLUDED.best_score,
+            best_run_id = EXCLUDED.best_run_id;
+        PERFORM athlete_summary_refresh_window(a);
+        n := n + 1;
+    END LOOP;
+    RETURN n;
+END;
+$$;
+
+-- 5. Backfill iniziale
+SELECT rebuild_athlete_summary();
+
+-- Indexes for performance (finestra e massimo letti per atleta)
+CREATE INDEX IF NOT EXISTS idx_runs_athlete_date_id ON runs(athlete_id, date DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_runs_athlete_score ON runs(athlete_id, score DESC) WHERE score IS NOT NULL;
@@ -0,0 +1,11 @@
+-- Migration: indici dell'archivio attività (DatabaseService.get_archive_page)
+-- Paginazione keyset su (colonna di ordinamento, id) con filtri per fascia di
+-- distanza, rank, intervallo di date e di SCORE: ogni pagina legge solo le
+-- proprie righe dall'indice invece di scorrere l'intero storico dell'atleta.
+-- L'ordinamento per data usa idx_runs_athlete_date_id (v4_7); gli indici
+-- btree servono anche l'ordine ASC (scansione all'indietro).
+
+-- Indexes for performance
+CREATE INDEX IF NOT EXISTS idx_runs_athlete_score_id ON runs(athlete_id, score DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_runs_athlete_distance_id ON runs(athlete_id, distance_km DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_runs_athlete_rank_date ON runs(athlete_id, rank, date DESC, id DESC);
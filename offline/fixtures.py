@@ -0,0 +1,128 @@
+import os
+import json
+import math
+import random
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+
+# Punti di partenza tipici: casa + un paio di trasferte
+HOMES = [(45.4642, 9.1900), (45.4781, 9.2253)]
+TRAVELS = [(41.9028, 12.4964), (46.0748, 11.1217), (43.7696, 11.2558)]
+
+
+class SyntheticAthlete:
+    """
+    Atleta sintetico deterministico: summary attività stile /athlete/activities
+    (dal più recente al più vecchio) e stream 1 Hz generati su richiesta.
+    """
+
+    def __init__(self, athlete_id: int = 1, n_activities: int = 50, seed: int = 42,
+                 end: Optional[datetime] = None, run_share: float = 0.85):
+        self.athlete_id = athlete_id
+        self.seed = seed
+        self.profile = {
+            "id": athlete_id, "firstname": "Offline", "lastname": f"Athlete {athlete_id}",
+            "weight": 70.0, "sex": "M", "ftp": 280
+        }
+        self._streams: Dict[int, Dict[str, Any]] = {}
+        self._recorded_streams_dir: Optional[str] = None
+
+        rnd = random.Random(seed * 1000 + athlete_id)
+        end = end or datetime(2024, 12, 31, 7, 30)
+        acts = []
+        t = end
+        for i in range(n_activities):
+            t -= timedelta(hours=rnd.uniform(18, 44))
+            act_id = athlete_id * 10_000_000 + i + 1
+            is_run = rnd.random() < run_share
+            manual = is_run and rnd.random() < 0.03
+            dist = rnd.uniform(5000, 30000) if is_run else rnd.uniform(20000, 80000)
+            pace = rnd.uniform(4.3, 6.0) * 60 / 1000  # sec/m
+            moving = int(dist * pace) if is_run else int(dist / 8.0)
+            base = HOMES[rnd.random() < 0.3] if rnd.random() < 0.85 else rnd.choice(TRAVELS)
+            latlng = [round(base[0] + rnd.uniform(-0.01, 0.01), 5), round(base[1] + rnd.uniform(-0.01, 0.01), 5)]
+            has_power = is_run and not manual and rnd.random() < 0.9
+            act = {
+                "id": act_id,
+                "type": "Run" if is_run else "Ride",
+                "name": f"Offline {'Run' if is_run else 'Ride'} {i + 1}",
+                "start_date_local": t.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "start_latlng": [] if manual else latlng,
+                "distance": round(dist, 1),
+                "moving_time": moving,
+                "elapsed_time": moving + rnd.randint(0, 300),
+                "total_elevation_gain": round(rnd.uniform(5, 400), 1),
+                "device_watts": has_power,
+                "has_heartrate": not manual,
+                "manual": manual,
+                "average_temp": rnd.randint(2, 30)
+            }
+            # Come Strava: i campi dei sensori mancano se il sensore non c'è
+            if has_power:
+                act["average_watts"] = round(rnd.uniform(210, 290), 1)
+            if not manual:
+                act["average_heartrate"] = round(rnd.uniform(132, 166), 1)
+            acts.append(act)
+        self.activities: List[Dict[str, Any]] = acts
+        self._by_id = {a["id"]: a for a in acts}
+
+    @classmethod
+    def from_fixture_dir(cls, path: str, athlete_id: int = 1) -> "SyntheticAthlete":
+        """Carica attività/stream registrati (layout di RecordingTransport)."""
+        ath = cls(athlete_id=athlete_id, n_activities=0)
+        with open(os.path.join(path, "activities.json"), "r", encoding="utf-8") as f:
+            ath.activities = sorted(json.load(f), key=lambda a: a["start_date_local"], reverse=True)
+        ath._by_id = {a["id"]: a for a in ath.activities}
+        ath._recorded_streams_dir = os.path.join(path, "streams")
+        return ath
+
+    def activity(self, activity_id: int) -> Optional[Dict[str, Any]]:
+        return self._by_id.get(activity_id)
+
+    def streams(self, activity_id: int) -> Optional[Dict[str, Any]]:
+        """Stream key_by_type (watts/heartrate) o None se l'attività non ne ha."""
+        a = self._by_id.get(activity_id)
+        if not a or a.get("manual"):
+            return None
+        if self._recorded_streams_dir is not None:
+            path = os.path.join(self._recorded_streams_dir, f"{activity_id}.json")
+            if not os.path.exists(path):
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        if activity_id in self._streams:
+            return self._streams[activity_id]
+
+        rng = np.random.default_rng(self.seed + activity_id)
+        n = max(int(a["moving_time"]), 1)
+        out = {}
+        if a.get("device_watts"):
+            watts = rng.normal(a.get("average_watts", 240), 18, n).clip(0, 600)
+            out["watts"] = {"data": watts.astype(int).tolist(), "series_type": "time", "original_size": n}
+        if a.get("has_heartrate"):
+            drift = np.linspace(0, rng.uniform(2, 12), n)
+            hr = (a["average_heartrate"] - 4 + drift + rng.normal(0, 2, n)).clip(60, 210)
+            out["heartrate"] = {"data": hr.astype(int).tolist(), "series_type": "time", "original_size": n}
+        # Cache piccola: gli stream pesano, si tengono solo gli ultimi
+        if len(self._streams) > 64:
+            self._streams.clear()
+        self._streams[activity_id] = out
+        return out
+
+
+def hourly_weather(lat: float, lon: float, start: datetime, days: int) -> Dict[str, List[float]]:
+    """Serie oraria plausibile (stagione + ciclo giornaliero) per l'archivio meteo."""
+    temps, hums = [], []
+    for d in range(days):
+        day = start + timedelta(days=d)
+        season = 12 - 10 * math.cos(2 * math.pi * (day.timetuple().tm_yday - 15) / 365) - (lat - 45) * 0.6
+        for h in range(24):
+            daily = 5 * math.sin(2 * math.pi * (h - 9) / 24)
+            temps.append(round(season + daily, 1))
+            hums.append(round(min(100, max(20, 70 - 2 * daily + (lon % 5))), 0))
+    return {
+        "time": [(start + timedelta(hours=i)).strftime("%Y-%m-%dT%H:%M") for i in range(days * 24)],
+        "temperature_2m": temps,
+        "relative_humidity_2m": hums
+    }
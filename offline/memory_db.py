@@ -0,0 +1,300 @@
+import json
+import itertools
+from datetime import datetime, timezone
+from collections import Counter, defaultdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from services.storage import APIResponse, split_top
+
+# Chiave primaria per tabella (default "id")
+TABLE_KEYS: Dict[str, Tuple[str, ...]] = {
+    "run_streams": ("run_id", "stream_type"),
+    "athlete_summary": ("athlete_id",),
+}
+
+# Colonne aggiornate da trigger a ogni INSERT/UPDATE (es. runs.updated_at, migrazione v4_5)
+TOUCH_COLUMNS: Dict[str, str] = {
+    "runs": "updated_at",
+}
+
+# ON DELETE CASCADE: tabella padre -> [(tabella figlia, colonna FK)]
+CASCADES: Dict[str, List[Tuple[str, str]]] = {
+    "runs": [("run_streams", "run_id")],
+}
+
+# Tabelle con id generato dal DB (GENERATED BY DEFAULT AS IDENTITY)
+IDENTITY_TABLES = {"feedback", "score_replay", "achievements_log"}
+
+
+class InMemoryClient:
+    """
+    Stand-in del client Supabase: stesso query builder (table().select().eq()...execute())
+    sopra dizionari in memoria, così DatabaseService gira invariato.
+
+    Ogni execute() è un round trip; i risultati passano da JSON come sulla rete,
+    così byte e righe lette sono misurabili.
+    """
+
+    def __init__(self):
+        self.tables: Dict[str, Dict[Any, Dict[str, Any]]] = defaultdict(dict)
+        self.rpcs: Dict[str, Callable[..., Any]] = {}
+        # Trigger AFTER per riga: fn(client, old, new), girano "lato server" (niente round trip)
+        self.triggers: Dict[str, List[Callable[..., Any]]] = defaultdict(list)
+        self._trigger_depth = 0
+        self.round_trips = 0
+        self.calls = Counter()       # (tabella, operazione)
+        self.rows_read = 0
+        self.bytes_read = 0
+        self._ids = defaultdict(lambda: itertools.count(1))
+
+    def table(self, name: str) -> "InMemoryQuery":
+        return InMemoryQuery(self, name)
+
+    def rpc(self, name: str, params: Optional[Dict[str, Any]] = None) -> "InMemoryRpc":
+        return InMemoryRpc(self, name, params or {})
+
+    def register_rpc(self, name: str, fn: Callable[["InMemoryClient", Dict[str, Any]], Any]):
+        self.rpcs[name] = fn
+
+    def register_trigger(self, table: str, fn: Callable[["InMemoryClient", Optional[Dict[str, Any]], Optional[Dict[str, Any]]], Any]):
+        self.triggers[table].append(fn)
+
+    def fire(self, table: str, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]):
+        if not self.triggers.get(table):
+            return
+        self._trigger_depth += 1
+        try:
+            for fn in self.triggers[table]:
+                fn(self, old, new)
+        finally:
+            self._trigger_depth -= 1
+
+    def key_of(self, table: str, row: Dict[str, Any]):
+        cols = TABLE_KEYS.get(table, ("id",))
+        if len(cols) == 1:
+            return row.get(cols[0])
+        return tuple(row.get(c) for c in cols)
+
+    def _account(self, table: str, op: str, data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        payload = json.dumps(data, default=str)
+        if not self._trigger_depth:
+            self.round_trips += 1
+            self.calls[(table, op)] += 1
+            self.rows_read += len(data)
+            self.bytes_read += len(payload)
+        return json.loads(payload)
+
+
+class InMemoryRpc:
+    def __init__(self, client: InMemoryClient, name: str, params: Dict[str, Any]):
+        self.client = client
+        self.name = name
+        self.params = params
+
+    def execute(self) -> APIResponse:
+        fn = self.client.rpcs.get(self.name)
+        if fn is None:
+            raise RuntimeError(f"Could not find the function public.{self.name}")
+        data = fn(self.client, self.params)
+        if isinstance(data, dict):
+            data = [data]
+        return APIResponse(self.client._account(f"rpc:{self.name}", "rpc", data or []))
+
+
+class InMemoryQuery:
+    def __init__(self, client: InMemoryClient, table: str):
+        self.client = client
+        self.name = table
+        self.op = "select"
+        self.columns: Optional[List[str]] = None
+        self.filters: List[Callable[[Dict[str, Any]], bool]] = []
+        self.orders: List[Tuple[str, bool]] = []
+        self._limit: Optional[int] = None
+        self._offset = 0
+        self.payload: Any = None
+        self.count_mode: Optional[str] = None
+
+    # --- operazioni ---
+    def select(self, columns: str = "*", count: Optional[str] = None):
+        self.op = "select"
+        self.count_mode = count
+        cols = [c.strip() for c in columns.split(",") if c.strip()]
+        self.columns = None if "*" in cols else [_parse_column(c) for c in cols]
+        return self
+
+    def insert(self, payload):
+        self.op, self.payload = "insert", payload
+        return self
+
+    def upsert(self, payload, on_conflict: Optional[str] = None):
+        self.op, self.payload = "upsert", payload
+        return self
+
+    def update(self, payload):
+        self.op, self.payload = "update", payload
+        return self
+
+    def delete(self):
+        self.op = "delete"
+        return self
+
+    # --- filtri ---
+    def _f(self, fn):
+        self.filters.append(fn)
+        return self
+
+    def eq(self, col, val):
+        return self._f(lambda r: _norm(r.get(col)) == _norm(val))
+
+    def neq(self, col, val):
+        return self._f(lambda r: _norm(r.get(col)) != _norm(val))
+
+    def in_(self, col, vals):
+        vs = set(_norm(v) for v in vals)
+        return self._f(lambda r: _norm(r.get(col)) in vs)
+
+    def gt(self, col, val):
+        return self._f(lambda r: r.get(col) is not None and _norm(r.get(col)) > _norm(val))
+
+    def gte(self, col, val):
+        return self._f(lambda r: r.get(col) is not None and _norm(r.get(col)) >= _norm(val))
+
+    def lt(self, col, val):
+        return self._f(lambda r: r.get(col) is not None and _norm(r.get(col)) < _norm(val))
+
+    def lte(self, col, val):
+        return self._f(lambda r: r.get(col) is not None and _norm(r.get(col)) <= _norm(val))
+
+    def is_(self, col, val):
+        target = None if val in (None, "null") else val
+        return self._f(lambda r: r.get(col) is target or r.get(col) == target)
+
+    def or_(self, expr: str):
+        """Sottoinsieme PostgREST: 'a.lt.x,and(a.eq.x,b.lt.y)' (usato dal keyset)."""
+        preds = [_parse_or_term(t) for t in split_top(expr)]
+        return self._f(lambda r: any(p(r) for p in preds))
+
+    def order(self, col, desc: bool = False):
+        self.orders.append((col, desc))
+        return self
+
+    def limit(self, n: int):
+        self._limit = n
+        return self
+
+    def range(self, start: int, end: int):
+        self._offset, self._limit = start, end - start + 1
+        return self
+
+    # --- esecuzione ---
+    def _match(self) -> List[Dict[str, Any]]:
+        rows = [r for r in self.client.tables[self.name].values() if all(f(r) for f in self.filters)]
+        for col, desc in reversed(self.orders):
+            rows.sort(key=lambda r: (r.get(col) is None, _norm(r.get(col))), reverse=desc)
+        return rows
+
+    def execute(self) -> APIResponse:
+        c = self.client
+        tbl = c.tables[self.name]
+
+        if self.op == "select":
+            rows = self._match()
+            total = len(rows)
+            rows = rows[self._offset:]
+            if self._limit is not None:
+                rows = rows[:self._limit]
+            if self.columns is not None:
+                rows = [{alias: get(r) for alias, get in self.columns} for r in rows]
+            return APIResponse(c._account(self.name, "select", rows), total if self.count_mode else None)
+
+        if self.op in ("insert", "upsert"):
+            items = self.payload if isinstance(self.payload, list) else [self.payload]
+            out = []
+            for item in items:
+                row = json.loads(json.dumps(item, default=str))
+                if self.name in TOUCH_COLUMNS:
+                    row[TOUCH_COLUMNS[self.name]] = _now_iso()
+                if self.name in IDENTITY_TABLES and "id" not in row:
+                    row["id"] = next(c._ids[self.name])
+                key = c.key_of(self.name, row)
+                old = dict(tbl[key]) if key in tbl else None
+                if self.op == "upsert" and key in tbl:
+                    tbl[key].update(row)
+                else:
+                    tbl[key] = row
+                out.append(tbl[key])
+                c.fire(self.name, old, dict(tbl[key]))
+            return APIResponse(c._account(self.name, self.op, out))
+
+        if self.op == "update":
+            rows = self._match()
+            patch = json.loads(json.dumps(self.payload, default=str))
+            if self.name in TOUCH_COLUMNS:
+                patch[TOUCH_COLUMNS[self.name]] = _now_iso()
+            for r in rows:
+                old = dict(r)
+                r.update(patch)
+                c.fire(self.name, old, dict(r))
+            return APIResponse(c._account(self.name, "update", rows))
+
+        if self.op == "delete":
+            rows = self._match()
+            for r in rows:
+                tbl.pop(c.key_of(self.name, r), None)
+            for child, fk in CASCADES.get(self.name, []):
+                gone = {r.get("id") for r in rows}
+                for k in [k for k, cr in c.tables[child].items() if cr.get(fk) in gone]:
+                    del c.tables[child][k]
+            for r in rows:
+                c.fire(self.name, dict(r), None)
+            return APIResponse(c._account(self.name, "delete", rows))
+
+        raise ValueError(f"Unsupported op {self.op}")
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _norm(v):
+    """Confronti coerenti tra int/str come fa PostgREST sui parametri in query string."""
+    if isinstance(v, bool) or v is None:
+        return v
+    if isinstance(v, (int, float)):
+        return float(v)
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return str(v)
+
+
+def _parse_column(spec: str) -> Tuple[str, Callable[[Dict[str, Any]], Any]]:
+    """'col', 'col->key' o 'alias:col->key' (proiezione JSON di PostgREST)."""
+    alias, _, path = spec.rpartition(":")
+    parts = path.replace("->>", "->").split("->")
+    alias = alias or parts[-1]
+
+    def get(row):
+        v = row.get(parts[0])
+        for key in parts[1:]:
+            v = v.get(key) if isinstance(v, dict) else None
+        return v
+    return alias, get
+
+
+_OPS = {
+    "eq": lambda a, b: a == b, "neq": lambda a, b: a != b,
+    "lt": lambda a, b: a < b, "lte": lambda a, b: a <= b,
+    "gt": lambda a, b: a > b, "gte": lambda a, b: a >= b,
+}
+
+
+def _parse_or_term(term: str):
+    term = term.strip()
+    if term.startswith("and(") and term.endswith(")"):
+        preds = [_parse_or_term(t) for t in split_top(term[4:-1])]
+        return lambda r: all(p(r) for p in preds)
+    col, op, val = term.split(".", 2)
+    if len(val) > 1 and val[0] == val[-1] == '"':
+        val = val[1:-1]
+    fn = _OPS[op]
+    return lambda r: r.get(col) is not None and fn(_norm(r.get(col)), _norm(val))
@@ -0,0 +1,60 @@
+import contextlib
+from typing import List, Optional
+from services.api import StravaService, WeatherService
+from services.db import DatabaseService
+from offline.fixtures import SyntheticAthlete
+from offline.memory_db import InMemoryClient
+from offline.transport import OfflineTransport, VirtualClock, virtual_sleep
+from services.stats_rpc import register_stats_rpcs
+from services.athlete_summary import register_summary
+
+
+class OfflineStack:
+    """
+    Servizi dell'app cablati sugli stand-in offline:
+    StravaService + WeatherService -> OfflineTransport, DatabaseService -> InMemoryClient
+    (o un altro StorageClient passato come client=, es. SQLiteClient embedded).
+
+    Uso:
+        stack = OfflineStack(SyntheticAthlete(n_activities=500))
+        with stack.active():
+            safe_strava_sync(stack.auth, stack.db, ScoreEngine(), stack.token, ...)
+        print(stack.transport.http_requests, stack.client.round_trips, stack.clock.slept)
+    """
+
+    def __init__(self, athletes, clock: Optional[VirtualClock] = None, client=None, **transport_kw):
+        if isinstance(athletes, SyntheticAthlete):
+            athletes = [athletes]
+        self.athletes: List[SyntheticAthlete] = list(athletes)
+        self.clock = clock or VirtualClock()
+        self.transport = OfflineTransport(self.athletes, clock=self.clock, **transport_kw)
+        if client is None:
+            client = InMemoryClient()
+            register_stats_rpcs(client)
+            register_summary(client)
+        self.client = client
+        self.auth = StravaService("offline-client", "offline-secret", http=self.transport)
+        self.db = DatabaseService("offline://", "offline", client=self.client)
+
+        for a in self.athletes:
+            self.client.table("athletes").upsert(a.profile).execute()
+        if hasattr(self.client, "round_trips"):
+            self.client.round_trips = 0
+
+    def token_for(self, athlete_id: int) -> str:
+        return f"offline-{athlete_id}"
+
+    @property
+    def token(self) -> str:
+        return self.token_for(self.athletes[0].athlete_id)
+
+    @contextlib.contextmanager
+    def active(self):
+        """Meteo sul trasporto offline e time.sleep sull'orologio virtuale."""
+        real_http = WeatherService.http
+        WeatherService.http = self.transport
+        try:
+            with virtual_sleep(self.clock):
+                yield self
+        finally:
+            WeatherService.http = real_http
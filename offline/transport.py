@@ -0,0 +1,252 @@
+import os
+import json
+import time
+import contextlib
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse, parse_qsl
+import requests
+from offline.fixtures import SyntheticAthlete, hourly_weather
+
+WINDOW_SEC = 15 * 60
+DAY_SEC = 24 * 3600
+
+
+class VirtualClock:
+    """
+    Orologio finto: sleep() non blocca, avanza il tempo e accumula i secondi.
+    Con virtual_sleep() sostituisce time.sleep e time.time per tutta la durata
+    del blocco (le attese calcolate sulle finestre Strava restano coerenti).
+    """
+
+    def __init__(self, start: Optional[float] = None):
+        self.t = start if start is not None else datetime(2025, 1, 1, 8, 0).timestamp()
+        self.slept = 0.0
+        self.sleeps = 0
+
+    def time(self) -> float:
+        return self.t
+
+    def sleep(self, seconds: float):
+        seconds = max(float(seconds), 0.0)
+        self.t += seconds
+        self.slept += seconds
+        self.sleeps += 1
+
+    def advance(self, seconds: float):
+        self.t += seconds
+
+
+@contextlib.contextmanager
+def virtual_sleep(clock: VirtualClock):
+    real_sleep, real_time = time.sleep, time.time
+    time.sleep, time.time = clock.sleep, clock.time
+    try:
+        yield clock
+    finally:
+        time.sleep, time.time = real_sleep, real_time
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, payload: Any = None, headers: Optional[Dict[str, str]] = None):
+        self.status_code = status_code
+        self._payload = payload
+        self.headers = headers or {}
+        self.text = json.dumps(payload) if payload is not None else ""
+
+    def json(self):
+        # Copia via JSON, come una vera risposta di rete
+        return json.loads(self.text) if self.text else None
+
+
+class OfflineTransport:
+    """
+    Stand-in di requests (get/post/request) per Strava e Open-Meteo.
+
+    - /athlete/activities con paginazione e filtro 'after'
+    - /activities/{id}, /activities/{id}/streams, /athlete/zones, /oauth/token
+    - header X-RateLimit-Usage/Limit e 429 oltre il budget (finestre 15' e giornaliera)
+    - archivio Open-Meteo con serie orarie deterministiche
+    - weather_down=True simula Open-Meteo irraggiungibile
+
+    Token 'offline-<athlete_id>'; con un solo atleta qualunque token va bene.
+    """
+
+    def __init__(self, athletes, clock: Optional[VirtualClock] = None,
+                 limit_15min: int = 100, limit_daily: int = 1000, weather_down: bool = False):
+        if isinstance(athletes, SyntheticAthlete):
+            athletes = [athletes]
+        self.athletes = {a.athlete_id: a for a in athletes}
+        self.clock = clock or VirtualClock()
+        self.limit_15min = limit_15min
+        self.limit_daily = limit_daily
+        self.weather_down = weather_down
+
+        self.calls = Counter()       # per rotta
+        self.status = Counter()      # per status code
+        self.bytes_out = 0
+        self._usage: Dict[str, int] = {"window": -1, "w_count": 0, "day": -1, "d_count": 0}
+
+    # --- requests-like API ---
+    def get(self, url, params=None, headers=None, timeout=None, **kw):
+        return self.request("GET", url, headers=headers, params=params, timeout=timeout, **kw)
+
+    def post(self, url, data=None, headers=None, timeout=None, **kw):
+        return self.request("POST", url, headers=headers, data=data, timeout=timeout, **kw)
+
+    def request(self, method, url, headers=None, params=None, timeout=None, data=None, **kw):
+        u = urlparse(url)
+        q = dict(parse_qsl(u.query))
+        q.update({k: str(v) for k, v in (params or {}).items()})
+
+        if "open-meteo" in u.netloc:
+            res = self._weather(q)
+        elif "strava.com" in u.netloc:
+            res = self._strava(method, u.path, q, headers or {}, data or {})
+        else:
+            res = FakeResponse(404, {"message": "Not Found"})
+
+        self.status[res.status_code] += 1
+        self.bytes_out += len(res.text)
+        return res
+
+    @property
+    def http_requests(self) -> int:
+        return sum(self.status.values())
+
+    # --- STRAVA ---
+    def _rate_headers(self) -> Dict[str, str]:
+        return {
+            "X-RateLimit-Limit": f"{self.limit_15min},{self.limit_daily}",
+            "X-RateLimit-Usage": f"{self._usage['w_count']},{self._usage['d_count']}"
+        }
+
+    def _consume(self) -> bool:
+        now = self.clock.time()
+        w, d = int(now // WINDOW_SEC), int(now // DAY_SEC)
+        if w != self._usage["window"]:
+            self._usage["window"], self._usage["w_count"] = w, 0
+        if d != self._usage["day"]:
+            self._usage["day"], self._usage["d_count"] = d, 0
+        if self._usage["w_count"] >= self.limit_15min or self._usage["d_count"] >= self.limit_daily:
+            return False
+        self._usage["w_count"] += 1
+        self._usage["d_count"] += 1
+        return True
+
+    def _athlete(self, headers: Dict[str, str]) -> Optional[SyntheticAthlete]:
+        token = headers.get("Authorization", "").replace("Bearer ", "")
+        if token.startswith("offline-"):
+            try:
+                return self.athletes.get(int(token.split("-", 1)[1]))
+            except ValueError:
+                return None
+        return next(iter(self.athletes.values()), None) if len(self.athletes) == 1 else None
+
+    def _strava(self, method, path, q, headers, data) -> FakeResponse:
+        if path.endswith("/oauth/token") and method == "POST":
+            self.calls["oauth"] += 1
+            a = next(iter(self.athletes.values()))
+            return FakeResponse(200, {"access_token": f"offline-{a.athlete_id}", "athlete": a.profile})
+
+        parts = [p for p in path.split("/") if p][2:]  # dopo /api/v3
+        route = "activities_list" if parts[:2] == ["athlete", "activities"] else \
+                "streams" if len(parts) == 3 and parts[0] == "activities" and parts[2] == "streams" else \
+                "activity" if len(parts) == 2 and parts[0] == "activities" else \
+                "zones" if parts[:2] == ["athlete", "zones"] else "other"
+        self.calls[route] += 1
+
+        if not self._consume():
+            self.calls["rate_limited"] += 1
+            return FakeResponse(429, {"message": "Rate Limit Exceeded"}, self._rate_headers())
+
+        ath = self._athlete(headers)
+        if ath is None:
+            return FakeResponse(401, {"message": "Authorization Error"}, self._rate_headers())
+
+        if route == "activities_list":
+            per_page = int(q.get("per_page", 30))
+            page = int(q.get("page", 1))
+            acts = ath.activities
+            if "after" in q:
+                after = int(q["after"])
+                # Con 'after' Strava restituisce dal più vecchio al più recente
+                acts = [a for a in reversed(acts)
+                        if datetime.strptime(a["start_date_local"], "%Y-%m-%dT%H:%M:%SZ").timestamp() > after]
+            chunk = acts[(page - 1) * per_page: page * per_page]
+            return FakeResponse(200, chunk, self._rate_headers())
+
+        if route == "streams":
+            streams = ath.streams(int(parts[1]))
+            if streams is None:
+                return FakeResponse(404, {"message": "Resource Not Found"}, self._rate_headers())
+            return FakeResponse(200, streams, self._rate_headers())
+
+        if route == "activity":
+            act = ath.activity(int(parts[1]))
+            if act is None:
+                return FakeResponse(404, {"message": "Resource Not Found"}, self._rate_headers())
+            return FakeResponse(200, act, self._rate_headers())
+
+        if route == "zones":
+            return FakeResponse(200, {
+                "heart_rate": {"custom_zones": False, "zones": [
+                    {"min": 0, "max": 123}, {"min": 123, "max": 153}, {"min": 153, "max": 169},
+                    {"min": 169, "max": 184}, {"min": 184, "max": 190}]},
+                "power": {"zones": [{"min": 0, "max": 154}, {"min": 155, "max": 210}]}
+            }, self._rate_headers())
+
+        return FakeResponse(404, {"message": "Not Found"}, self._rate_headers())
+
+    # --- OPEN-METEO ---
+    def _weather(self, q) -> FakeResponse:
+        self.calls["weather"] += 1
+        if self.weather_down:
+            raise requests.exceptions.ConnectTimeout("Open-Meteo offline (simulated)")
+        try:
+            start = datetime.strptime(q["start_date"], "%Y-%m-%d")
+            end = datetime.strptime(q["end_date"], "%Y-%m-%d")
+            lat, lon = float(q["latitude"]), float(q["longitude"])
+        except (KeyError, ValueError):
+            return FakeResponse(400, {"error": True, "reason": "Invalid parameters"})
+        days = (end - start).days + 1
+        return FakeResponse(200, {"latitude": lat, "longitude": lon, "hourly": hourly_weather(lat, lon, start, days)})
+
+
+class RecordingTransport:
+    """
+    Avvolge un trasporto reale e salva le risposte Strava come fixture
+    (activities.json + streams/<id>.json) riusabili con
+    SyntheticAthlete.from_fixture_dir.
+    """
+
+    def __init__(self, out_dir: str, inner=requests):
+        self.out_dir = out_dir
+        self.inner = inner
+        self._activities: Dict[int, Dict[str, Any]] = {}
+        os.makedirs(os.path.join(out_dir, "streams"), exist_ok=True)
+
+    def get(self, url, **kw):
+        return self._record(url, self.inner.get(url, **kw))
+
+    def post(self, url, **kw):
+        return self.inner.post(url, **kw)
+
+    def request(self, method, url, **kw):
+        return self._record(url, self.inner.request(method, url, **kw))
+
+    def _record(self, url, res):
+        if res.status_code != 200 or "strava.com" not in url:
+            return res
+        path = urlparse(url).path
+        if path.endswith("/athlete/activities"):
+            for a in res.json() or []:
+                self._activities[a["id"]] = a
+            with open(os.path.join(self.out_dir, "activities.json"), "w", encoding="utf-8") as f:
+                json.dump(list(self._activities.values()), f)
+        elif path.endswith("/streams"):
+            act_id = path.rstrip("/").split("/")[-2]
+            with open(os.path.join(self.out_dir, "streams", f"{act_id}.json"), "w", encoding="utf-8") as f:
+                json.dump(res.json(), f)
+        return res
@@ -0,0 +1,38 @@
+"""
+Riparazione di athlete_summary (migrations/v4_7_athlete_summary.sql).
+
+Uso:
+    python rebuild_athlete_summary.py [--athlete ID]
+
+Il riepilogo è mantenuto in modo incrementale dal trigger su runs; questo job
+lo ricostruisce da zero leggendo runs (un atleta, o tutti senza --athlete),
+es. dopo import massivi fatti a trigger disabilitato o per verificare una deriva.
+Idempotente: si può rilanciare quando si vuole.
+"""
+import argparse
+from config import Config
+from services.db import DatabaseService
+from services.storage import create_storage_client
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild athlete_summary from runs")
+    parser.add_argument("--athlete", type=int, default=None, help="solo questo atleta (default: tutti)")
+    args = parser.parse_args()
+
+    logger = Config.setup_logging()
+    if Config.get_storage_backend() == "sqlite":
+        db = DatabaseService(None, None, client=create_storage_client("sqlite"))
+    else:
+        creds = Config.get_supabase_creds()
+        db = DatabaseService(creds["url"], creds["key"])
+
+    n = db.rebuild_athlete_summary(args.athlete)
+    if n < 0:
+        logger.error("[SUMMARY] ricostruzione fallita (migrazione v4_7 applicata?)")
+        raise SystemExit(1)
+    logger.info(f"[SUMMARY] riepilogo ricostruito per {n} atleti")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Replay offline di eventi push Strava attraverso PushIngestor.
+
+Uso:
+    python replay_push_events.py events.jsonl [--fixtures DIR] [--activities N]
+
+- events.jsonl: un evento webhook Strava per riga
+- DIR: risposte Strava registrate con offline.transport.RecordingTransport
+  (activities.json + streams/<id>.json), una per owner_id degli eventi.
+  Senza --fixtures ogni owner_id è un SyntheticAthlete di N attività, con id
+  owner_id * 10_000_000 + 1 .. N; un id che non esiste risponde 404 come Strava.
+
+Nessuna chiamata di rete: gira sugli stand-in di offline.stack.OfflineStack
+(StravaService e meteo sul trasporto offline, DatabaseService in memoria).
+"""
+import sys
+import json
+import argparse
+from config import Config
+from engine.core import ScoreEngine
+from offline.fixtures import SyntheticAthlete
+from offline.stack import OfflineStack
+from services.push_ingest import PushIngestor
+
+
+def _athletes(events, fixtures_dir=None, n_activities=50):
+    owners = sorted(set(int(ev["owner_id"]) for ev in events if ev.get("owner_id") is not None)) or [1]
+    if fixtures_dir:
+        return [SyntheticAthlete.from_fixture_dir(fixtures_dir, athlete_id=o) for o in owners]
+    return [SyntheticAthlete(athlete_id=o, n_activities=n_activities) for o in owners]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay offline di eventi push Strava")
+    parser.add_argument("events", help="file JSONL di eventi ('-' per stdin)")
+    parser.add_argument("--fixtures", help="cartella registrata da RecordingTransport (activities.json + streams/)")
+    parser.add_argument("--activities", type=int, default=50, help="attività per atleta sintetico (senza --fixtures)")
+    args = parser.parse_args()
+
+    Config.setup_logging()
+    src = sys.stdin if args.events == "-" else open(args.events, "r", encoding="utf-8")
+    with src:
+        events = [json.loads(line) for line in src if line.strip()]
+
+    stack = OfflineStack(_athletes(events, args.fixtures, args.activities))
+    ingestor = PushIngestor(stack.auth, stack.db, ScoreEngine(), token_provider=stack.token_for)
+
+    with stack.active():
+        for ev in events:
+            print(json.dumps(ingestor.handle_event(ev), default=float))
+
+    runs = stack.client.table("runs").select("id").execute().data or []
+    print(f"\n{len(events)} eventi, {stack.transport.http_requests} richieste HTTP, {len(runs)} corse in memoria", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
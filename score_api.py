@@ -0,0 +1,53 @@
+"""
+API HTTP locale di scoring (vedi services/score_server.py), senza Streamlit.
+
+Uso:
+    python score_api.py                               # 127.0.0.1:8765
+    python score_api.py --port 9000 --max-batch 128 --max-wait-ms 2 --weight 64 --sex F
+
+    curl -s localhost:8765/score -d @activity.json
+    curl -s localhost:8765/score/batch -d '{"runs": [...], "athlete": {"weight": 64}}'
+    curl -s localhost:8765/metrics
+
+I parametri fisici da riga di comando sono i default del server; quelli nel
+record (o in "athlete" per il batch) li sovrascrivono.
+"""
+import argparse
+from typing import Optional
+
+from config import Config
+from services.record_scoring import default_phys
+from services.score_server import create_server
+
+
+def main(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description="Local HTTP scoring API around ScoreEngine")
+    parser.add_argument("--host", default=Config.SCORE_API_HOST)
+    parser.add_argument("--port", type=int, default=Config.SCORE_API_PORT)
+    parser.add_argument("--max-batch", type=int, default=Config.SCORE_API_MAX_BATCH, help="corse per micro-batch (1 = niente batching)")
+    parser.add_argument("--max-wait-ms", type=float, default=Config.SCORE_API_MAX_WAIT_MS, help="attesa massima per riempire un micro-batch")
+    parser.add_argument("--weight", type=float)
+    parser.add_argument("--hr-max", type=int)
+    parser.add_argument("--hr-rest", type=int)
+    parser.add_argument("--age", type=int)
+    parser.add_argument("--sex", choices=["M", "F"])
+    args = parser.parse_args(argv)
+
+    logger = Config.setup_logging()
+    phys = default_phys(weight=args.weight, hr_max=args.hr_max, hr_rest=args.hr_rest, age=args.age, sex=args.sex)
+    server = create_server(args.host, args.port, phys=phys, max_batch=args.max_batch, max_wait_ms=args.max_wait_ms)
+    server.service.warm_up()
+    host, port = server.server_address[:2]
+    logger.info(f"[API] in ascolto su http://{host}:{port} (Engine {Config.ENGINE_VERSION}, "
+                f"micro-batch {args.max_batch} / {args.max_wait_ms} ms)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        logger.info("[API] fermato")
+
+
+if __name__ == "__main__":
+    main()
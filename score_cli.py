@@ -0,0 +1,140 @@
+"""
+Scoring SCORE da riga di comando, senza Streamlit.
+
+Uso:
+    python score_cli.py activities.jsonl [altro.jsonl ...] > scored.jsonl
+    cat history.jsonl | python score_cli.py --workers 8 --weight 64 --age 41 --sex F
+
+Input: JSONL (file o stdin, '-'), un record per riga: attività Strava (summary
+API, stream opzionali) o righe di storico (vedi services/record_scoring.py).
+I parametri fisici da riga di comando valgono per tutti i record, quelli nel
+record (weight, hr_max, hr_rest, age, sex) li sovrascrivono.
+
+Output: JSONL su stdout nello stesso ordine dell'input, un risultato per riga.
+Un record non valido produce {"line": N, "error": "..."} e il job prosegue
+(exit code 1 a fine run se ci sono stati errori).
+
+Lo scoring gira su un pool di processi (--workers, default: CPU), con una
+finestra limitata di record in volo: memoria costante anche su file enormi.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import itertools
+import multiprocessing
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+from config import Config
+from services.record_scoring import default_phys, score_record
+
+# Stato del processo worker (inizializzato una volta per processo)
+_engine = None
+_phys: Dict[str, Any] = {}
+
+
+def _init_worker(phys: Dict[str, Any]):
+    global _engine, _phys
+    from engine.core import ScoreEngine
+    _engine = ScoreEngine()
+    _phys = phys
+
+
+def _score_line(item: Tuple[int, str]) -> Tuple[bool, str]:
+    """(ok, riga JSON del risultato)"""
+    lineno, line = item
+    try:
+        rec = json.loads(line)
+        if not isinstance(rec, dict):
+            raise ValueError("record is not a JSON object")
+        ok, out = True, score_record(_engine, rec, _phys)
+    except Exception as e:
+        ok, out = False, {"line": lineno, "error": str(e)}
+    return ok, json.dumps(out, default=float, ensure_ascii=False)
+
+
+def _read_lines(paths) -> Iterator[Tuple[int, str]]:
+    """(numero riga globale, testo) dei record non vuoti, file dopo file."""
+    n = 0
+    for path in paths or ["-"]:
+        f = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+        try:
+            for line in f:
+                n += 1
+                if line.strip():
+                    yield n, line
+        finally:
+            if f is not sys.stdin:
+                f.close()
+
+
+def _windows(items: Iterable, size: int) -> Iterator[list]:
+    it = iter(items)
+    while True:
+        chunk = list(itertools.islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def score_stream(paths, out, workers: int, phys: Dict[str, Any], chunksize: int = 16) -> Dict[str, int]:
+    """Scora tutti i record e scrive i risultati in ordine. Ritorna i contatori."""
+    stats = {"records": 0, "errors": 0}
+
+    def emit(results: Iterable[Tuple[bool, str]]):
+        for ok, line in results:
+            stats["records"] += 1
+            stats["errors"] += not ok
+            out.write(line + "\n")
+
+    lines = _read_lines(paths)
+    if workers <= 1:
+        _init_worker(phys)
+        emit(map(_score_line, lines))
+        return stats
+
+    # imap mantiene l'ordine; a finestre per non accodare tutto l'input in memoria
+    window = workers * chunksize * 4
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(phys,)) as pool:
+        for batch in _windows(lines, window):
+            emit(pool.imap(_score_line, batch, chunksize))
+            out.flush()
+    return stats
+
+
+def _default_workers() -> int:
+    # CPU davvero assegnate al processo (container/cgroup), non quelle dell'host
+    if hasattr(os, "sched_getaffinity"):
+        return max(len(os.sched_getaffinity(0)), 1)
+    return os.cpu_count() or 1
+
+
+def main(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description="Score JSONL activities with ScoreEngine (headless)")
+    parser.add_argument("inputs", nargs="*", help="file JSONL ('-' o nessuno = stdin)")
+    parser.add_argument("--workers", type=int, default=_default_workers(), help="processi di scoring (1 = in-process)")
+    parser.add_argument("--chunksize", type=int, default=16, help="record per task inviato ai worker")
+    parser.add_argument("--weight", type=float)
+    parser.add_argument("--hr-max", type=int)
+    parser.add_argument("--hr-rest", type=int)
+    parser.add_argument("--age", type=int)
+    parser.add_argument("--sex", choices=["M", "F"])
+    args = parser.parse_args(argv)
+
+    logger = Config.setup_logging()
+    phys = default_phys(weight=args.weight, hr_max=args.hr_max, hr_rest=args.hr_rest, age=args.age, sex=args.sex)
+
+    t0 = time.perf_counter()
+    stats = score_stream(args.inputs, sys.stdout, args.workers, phys, args.chunksize)
+    sys.stdout.flush()
+    wall = time.perf_counter() - t0
+    rate = stats["records"] / wall if wall > 0 else 0
+    logger.info(f"[CLI] {stats['records']} record in {wall:.2f}s ({rate:.0f}/s, {args.workers} worker), "
+                f"{stats['errors']} errori (Engine {Config.ENGINE_VERSION})")
+    if stats["errors"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,3 @@
-import google.generativeai as genai
 import json
 import requests
 import time
@@ -6,6 +5,7 @@ import logging
 from datetime import datetime, timedelta
 from typing import Optional, Dict, List, Any, Tuple
 from config import Config
+from services.resilience import resilient_request, strava_retry_after, RetryPolicy, STRAVA_POLICY, WEATHER_POLICY
 
 # Setup Logger
 logger = logging.getLogger("sCore.API")
@@ -18,6 +18,8 @@ class AICoachService:
             logger.warning("Gemini API Key missing")
             return
         
+        # SDK Gemini (~1 s di import) caricato solo quando serve il coach
+        import google.generativeai as genai
         genai.configure(api_key=api_key)
         self.model = genai.GenerativeModel('gemini-pro')
 
@@ -65,6 +67,7 @@ class AICoachService:
 
 class WeatherService:
     BASE_URL = Config.OPEN_METEO_URL
+    http = requests  # trasporto HTTP (sostituibile con uno stand-in offline)
 
     @staticmethod
     def get_weather(lat: float, lon: float, date_str: str, hour: int) -> Tuple[float, float]:
@@ -80,8 +83,12 @@ class WeatherService:
                 "end_date": date_str,
                 "hourly": "temperature_2m,relative_humidity_2m"
             }
-            res = requests.get(WeatherService.BASE_URL, params=params, timeout=5)
-            
+            res = resilient_request(WeatherService.http, "GET", WeatherService.BASE_URL, WEATHER_POLICY, params=params, timeout=5)
+            if res is None:
+                # Open-Meteo irraggiungibile o circuito aperto: niente attese, fallback subito
+                logger.warning("Weather API unavailable, using fallback 20°C/50%")
+                return 20.0, 50.0
+
             if res.status_code == 200:
                 data = res.json()
                 if "hourly" in data:
@@ -99,12 +106,49 @@ class WeatherService:
             logger.error(f"WeatherService Error: {e}")
             return 20.0, 50.0 # Fallback Safe
 
+    @staticmethod
+    def get_weather_range(lat: float, lon: float, start_date: str, end_date: str) -> Optional[Dict[str, List[Optional[float]]]]:
+        """
+        Scarica la serie oraria (temperatura/umidità) per un intervallo di date.
+        Ritorna il blocco 'hourly' di Open-Meteo o None in caso di errore.
+        """
+        try:
+            params = {
+                "latitude": lat,
+                "longitude": lon,
+                "start_date": start_date,
+                "end_date": end_date,
+                "hourly": "temperature_2m,relative_humidity_2m",
+                "timezone": "auto"  # start_date_local di Strava è in ora locale
+            }
+            res = resilient_request(WeatherService.http, "GET", WeatherService.BASE_URL, WEATHER_POLICY, params=params, timeout=15)
+            if res is None:
+                logger.warning("Weather range API unavailable")
+                return None
+
+            if res.status_code == 200:
+                data = res.json()
+                if "hourly" in data:
+                    return data["hourly"]
+
+            logger.warning(f"Weather range API returned {res.status_code}")
+            return None
+
+        except Exception as e:
+            logger.error(f"WeatherService Range Error: {e}")
+            return None
+
 
 class StravaService:
-    def __init__(self, client_id: str, client_secret: str):
+    def __init__(self, client_id: str, client_secret: str, http=None):
         self.client_id = client_id
         self.client_secret = client_secret
+        # Trasporto HTTP: il modulo requests o uno stand-in con get/post/request
+        self.http = http or requests
         self.base_url = Config.STRAVA_BASE_URL
+        self.rate_limits: Dict[str, Any] = {}
+        # Budget esaurito (429 non recuperabile): fino a qui le chiamate si rimandano
+        self.deferred_until = 0.0
     
     def get_link(self, redirect_uri: str) -> str:
         # NOTA: Aggiunto 'profile:read_all' per leggere Peso e Zone Cardiache
@@ -120,8 +164,11 @@ class StravaService:
         all_activities = []
 
         for page in range(1, max_pages + 1):
-            res = requests.get(
+            res = resilient_request(
+                self.http, "GET",
                 f"{self.base_url}/athlete/activities",
+                STRAVA_POLICY,
+                on_response=self._record_rate_limits,
                 headers=headers,
                 params={
                     "per_page": per_page,
@@ -130,8 +177,8 @@ class StravaService:
                 timeout=20
             )
             # Safe parsing
-            if res.status_code != 200:
-                logger.error(f"Strava API Error (Simple Fetch): {res.text}")
+            if res is None or res.status_code != 200:
+                logger.error(f"Strava API Error (Simple Fetch): {res.text if res is not None else 'unreachable'}")
                 break
                 
             acts = res.json()
@@ -148,7 +195,7 @@ class StravaService:
 
     def get_token(self, code: str) -> Optional[Dict[str, Any]]:
         try:
-            res = requests.post("https://www.strava.com/oauth/token", data={
+            res = self.http.post("https://www.strava.com/oauth/token", data={
                 "client_id": self.client_id,
                 "client_secret": self.client_secret,
                 "code": code,
@@ -161,47 +208,66 @@ class StravaService:
             pass
         return None
 
-    def _request_with_retry(self, method: str, url: str, headers: Dict[str, str]=None, params: Dict[str, Any]=None, max_retries: int=3) -> Optional[Any]:
-        """Wrapper con gestione Rate Limit e Retries"""
-        for i in range(max_retries):
-            try:
-                res = requests.request(method, url, headers=headers, params=params, timeout=10)
-                
-                if res.status_code == 200:
-                    # Capture Rate Limit Headers (Dev Console)
-                    try:
-                        import streamlit as st
-                        usage = res.headers.get("X-RateLimit-Usage", "").split(',')
-                        limit = res.headers.get("X-RateLimit-Limit", "").split(',')
-                        
-                        st.session_state.dev_rate_limits = {
-                            "usage_15min": int(usage[0]) if len(usage) > 0 else 0,
-                            "usage_daily": int(usage[1]) if len(usage) > 1 else 0,
-                            "limit_15min": int(limit[0]) if len(limit) > 0 else 0,
-                            "limit_daily": int(limit[1]) if len(limit) > 1 else 0,
-                            "full_headers": dict(res.headers)
-                        }
-                    except: 
-                        pass
-                        
-                    return res.json()
-                
-                if res.status_code == 429:
-                    # Rate Limit
-                    logger.warning(f"Strava Rate Limit Hit! Waiting... (Attempt {i+1})")
-                    time.sleep(10 * (i+1)) # Backoff aggressivo
-                    continue
-                
-                # Altri errori (401, 500)
-                logger.error(f"Strava API Error {res.status_code}: {res.text}")
-                return None
-                
-            except requests.exceptions.RequestException as e:
-                logger.error(f"Network Error: {e}")
-                time.sleep(2)
-        
+    def _record_rate_limits(self, res):
+        """Salva l'ultimo stato dei rate limit Strava (scheduler stream + Dev Console)"""
+        usage = res.headers.get("X-RateLimit-Usage", "").split(',')
+        limit = res.headers.get("X-RateLimit-Limit", "").split(',')
+        if len(usage) < 2 or len(limit) < 2:
+            return
+        try:
+            self.rate_limits = {
+                "usage_15min": int(usage[0]),
+                "usage_daily": int(usage[1]),
+                "limit_15min": int(limit[0]),
+                "limit_daily": int(limit[1]),
+                "seen_at": time.time()
+            }
+        except ValueError:
+            return
+
+        # Capture Rate Limit Headers (Dev Console)
+        try:
+            import streamlit as st
+            st.session_state.dev_rate_limits = dict(self.rate_limits, full_headers=dict(res.headers))
+        except: 
+            pass
+
+    def _request_with_retry(self, method: str, url: str, headers: Dict[str, str]=None, params: Dict[str, Any]=None, max_retries: int=3, not_found: Any=None) -> Optional[Any]:
+        """
+        Wrapper con gestione Rate Limit e Retries (attese da header + jitter, circuit breaker per host).
+        not_found: valore da ritornare su 404 (risorsa che non esiste, non un errore da riprovare).
+        """
+        policy = STRAVA_POLICY
+        if max_retries != policy.max_retries:
+            policy = RetryPolicy(max_retries=max_retries, wait_429=policy.wait_429)
+
+        res = resilient_request(self.http, method, url, policy, on_response=self._record_rate_limits,
+                                headers=headers, params=params, timeout=10)
+        if res is None:
+            return None
+
+        if res.status_code == 200:
+            return res.json()
+
+        if res.status_code == 429:
+            # Niente attese lunghe nel thread: chi chiama rimanda (vedi rate_limited())
+            wait = strava_retry_after(res) or Config.RETRY_MAX_WAIT_SEC
+            self.deferred_until = max(self.deferred_until, time.time() + wait)
+            self.rate_limits["deferred_until"] = self.deferred_until
+            logger.warning(f"Strava rate limit: chiamate rimandate di {wait:.0f}s")
+            return None
+
+        if res.status_code == 404 and not_found is not None:
+            return not_found
+
+        # Altri errori (401, 404, 429 non recuperabile, 5xx persistente)
+        logger.error(f"Strava API Error {res.status_code}: {res.text}")
         return None
 
+    def rate_limited(self) -> bool:
+        """True finché il budget Strava è esaurito (dopo un 429 non recuperabile)."""
+        return time.time() < self.deferred_until
+
     def fetch_activities(self, token: str, days_back: int=365, after_timestamp: int=None) -> List[Dict[str, Any]]:
         headers = {"Authorization": f"Bearer {token}"}
         
@@ -233,10 +299,17 @@ class StravaService:
             
         return all_activities
 
+    def fetch_activity(self, token: str, activity_id: int) -> Optional[Dict[str, Any]]:
+        """Dettaglio di una singola attività (usato dall'ingestion push)"""
+        headers = {"Authorization": f"Bearer {token}"}
+        url = f"{self.base_url}/activities/{activity_id}"
+        return self._request_with_retry("GET", url, headers=headers)
+
     def fetch_streams(self, token: str, activity_id: int) -> Optional[Dict[str, Any]]:
+        """Stream watts/heartrate. {} se l'attività non ha stream (404), None su errore o rate limit."""
         headers = {"Authorization": f"Bearer {token}"}
         url = f"{self.base_url}/activities/{activity_id}/streams?keys=watts,heartrate&key_by_type=true"
-        return self._request_with_retry("GET", url, headers=headers)
+        return self._request_with_retry("GET", url, headers=headers, not_found={})
 
     # --- NUOVO METODO AGGIUNTO ---
     def fetch_zones(self, token: str) -> Optional[Dict[str, Any]]:
@@ -0,0 +1,205 @@
+"""
+Riepilogo materializzato per atleta (tabella athlete_summary, migrations/v4_7).
+
+Su Postgres lo mantiene il trigger trg_runs_athlete_summary nella stessa
+transazione della scrittura su runs; qui c'è la stessa logica in Python per i
+backend senza trigger PL/pgSQL (SQLiteClient, InMemoryClient):
+
+- contatori (total_runs, total_km, best_score) aggiornati per differenza OLD/NEW
+- finestra delle ultime RECENT_WINDOW corse (recent) da cui derivano
+  last_*, ma_7, ma_28, ma7_delta e streak
+- rilettura limitata (indice athlete_id, date) solo quando una cancellazione
+  svuota la finestra, una corsa della finestra cambia data o finisce in coda,
+  o la corsa migliore peggiora
+
+rebuild_summary() ricostruisce da zero (job di riparazione, RPC rebuild_athlete_summary).
+"""
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from services.stats_rpc import streak
+
+# Corse tenute nella finestra: bastano per MA28 e per l'MA7 della corsa precedente
+RECENT_WINDOW = 28
+
+# Colonne di runs che cambiano il riepilogo (le altre scritture non toccano la tabella)
+SUMMARY_FIELDS = ("athlete_id", "date", "score", "distance_km")
+
+# Rilettura dal DB: athlete_id -> (ultime RECENT_WINDOW corse dalla più recente, corsa migliore)
+Reload = Callable[[int], Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]]
+
+
+def _entry(run: Dict[str, Any]) -> Dict[str, Any]:
+    return {"id": run["id"], "date": str(run.get("date")), "score": run.get("score")}
+
+
+def _sort_key(e: Dict[str, Any]):
+    return (str(e.get("date")), e.get("id") or 0)
+
+
+def _mean(values: List[float]) -> Optional[float]:
+    return sum(values) / len(values) if values else None
+
+
+def empty_summary(athlete_id: int) -> Dict[str, Any]:
+    return {
+        "athlete_id": athlete_id,
+        "total_runs": 0,
+        "total_km": 0.0,
+        "best_score": None,
+        "best_run_id": None,
+        "last_run_id": None,
+        "last_run_date": None,
+        "last_score": None,
+        "ma_7": None,
+        "ma_28": None,
+        "ma7_delta": 0,
+        "streak": 0,
+        "recent": [],
+        "updated_at": None
+    }
+
+
+def _derive(s: Dict[str, Any]) -> Dict[str, Any]:
+    """Campi calcolati dalla finestra recent (dalla più recente)."""
+    recent = s["recent"]
+    scored = [e["score"] for e in recent if e.get("score") is not None]
+    last = recent[0] if recent else {}
+    s["last_run_id"] = last.get("id")
+    s["last_run_date"] = last.get("date")
+    s["last_score"] = last.get("score")
+    s["ma_7"] = _mean(scored[:7])
+    s["ma_28"] = _mean(scored[:28])
+    s["ma7_delta"] = (s["ma_7"] - _mean(scored[1:8])) if len(scored) > 1 else 0
+    s["streak"] = streak(recent[::-1]) if recent else 0
+    s["updated_at"] = datetime.now(timezone.utc).isoformat()
+    return s
+
+
+def changed(old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> bool:
+    if old is None or new is None:
+        return True
+    return any(str(old.get(c)) != str(new.get(c)) for c in SUMMARY_FIELDS)
+
+
+def fold_run(
+    summary: Optional[Dict[str, Any]],
+    athlete_id: int,
+    old: Optional[Dict[str, Any]],
+    new: Optional[Dict[str, Any]],
+    reload: Reload
+) -> Dict[str, Any]:
+    """
+    Applica una scrittura su runs (INSERT: old None, DELETE: new None) al
+    riepilogo dell'atleta. old/new sono già dello stesso atleta.
+    """
+    s = dict(summary or empty_summary(athlete_id))
+    s["recent"] = list(s.get("recent") or [])
+    if old:
+        s["total_runs"] -= 1
+        s["total_km"] -= old.get("distance_km") or 0
+    if new:
+        s["total_runs"] += 1
+        s["total_km"] += new.get("distance_km") or 0
+
+    ids = {r["id"] for r in (old, new) if r}
+    was_in = any(e["id"] in ids for e in s["recent"])
+    s["recent"] = [e for e in s["recent"] if e["id"] not in ids]
+    if new:
+        s["recent"].append(_entry(new))
+        s["recent"].sort(key=_sort_key, reverse=True)
+        del s["recent"][RECENT_WINDOW:]
+
+    best_lost = old is not None and old["id"] == s.get("best_run_id") and (
+        new is None or new.get("score") is None or new["score"] < (old.get("score") or 0)
+    )
+    short = len(s["recent"]) < min(s["total_runs"], RECENT_WINDOW)
+    # Una corsa della finestra spostata di data, o finita in coda con altre corse
+    # fuori finestra: la vera ultima corsa della finestra può essere una di quelle
+    moved = bool(old and new) and was_in and str(old.get("date")) != str(new.get("date"))
+    at_tail = bool(new) and s["total_runs"] > RECENT_WINDOW and bool(s["recent"]) \
+        and s["recent"][-1]["id"] == new["id"]
+    if best_lost or short or moved or at_tail:
+        recent, best = reload(athlete_id)
+        s["recent"] = [_entry(r) for r in recent]
+        s["best_score"] = best.get("score") if best else None
+        s["best_run_id"] = best.get("id") if best else None
+    if new and new.get("score") is not None and (s["best_score"] is None or new["score"] > s["best_score"]):
+        s["best_score"], s["best_run_id"] = new["score"], new["id"]
+
+    s["total_km"] = round(s["total_km"], 3)
+    return _derive(s)
+
+
+def rebuild_summary(athlete_id: int, runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Riepilogo da zero sull'intero storico (qualsiasi ordine)."""
+    s = empty_summary(athlete_id)
+    ordered = sorted(runs, key=_sort_key, reverse=True)
+    scored = [r for r in ordered if r.get("score") is not None]
+    best = max(scored, key=lambda r: r["score"]) if scored else None
+    s["total_runs"] = len(ordered)
+    s["total_km"] = round(sum(r.get("distance_km") or 0 for r in ordered), 3)
+    s["best_score"] = best["score"] if best else None
+    s["best_run_id"] = best["id"] if best else None
+    s["recent"] = [_entry(r) for r in ordered[:RECENT_WINDOW]]
+    return _derive(s)
+
+
+def run_changes(old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]):
+    """(athlete_id, old, new) per atleta: uno spostamento di atleta è DELETE + INSERT."""
+    if old and new and old.get("athlete_id") != new.get("athlete_id"):
+        return [(old["athlete_id"], old, None), (new["athlete_id"], None, new)]
+    ref = new or old
+    return [(ref.get("athlete_id"), old, new)] if ref and ref.get("athlete_id") is not None else []
+
+
+# --- Trigger e RPC emulati (client con l'interfaccia StorageClient) ---
+
+RUN_COLUMNS = "id,athlete_id,date,score,distance_km"
+
+
+def _reload(client, athlete_id: int) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    recent = client.table("runs").select(RUN_COLUMNS).eq("athlete_id", athlete_id)\
+        .order("date", desc=True).order("id", desc=True).limit(RECENT_WINDOW).execute().data or []
+    best = client.table("runs").select(RUN_COLUMNS).eq("athlete_id", athlete_id).gte("score", 0)\
+        .order("score", desc=True).limit(1).execute().data or []
+    return recent, (best[0] if best else None)
+
+
+def _store(client, s: Dict[str, Any]):
+    client.table("athlete_summary").upsert(s).execute()
+    client.table("athletes").update({"streak": s["streak"], "last_run_date": s["last_run_date"]})\
+        .eq("id", s["athlete_id"]).execute()
+
+
+def summary_trigger(client, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]):
+    """AFTER INSERT/UPDATE/DELETE su runs, per riga (come trg_runs_athlete_summary)."""
+    if not changed(old, new):
+        return
+    for athlete_id, o, n in run_changes(old, new):
+        cur = client.table("athlete_summary").select("*").eq("athlete_id", athlete_id).execute().data
+        _store(client, fold_run(cur[0] if cur else None, athlete_id, o, n, lambda a: _reload(client, a)))
+
+
+def rpc_rebuild_athlete_summary(client, params: Dict[str, Any]):
+    """Riparazione: ricostruisce da runs il riepilogo di un atleta (o di tutti se p_athlete_id è NULL)."""
+    athlete_id = params.get("p_athlete_id")
+    q = client.table("runs").select(RUN_COLUMNS)
+    if athlete_id is not None:
+        q = q.eq("athlete_id", athlete_id)
+    by_athlete: Dict[int, List[Dict[str, Any]]] = {}
+    for r in q.execute().data or []:
+        by_athlete.setdefault(r["athlete_id"], []).append(r)
+    if athlete_id is not None:
+        by_athlete.setdefault(athlete_id, [])
+    else:
+        for row in client.table("athlete_summary").select("athlete_id").execute().data or []:
+            by_athlete.setdefault(row["athlete_id"], [])
+    for aid, runs in by_athlete.items():
+        _store(client, rebuild_summary(aid, runs))
+    return [{"rebuild_athlete_summary": len(by_athlete)}]
+
+
+def register_summary(client):
+    client.register_trigger("runs", summary_trigger)
+    client.register_rpc("rebuild_athlete_summary", rpc_rebuild_athlete_summary)
@@ -1,31 +1,53 @@
-from supabase import create_client, Client
-import streamlit as st
+import sys
 import logging
+import threading
 from typing import Optional, Dict, List, Any, Tuple
 from config import Config
+from services.run_mirror import RunMirror, get_run_mirror, invalidate_mirror
+from services.storage import PostgRESTStorage, Storage, StorageClient
 
 # Setup Logger
 logger = logging.getLogger("sCore.DB")
 
+# Colonne per lo storico: tutto tranne gli stream, dettagli score estratti dal JSON
+HISTORY_COLUMNS = (
+    "id,date,distance_km,avg_power,avg_hr,decoupling,score,wcf,wr_pct,rank,meteo_desc,"
+    "ai_feedback,quality,achievements,trend,comparison,stream_status,details:raw_data->details"
+)
+
+# Ordinamenti dell'archivio: ognuno ha un indice (athlete_id, col, id), colonne mai NULL
+ARCHIVE_SORT_COLUMNS = ("date", "distance_km", "score")
+
 class DatabaseService:
-    def __init__(self, url: str, key: str):
-        self.client: Client = create_client(url, key)
+    def __init__(self, url: str, key: str, client: Optional[StorageClient] = None, mirror_dir: Optional[str] = None,
+                 storage: Optional[Storage] = None):
+        # storage: implementazione di services.storage.Storage (operazioni di dominio).
+        # client: query builder PostgREST (services.storage.StorageClient), es. SQLiteClient
+        # embedded o offline.memory_db.InMemoryClient, usato tramite PostgRESTStorage.
+        # Mirror locale dello storico: di default solo sul Supabase reale
+        # (uno stand-in in memoria non deve ritrovarsi i dati di un'altra esecuzione)
+        if mirror_dir is None and client is None and storage is None and Config.MIRROR_ENABLED:
+            mirror_dir = Config.MIRROR_DIR
+        self.mirror_dir = mirror_dir
+        if storage is None:
+            if client is None:
+                from supabase import create_client
+                client = create_client(url, key)
+            storage = PostgRESTStorage(client)
+        self.storage: Storage = storage
 
     # --- GESTIONE PROFILO ---
     def save_athlete_profile(self, profile_data: Dict[str, Any]) -> Tuple[bool, Optional[str]]:
         try:
-            self.client.table("athletes").upsert(profile_data).execute()
-            return True, None 
+            self.storage.upsert_athlete(profile_data)
+            return True, None
         except Exception as e:
             logger.error(f"Error saving profile: {e}")
             return False, str(e)
 
     def get_athlete_profile(self, athlete_id: int) -> Optional[Dict[str, Any]]:
         try:
-            res = self.client.table("athletes").select("*").eq("id", athlete_id).execute()
-            if res.data and len(res.data) > 0:
-                return res.data[0]
-            return None
+            return self.storage.get_athlete(athlete_id)
         except Exception as e:
             logger.error(f"Error reading profile: {e}")
             return None
@@ -56,13 +78,18 @@ class DatabaseService:
                 "achievements": run_data.get("Achievements", []),
                 "trend": run_data.get("Trend", {}),
                 "comparison": run_data.get("Comparison", {}),
+                "stream_status": run_data.get("Streams") or ("fetched" if run_data.get('raw_watts') or run_data.get('raw_hr') else "unavailable"),
+                # Stream in run_streams: qui restano solo i dettagli dello score
                 "raw_data": {
-                    "watts": run_data['raw_watts'],
-                    "hr": run_data['raw_hr'],
                     "details": run_data.get('SCORE_DETAIL', {})
                 }
             }
-            self.client.table("runs").upsert(payload).execute()
+            self.storage.upsert_run(payload)
+            invalidate_mirror(athlete_id)
+            if not self.save_run_streams(run_data['id'], {"watts": run_data.get('raw_watts'), "hr": run_data.get('raw_hr')}):
+                # Riga scritta ma stream persi: 'pending' così la prossima sync li riscarica
+                self.mark_stream_status([run_data['id']], "pending", athlete_id)
+                return False
             return True
         except Exception as e:
             logger.error(f"Error DB Save Run: {e}")
@@ -70,8 +97,7 @@ class DatabaseService:
 
     def run_exists(self, run_id: int) -> bool:
         try:
-            res = self.client.table("runs").select("id").eq("id", run_id).execute()
-            return bool(res.data)
+            return self.storage.run_exists(run_id)
         except Exception as e:
             logger.error(f"Error checking if run exists: {e}")
             return False
@@ -79,64 +105,299 @@ class DatabaseService:
     def get_run_ids_for_athlete(self, athlete_id: int) -> List[int]:
         """Recupera tutti gli ID delle corse per un atleta specifico"""
         try:
-            res = self.client.table("runs").select("id").eq("athlete_id", athlete_id).execute()
-            return [row['id'] for row in res.data] if res.data else []
+            return self.storage.run_ids(athlete_id)
         except Exception as e:
             logger.error(f"Error getting run IDs for athlete: {e}")
             return []
 
-    def get_history(self) -> List[Dict[str, Any]]:
-        """Carica lo storico mappando SQL Supabase -> Dati Python"""
-        try:
-            response = self.client.table("runs").select("*").order("date", desc=True).execute()
-            data = response.data if response.data else []
-            
-            processed = []
-            for row in data:
-                # Estrazione sicura dal JSON raw_data
-                raw = row.get('raw_data', {}) or {}
-                
-                # MAPPATURA INVERSA: Colonne SQL -> Chiavi App
-                processed.append({
-                    "id": row['id'],
-                    "Data": row['date'],
-                    "Dist (km)": row['distance_km'],
-                    "Power": row['avg_power'],
-                    "HR": row['avg_hr'],
-                    "Decoupling": row['decoupling'],
-                    "SCORE": row['score'],
-                    "WCF": row.get('wcf', 1.0),
-                    "WR_Pct": row.get('wr_pct', 0.0),
-                    "Rank": row['rank'],
-                    "Meteo": row['meteo_desc'],
-                    "ai_feedback": row.get('ai_feedback'),
-                    # Gaming Layer
-                    "Quality": row.get("quality"),
-                    "Achievements": row.get("achievements", []),
-                    "Trend": row.get("trend", {}),
-                    "Comparison": row.get("comparison", {}),
-                    # Dati complessi
-                    "SCORE_DETAIL": raw.get('details', {}),
-                    "raw_watts": raw.get('watts', []),
-                    "raw_hr": raw.get('hr', [])
-                })
-            return processed
+    def get_placeholder_run_ids(self, athlete_id: int) -> List[int]:
+        """ID delle corse rimaste placeholder (SCORE 0.0, rank '—') da vecchie sync interrotte"""
+        try:
+            return self.storage.run_ids(athlete_id, rank="—")
+        except Exception as e:
+            logger.error(f"Error getting placeholder runs: {e}")
+            return []
+
+    def get_run_ids_by_stream_status(self, athlete_id: int, status: str) -> List[int]:
+        """ID delle corse di un atleta con un certo stream_status (pending/fetched/unavailable)"""
+        try:
+            return self.storage.run_ids(athlete_id, stream_status=status)
+        except Exception as e:
+            logger.error(f"Error getting runs by stream status: {e}")
+            return []
+
+    def update_run_streams(self, run_id: int, run_data: Dict[str, Any], athlete_id: int) -> bool:
+        """Aggiorna score + stream di una corsa già salvata (stream scaricati in una sync successiva)"""
+        try:
+            self.storage.update_runs([run_id], {
+                "score": run_data['SCORE'],
+                "decoupling": run_data['Decoupling'],
+                "wcf": run_data['WCF'],
+                "wr_pct": run_data['WR_Pct'],
+                "rank": run_data['Rank'],
+                "duration_sec": len(run_data.get('raw_watts') or []),
+                "stream_status": run_data.get("Streams", "fetched"),
+                "raw_data": {
+                    "details": run_data.get('SCORE_DETAIL', {})
+                }
+            })
+            invalidate_mirror(athlete_id)
+            if not self.save_run_streams(run_id, {"watts": run_data.get('raw_watts'), "hr": run_data.get('raw_hr')}):
+                self.mark_stream_status([run_id], "pending", athlete_id)
+                return False
+            return True
+        except Exception as e:
+            logger.error(f"Error updating run streams: {e}")
+            return False
+
+    def mark_stream_status(self, run_ids: List[int], status: str, athlete_id: int) -> bool:
+        if not run_ids:
+            return True
+        try:
+            self.storage.update_runs(run_ids, {"stream_status": status})
+            invalidate_mirror(athlete_id)
+            return True
+        except Exception as e:
+            logger.error(f"Error marking stream status: {e}")
+            return False
+
+    def get_history(self, athlete_id: int) -> List[Dict[str, Any]]:
+        """
+        Carica lo storico di UN atleta mappando SQL Supabase -> Dati Python.
+        Solo colonne di riepilogo: gli stream (raw_data.watts/hr) si leggono
+        su richiesta con get_run_streams().
+        """
+        try:
+            mirror = self._synced_mirror(athlete_id)
+            if mirror:
+                return [self._history_row(row) for row in mirror.rows()]
+
+            data, _ = self.storage.runs_page(athlete_id, HISTORY_COLUMNS)
+            return [self._history_row(row) for row in data]
         except Exception as e:
             logger.error(f"Error DB Get History: {e}")
             return []
-            
+
+    def get_history_page(self, athlete_id: int, limit: int, cursor: Optional[Tuple[str, int]] = None) -> Tuple[List[Dict[str, Any]], Optional[Tuple[str, int]]]:
+        """
+        Una pagina di storico, dalla più recente, con paginazione keyset su
+        (date DESC, id DESC): usa idx_runs_athlete_date e costa uguale a pagina 1 o 100.
+        cursor = (date, id) dell'ultima corsa già caricata.
+        Ritorna (righe, cursore successivo o None se lo storico è finito).
+        """
+        try:
+            mirror = self._synced_mirror(athlete_id)
+            if mirror:
+                data, next_cursor = mirror.page(limit, cursor)
+                return [self._history_row(row) for row in data], next_cursor
+
+            data, _ = self.storage.runs_page(athlete_id, HISTORY_COLUMNS, limit=limit, cursor=cursor)
+            next_cursor = (data[-1]['date'], data[-1]['id']) if len(data) == limit else None
+            return [self._history_row(row) for row in data], next_cursor
+        except Exception as e:
+            logger.error(f"Error DB Get History Page: {e}")
+            return [], None
+
+    def get_archive_page(self, athlete_id: int, filters: Dict[str, Any], sort: str = "date", desc: bool = True,
+                         limit: int = Config.ARCHIVE_PAGE_SIZE, cursor: Optional[Tuple[Any, int]] = None,
+                         with_count: bool = False) -> Tuple[List[Dict[str, Any]], Optional[Tuple[Any, int]], Optional[int]]:
+        """
+        Una pagina dell'archivio filtrata e ordinata nel DB (migrations/v4_8_archive_indexes.sql).
+        filters: dist_min/dist_max (km, max escluso), ranks, date_from/date_to (YYYY-MM-DD,
+        inclusi), score_min/score_max; le chiavi assenti o None non filtrano.
+        Keyset su (sort, id) come get_history_page: ogni pagina legge 'limit' righe
+        dall'indice, qualunque sia la sua posizione. with_count aggiunge il totale
+        filtrato (da chiedere solo alla prima pagina: è l'unica parte che scala coi match).
+        Ritorna (righe, cursore successivo o None, totale o None).
+        """
+        if sort not in ARCHIVE_SORT_COLUMNS:
+            raise ValueError(f"Unsupported archive sort column: {sort}")
+        try:
+            data, count = self.storage.runs_page(athlete_id, HISTORY_COLUMNS, filters, sort, desc, limit, cursor, with_count)
+            next_cursor = (data[-1][sort], data[-1]['id']) if len(data) == limit else None
+            return [self._history_row(row) for row in data], next_cursor, count
+        except Exception as e:
+            logger.error(f"Error DB Get Archive Page: {e}")
+            return [], None, 0 if with_count else None
+
+    def _synced_mirror(self, athlete_id: int) -> Optional[RunMirror]:
+        """
+        Mirror locale allineato con UNA query delta (runs.updated_at > watermark).
+        Entro MIRROR_TTL_SEC e senza scritture nel frattempo non interroga Supabase.
+        Mirror freddo: si scalda in un thread e intanto si legge da Supabase,
+        così la prima pagina non aspetta il download di tutto lo storico.
+        None = mirror disattivato, freddo o inutilizzabile: si legge direttamente da Supabase.
+        """
+        if not self.mirror_dir:
+            return None
+        try:
+            mirror = get_run_mirror(athlete_id, self.mirror_dir)
+            if not mirror.is_warm():
+                if mirror.try_start_warm():
+                    threading.Thread(target=self._warm_mirror, args=(mirror,), daemon=True,
+                                     name=f"mirror-warm-{athlete_id}").start()
+                return None
+            if not mirror.needs_refresh():
+                return mirror
+            self._refresh_mirror(mirror)
+            return mirror
+        except Exception as e:
+            # Es. migrazione v4_5 non ancora applicata (manca updated_at)
+            logger.error(f"Error syncing local mirror: {e}")
+            invalidate_mirror(athlete_id)
+            return None
+
+    def _refresh_mirror(self, mirror: RunMirror):
+        """Query delta su updated_at; ogni MIRROR_RECONCILE_SEC anche gli id, per le cancellazioni di altri processi."""
+        mirror.start_refresh()
+        since = mirror.delta_since()
+        rows = self.storage.runs_changed_since(mirror.athlete_id, HISTORY_COLUMNS + ",updated_at", since)
+        if since and mirror.needs_reconcile():
+            gone = mirror.reconcile(self.storage.run_ids(mirror.athlete_id))
+            if gone:
+                logger.info(f"[MIRROR] Atleta {mirror.athlete_id}: {gone} corse cancellate altrove")
+        elif not since:
+            # Download completo: è già allineato anche sulle cancellazioni
+            mirror.reconcile([r["id"] for r in rows])
+        mirror.apply_delta(rows)
+
+    def _warm_mirror(self, mirror: RunMirror):
+        try:
+            self._refresh_mirror(mirror)
+        except Exception as e:
+            logger.error(f"Error warming local mirror: {e}")
+            invalidate_mirror(mirror.athlete_id)
+        finally:
+            mirror.finish_warm()
+
+    @staticmethod
+    def _history_row(row: Dict[str, Any]) -> Dict[str, Any]:
+        """MAPPATURA INVERSA: Colonne SQL -> Chiavi App"""
+        return {
+            "id": row['id'],
+            "Data": row['date'],
+            "Dist (km)": row['distance_km'],
+            "Power": row['avg_power'],
+            "HR": row['avg_hr'],
+            "Decoupling": row['decoupling'],
+            "SCORE": row['score'],
+            "WCF": row.get('wcf', 1.0),
+            "WR_Pct": row.get('wr_pct', 0.0),
+            "Rank": row['rank'],
+            "Meteo": row['meteo_desc'],
+            "ai_feedback": row.get('ai_feedback'),
+            # Gaming Layer
+            "Quality": row.get("quality"),
+            "Achievements": row.get("achievements", []),
+            "Trend": row.get("trend", {}),
+            "Comparison": row.get("comparison", {}),
+            "Streams": row.get("stream_status"),
+            # Dettagli score (piccolo JSON dentro raw_data)
+            "SCORE_DETAIL": row.get('details') or {}
+        }
+
+    # --- STREAM (tabella run_streams) ---
+    def save_run_streams(self, run_id: int, streams: Dict[str, Optional[List[Any]]]) -> bool:
+        """Scrive gli stream di una corsa, una riga per tipo ('watts', 'hr'); i tipi vuoti si saltano"""
+        rows = [
+            {"run_id": run_id, "stream_type": kind, "data": data, "sample_count": len(data)}
+            for kind, data in streams.items() if data
+        ]
+        self.invalidate_streams([run_id])
+        if not rows:
+            return True
+        try:
+            self.storage.upsert_run_streams(rows)
+            return True
+        except Exception as e:
+            logger.error(f"Error saving run streams: {e}")
+            return False
+
+    def get_run_streams(self, run_id: int) -> Dict[str, Any]:
+        """
+        Stream watts/HR di una singola corsa, letti su richiesta, come array
+        NumPy compatti in sola lettura (services.stream_cache, condivisa dal
+        processo): riaprire la stessa corsa, anche da un'altra sessione, non rilegge il DB.
+        """
+        from services.stream_cache import get_stream_cache
+        cache = get_stream_cache()
+        cached = cache.get(run_id)
+        if cached is not None:
+            return cached
+        try:
+            rows = self.storage.get_run_streams(run_id)
+            streams = {"watts": [], "hr": []}
+            for row in rows:
+                streams[row["stream_type"]] = row.get("data") or []
+            if not rows:
+                # Corsa non ancora migrata dal backfill: stream ancora in raw_data
+                row = self.storage.get_legacy_streams(run_id)
+                streams = {"watts": row.get("watts") or [], "hr": row.get("hr") or []}
+        except Exception as e:
+            logger.error(f"Error loading run streams: {e}")
+            return {"watts": [], "hr": []}
+
+        return cache.put(run_id, streams)
+
+    def backfill_streams_batch(self, after_id: int = 0, batch_size: int = 50) -> Tuple[Optional[int], int]:
+        """
+        Un lotto del backfill raw_data -> run_streams (keyset su runs.id).
+        Copia gli stream, poi li toglie da raw_data corsa per corsa: nessun lock
+        di tabella, solo update brevi su righe già lette.
+        Ritorna (ultimo id visto o None se finito, corse migrate nel lotto).
+        """
+        rows = self.storage.legacy_streams_batch(after_id, batch_size)
+        if not rows:
+            return None, 0
+
+        legacy = [r for r in rows if r.get("watts") is not None or r.get("hr") is not None]
+        stream_rows = [
+            {"run_id": r["id"], "stream_type": kind, "data": r[kind], "sample_count": len(r[kind])}
+            for r in legacy for kind in ("watts", "hr") if r.get(kind)
+        ]
+        if stream_rows:
+            self.storage.upsert_run_streams(stream_rows)
+        for r in legacy:
+            self.storage.update_runs([r["id"]], {"raw_data": {"details": r.get("details") or {}}})
+        self.invalidate_streams([r["id"] for r in legacy])
+        return rows[-1]["id"], len(legacy)
+
+    @staticmethod
+    def invalidate_streams(run_ids: Optional[List[int]] = None):
+        """Toglie dalla cache gli stream riscritti (None = svuota tutto)"""
+        if "services.stream_cache" not in sys.modules:
+            return  # cache mai usata dal processo: niente da togliere
+        from services.stream_cache import get_stream_cache
+        get_stream_cache().invalidate(run_ids)
+
     def reset_history(self, athlete_id: int) -> bool:
         """Cancella tutte le corse di un atleta per forzare un ricaricamento pulito."""
         try:
-            self.client.table("runs").delete().eq("athlete_id", athlete_id).execute()
+            self.storage.delete_runs(athlete_id)
+            if self.mirror_dir:
+                get_run_mirror(athlete_id, self.mirror_dir).clear()
+            self.invalidate_streams()
             return True
         except Exception as e:
             logger.error(f"Error resetting history: {e}")
             return False
 
-    def update_ai_feedback(self, run_id: int, feedback_text: str) -> bool:
+    def delete_run(self, run_id: int, athlete_id: int) -> bool:
+        """Cancella una singola corsa (evento push 'delete' o cambio tipo)."""
+        try:
+            self.storage.delete_runs(athlete_id, [run_id])
+            if self.mirror_dir:
+                get_run_mirror(athlete_id, self.mirror_dir).delete([run_id])
+            self.invalidate_streams([run_id])
+            return True
+        except Exception as e:
+            logger.error(f"Error deleting run: {e}")
+            return False
+
+    def update_ai_feedback(self, run_id: int, feedback_text: str, athlete_id: int) -> bool:
         try:
-            self.client.table("runs").update({"ai_feedback": feedback_text}).eq("id", run_id).execute()
+            self.storage.update_runs([run_id], {"ai_feedback": feedback_text})
+            invalidate_mirror(athlete_id)
             return True
         except Exception as e:
             logger.error(f"Error updating feedback: {e}")
@@ -144,23 +405,48 @@ class DatabaseService:
     
     def save_feedback(self, feedback_data: Dict[str, Any]) -> Tuple[bool, Optional[str]]:
         try:
-            self.client.table("feedback").insert(feedback_data).execute()
+            self.storage.insert_feedback(feedback_data)
             return True, None
         except Exception as e:
             logger.error(f"Error saving user feedback: {e}")
             return False, str(e)
 
+    # --- RIEPILOGO ATLETA (athlete_summary, migrations/v4_7_athlete_summary.sql) ---
+    def get_athlete_summary(self, athlete_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Riepilogo mantenuto dal trigger su runs: total_runs, total_km, best_score,
+        last_run_date, last_score, ma_7, ma_28, ma7_delta, streak e recent
+        (ultime 28 corse {id, date, score}, dalla più recente). Una lookup per PK.
+        None se la tabella non esiste o l'atleta non ha ancora corse.
+        """
+        try:
+            return self.storage.get_athlete_summary(athlete_id)
+        except Exception as e:
+            logger.error(f"Error DB Athlete Summary: {e}")
+            return None
+
+    def rebuild_athlete_summary(self, athlete_id: Optional[int] = None) -> int:
+        """Job di riparazione: ricostruisce il riepilogo da runs (None = tutti gli atleti). Ritorna gli atleti rifatti."""
+        try:
+            return self.storage.rebuild_athlete_summary(athlete_id)
+        except Exception as e:
+            logger.error(f"Error rebuilding athlete summary: {e}")
+            return -1
+
     # --- STREAK PERSISTENTE ---
     def update_streak(self, athlete_id: int):
-        """Calcola e aggiorna la streak di miglioramento dell'atleta"""
+        """Calcola e aggiorna la streak di miglioramento dell'atleta (RPC: un solo round trip)"""
+        # Con athlete_summary (v4_7) athletes.streak la aggiorna già il trigger su runs
+        if self.get_athlete_summary(athlete_id):
+            return
         try:
-            res = self.client.table("runs")\
-                .select("score")\
-                .eq("athlete_id", athlete_id)\
-                .order("date", desc=True)\
-                .limit(10).execute()
+            self.storage.refresh_streak(athlete_id)
+            return
+        except Exception as e:
+            logger.warning(f"RPC refresh_athlete_streak unavailable, falling back: {e}")
 
-            scores = [r["score"] for r in res.data] if res.data else []
+        try:
+            scores = self.storage.recent_scores(athlete_id, 10)
             streak = 1
             for i in range(1, len(scores)):
                 if scores[i-1] >= scores[i]:
@@ -168,17 +454,49 @@ class DatabaseService:
                 else:
                     break
 
-            self.client.table("athletes")\
-                .update({"streak": streak})\
-                .eq("id", athlete_id)\
-                .execute()
+            self.storage.set_athlete_streak(athlete_id, streak)
         except Exception as e:
             logger.error(f"Error updating streak: {e}")
 
+    # --- AGGREGATI DASHBOARD (RPC, migrations/v4_6_stats_rpc.sql) ---
+    def get_dashboard_stats(self, athlete_id: int, since: Optional[str] = None) -> Dict[str, Any]:
+        """
+        KPI calcolati nel DB: last_score, ma_7, ma_28, ma7_delta, streak e
+        period_* (corse, media/miglior SCORE, km, decoupling medio da 'since').
+        {} se la RPC non è disponibile.
+        """
+        try:
+            return self.storage.dashboard_stats(athlete_id, since)
+        except Exception as e:
+            logger.error(f"Error DB Dashboard Stats: {e}")
+            return {}
+
+    def get_score_trend(self, athlete_id: int, limit: int = 60) -> List[Dict[str, Any]]:
+        """Ultime 'limit' corse con medie mobili 7/28 calcolate sull'intero storico (chiavi app)"""
+        try:
+            return [{
+                "id": r["id"],
+                "Data": r["date"],
+                "SCORE": r["score"],
+                "SCORE_MA_7": r["ma_7"],
+                "SCORE_MA_28": r["ma_28"]
+            } for r in self.storage.score_trend(athlete_id, limit)]
+        except Exception as e:
+            logger.error(f"Error DB Score Trend: {e}")
+            return []
+
+    def get_period_summary(self, athlete_id: int, period: str = "month", since: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Riepilogo per settimana/mese/anno: run_count, avg_score, best_score, total_km, avg_decoupling"""
+        try:
+            return self.storage.period_summary(athlete_id, period, since)
+        except Exception as e:
+            logger.error(f"Error DB Period Summary: {e}")
+            return []
+
     # --- REPLAY & LOGS ---
     def save_replay(self, replay_data: Dict[str, Any]) -> bool:
         try:
-            self.client.table("score_replay").insert(replay_data).execute()
+            self.storage.insert_replay(replay_data)
             return True
         except Exception as e:
             logger.error(f"Error saving replay: {e}")
@@ -186,7 +504,7 @@ class DatabaseService:
 
     def log_achievement(self, log_data: Dict[str, Any]) -> bool:
         try:
-            self.client.table("achievements_log").insert(log_data).execute()
+            self.storage.insert_achievement(log_data)
             return True
         except Exception as e:
             logger.error(f"Error logging achievement: {e}")
@@ -0,0 +1,174 @@
+"""
+Profiler dei rerun della dashboard, per sessione (letto dalla Dev Console).
+
+Ogni rerun apre una traccia sul thread dello script Streamlit
+(profile_rerun); i blocchi della pagina si misurano con block("nome").
+Le chiamate a DB, HTTP ed engine sono cronometrate alla fonte
+(instrument() sui servizi del registry, profiled_io su resilient_request) e
+attribuite al blocco più interno attivo e al totale del rerun: così si vede
+se un grafico è lento per Altair o per la query che lo alimenta.
+
+Fuori da un rerun (worker di sync, API di scoring, script) la traccia non
+c'è e il costo è un getattr su un threading.local. Per categoria conta solo
+la chiamata più esterna: metodi che si chiamano tra loro non sommano due volte.
+"""
+import time
+import inspect
+import functools
+import threading
+import contextlib
+from collections import deque
+from typing import Any, Callable, Dict, List, MutableMapping, Optional
+from config import Config
+
+IO_CATEGORIES = ("db", "http", "engine")
+HISTORY_KEY = "render_profile"
+
+_local = threading.local()
+
+
+class RerunTrace:
+    def __init__(self, name: str):
+        self.name = name
+        self.started = time.perf_counter()
+        self.io = dict.fromkeys(IO_CATEGORIES, 0.0)
+        self.blocks: Dict[str, Dict[str, float]] = {}
+        self.stack: List[str] = []
+        self.busy = dict.fromkeys(IO_CATEGORIES, False)
+
+    def add_io(self, category: str, seconds: float):
+        self.io[category] += seconds
+        if self.stack:
+            self.blocks[self.stack[-1]][category] += seconds
+
+    def summary(self) -> Dict[str, Any]:
+        ms = lambda s: round(s * 1000, 2)
+        return {
+            "at": time.time(),
+            "name": self.name,
+            "total_ms": ms(time.perf_counter() - self.started),
+            **{f"{c}_ms": ms(self.io[c]) for c in IO_CATEGORIES},
+            "blocks": {
+                name: {"ms": ms(b["time"]), "calls": int(b["calls"]), **{f"{c}_ms": ms(b[c]) for c in IO_CATEGORIES}}
+                for name, b in self.blocks.items()
+            }
+        }
+
+
+def current_trace() -> Optional[RerunTrace]:
+    return getattr(_local, "trace", None)
+
+
+# ============================================================
+# RERUN E BLOCCHI
+# ============================================================
+
+@contextlib.contextmanager
+def profile_rerun(session_state: MutableMapping, name: str = "dashboard"):
+    """
+    Traccia un rerun e lo aggiunge alla storia della sessione (Config.PROFILER_HISTORY).
+    Dentro un rerun già tracciato (fragment disegnato dal rerun completo) vale come block(name).
+    Rerun interrotti (st.rerun, st.stop, eccezioni) non vengono registrati.
+    """
+    if not Config.PROFILER_ENABLED:
+        yield
+        return
+    if current_trace() is not None:
+        with block(name):
+            yield
+        return
+    _local.trace = RerunTrace(name)
+    try:
+        yield
+        history = session_state.get(HISTORY_KEY)
+        if history is None or history.maxlen != Config.PROFILER_HISTORY:
+            history = deque(history or [], maxlen=Config.PROFILER_HISTORY)
+            session_state[HISTORY_KEY] = history
+        history.append(_local.trace.summary())
+    finally:
+        _local.trace = None
+
+
+@contextlib.contextmanager
+def block(name: str):
+    """Tempo di un blocco della pagina (inclusivo) con il suo DB/HTTP/engine."""
+    trace = current_trace()
+    if trace is None:
+        yield
+        return
+    b = trace.blocks.setdefault(name, dict(dict.fromkeys(IO_CATEGORIES, 0.0), time=0.0, calls=0))
+    trace.stack.append(name)
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        b["time"] += time.perf_counter() - t0
+        b["calls"] += 1
+        trace.stack.pop()
+
+
+# ============================================================
+# STRUMENTAZIONE I/O
+# ============================================================
+
+def _timed(category: str, fn: Callable) -> Callable:
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        trace = current_trace()
+        if trace is None or trace.busy[category]:
+            return fn(*args, **kwargs)
+        trace.busy[category] = True
+        t0 = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            trace.busy[category] = False
+            trace.add_io(category, time.perf_counter() - t0)
+    return wrapper
+
+
+def profiled_io(category: str) -> Callable[[Callable], Callable]:
+    """Decoratore per funzioni di I/O (es. resilient_request -> 'http')."""
+    return lambda fn: _timed(category, fn)
+
+
+def instrument(obj: Any, category: str) -> Any:
+    """Cronometra i metodi pubblici di UN oggetto (servizio del registry), senza toccarne la classe."""
+    for name, _ in inspect.getmembers(type(obj), inspect.isfunction):
+        if not name.startswith("_"):
+            setattr(obj, name, _timed(category, getattr(obj, name)))
+    return obj
+
+
+# ============================================================
+# STATISTICHE (Dev Console)
+# ============================================================
+
+def _pct(values: List[float]) -> Dict[str, float]:
+    import numpy as np
+    arr = np.asarray(values, dtype=float)
+    p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+    return {"n": len(arr), "p50": round(float(p50), 1), "p95": round(float(p95), 1), "p99": round(float(p99), 1), "max": round(float(arr.max()), 1)}
+
+
+def summarize(history, name: str = "dashboard") -> Dict[str, Any]:
+    """Percentili dei rerun 'name' della storia: totale, DB/HTTP/engine e per blocco."""
+    import numpy as np
+    runs = [r for r in history or [] if r["name"] == name]
+    if not runs:
+        return {"runs": 0, "total": {}, "io": {}, "blocks": []}
+    blocks: Dict[str, Dict[str, List[float]]] = {}
+    for r in runs:
+        for bname, b in r["blocks"].items():
+            acc = blocks.setdefault(bname, {"ms": [], "io_ms": []})
+            acc["ms"].append(b["ms"])
+            acc["io_ms"].append(sum(b[f"{c}_ms"] for c in IO_CATEGORIES))
+    return {
+        "runs": len(runs),
+        "total": _pct([r["total_ms"] for r in runs]),
+        "io": {c: _pct([r[f"{c}_ms"] for r in runs]) for c in IO_CATEGORIES},
+        "blocks": [
+            dict(block=bname, **_pct(acc["ms"]), io_p50=round(float(np.median(acc["io_ms"])), 1))
+            for bname, acc in sorted(blocks.items(), key=lambda kv: -np.percentile(kv[1]["ms"], 95))
+        ]
+    }
@@ -0,0 +1,118 @@
+import logging
+from typing import Optional, Dict, Any, Callable, Tuple
+from config import Config
+from services.strava_sync import score_activity
+from services.stream_scheduler import has_stream_data, STREAM_PENDING, STREAM_FETCHED, STREAM_UNAVAILABLE
+from services.weather_batch import resolve_weather_batch
+
+logger = logging.getLogger("sCore.PushIngest")
+
+# Campi di un evento 'update' che non cambiano lo SCORE
+NON_SCORING_UPDATES = {"title", "private", "visibility"}
+
+
+class PushIngestor:
+    """
+    Ingestion di singole attività da eventi push Strava (webhook subscription).
+
+    Evento (formato Strava):
+        {"object_type": "activity", "object_id": 123, "aspect_type": "create",
+         "owner_id": 456, "updates": {}, "event_time": 1700000000}
+
+    create/update -> GET /activities/{id} + GET streams (2 chiamate), score, upsert
+                     (stream non disponibili: corsa nuova salvata 'pending',
+                      corsa esistente lasciata com'è -> 'deferred')
+    delete        -> delete della riga, nessuna chiamata Strava
+
+    token_provider(owner_id) deve ritornare un access token valido o None.
+    """
+
+    def __init__(self, auth_svc, db_svc, eng, token_provider: Callable[[int], Optional[str]], resolve_weather: bool = True):
+        self.auth = auth_svc
+        self.db = db_svc
+        self.eng = eng
+        self.token_provider = token_provider
+        self.resolve_weather = resolve_weather
+
+    def handle_event(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        object_type = event.get("object_type")
+        aspect = event.get("aspect_type")
+        run_id = event.get("object_id")
+        athlete_id = event.get("owner_id")
+        updates = event.get("updates") or {}
+
+        if object_type != "activity":
+            # Es. revoca autorizzazione atleta: gestita dal flusso OAuth
+            return self._result("ignored", run_id, f"object_type {object_type}")
+
+        if aspect == "delete":
+            ok = self.db.delete_run(run_id, athlete_id)
+            return self._result("deleted" if ok else "error", run_id)
+
+        if aspect == "update":
+            if "type" in updates and updates["type"] != "Run":
+                ok = self.db.delete_run(run_id, athlete_id)
+                return self._result("deleted" if ok else "error", run_id, "type changed")
+            # updates vuoto = Strava non dice cosa è cambiato: si riscarica
+            if updates and set(updates) <= NON_SCORING_UPDATES and self.db.run_exists(run_id):
+                return self._result("ignored", run_id, "no scoring fields changed")
+
+        if aspect not in ("create", "update"):
+            return self._result("ignored", run_id, f"aspect_type {aspect}")
+
+        return self._ingest(run_id, athlete_id)
+
+    def _ingest(self, run_id: int, athlete_id: int) -> Dict[str, Any]:
+        token = self.token_provider(athlete_id)
+        if not token:
+            return self._result("ignored", run_id, "no token for athlete")
+
+        s = self.auth.fetch_activity(token, run_id)
+        if not s:
+            return self._result("error", run_id, "activity not available")
+        if s.get("type") != "Run":
+            return self._result("ignored", run_id, f"type {s.get('type')}")
+
+        streams, status = self._fetch_streams(token, s)
+        if status == STREAM_PENDING and self.db.run_exists(run_id):
+            # Stream non disponibili ora (429, errore): la riga buona non si riscora a vuoto,
+            # resta 'pending' e la riprende la prossima sync
+            self.db.mark_stream_status([run_id], STREAM_PENDING, athlete_id)
+            return self._result("deferred", run_id, "streams not available yet")
+        watts = streams.get("watts", {}).get("data", [])
+        hr = streams.get("heartrate", {}).get("data", [])
+
+        temp_c, humidity = s.get("average_temp") or 20, 50
+        if self.resolve_weather:
+            temp_c, humidity = resolve_weather_batch([s]).get(run_id, (temp_c, humidity))
+
+        phys = self.db.get_athlete_profile(athlete_id) or {}
+        run_obj = score_activity(self.eng, s, watts, hr, phys, temp_c, humidity)
+        run_obj["raw_watts"] = watts
+        run_obj["raw_hr"] = hr
+        run_obj["Streams"] = status
+
+        if not self.db.save_run(run_obj, athlete_id):
+            return self._result("error", run_id, "DB write failed")
+        self.db.update_streak(athlete_id)
+
+        logger.info(f"[PUSH] Run {run_id} ingerita: SCORE {run_obj['SCORE']} (Engine {Config.ENGINE_VERSION})")
+        return self._result("upserted", run_id, score=run_obj["SCORE"])
+
+    def _fetch_streams(self, token: str, s: Dict[str, Any]) -> Tuple[Dict[str, Any], str]:
+        """Stesso contratto di SyncJob._fetch: 'unavailable' solo senza sensori o su 404, None -> 'pending'."""
+        if not has_stream_data(s):
+            return {}, STREAM_UNAVAILABLE
+        rate_limited = getattr(self.auth, "rate_limited", None)
+        streams = None if rate_limited and rate_limited() else self.auth.fetch_streams(token, s["id"])
+        if streams is None:
+            return {}, STREAM_PENDING
+        return streams, (STREAM_FETCHED if streams else STREAM_UNAVAILABLE)
+
+    @staticmethod
+    def _result(action: str, run_id: Any, reason: str = "", **extra) -> Dict[str, Any]:
+        res = {"action": action, "id": run_id}
+        if reason:
+            res["reason"] = reason
+        res.update(extra)
+        return res
@@ -0,0 +1,139 @@
+"""
+Scoring di record singoli fuori dalla web app (CLI, job batch, notebook).
+
+Un record è un dict JSON in uno di due formati:
+- attività Strava (summary API: start_date_local, distance, moving_time,
+  average_watts, ...), con stream opzionali in "streams" (formato API
+  {"watts": {"data": [...]}, "heartrate": {...}}) o "watts"/"heartrate" piatti;
+- riga di storico (colonne SQL di runs: date, distance_km, avg_power, avg_hr,
+  decoupling, ... oppure chiavi app: Data, Dist (km), Power, HR, Decoupling).
+
+Il risultato ha le chiavi app di score_activity (id, Data, SCORE, Rank, ...).
+Niente Streamlit, niente rete: il meteo arriva dal record (o i default).
+score_records() scora una lista di record con ScoreEngine.compute_score_batch.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+from config import Config
+from engine.core import RunMetrics
+from services.strava_sync import activity_metrics, activity_fields, build_run_obj
+
+PHYS_KEYS = ("weight", "hr_max", "hr_rest", "age", "sex")
+
+
+def default_phys(**overrides) -> Dict[str, Any]:
+    phys = {
+        "weight": Config.DEFAULT_WEIGHT,
+        "hr_max": Config.DEFAULT_HR_MAX,
+        "hr_rest": Config.DEFAULT_HR_REST,
+        "age": Config.DEFAULT_AGE,
+        "sex": "M"
+    }
+    phys.update({k: v for k, v in overrides.items() if v is not None})
+    return phys
+
+
+def _stream(rec: Dict[str, Any], *names: str) -> List[float]:
+    streams = rec.get("streams") or {}
+    for name in names:
+        v = streams.get(name, rec.get(name))
+        if isinstance(v, dict):
+            v = v.get("data")
+        if v:
+            return list(v)
+    return []
+
+
+def is_strava_activity(rec: Dict[str, Any]) -> bool:
+    return "start_date_local" in rec and "distance" in rec
+
+
+def prepare_record(eng, rec: Dict[str, Any], phys: Dict[str, Any]) -> Tuple[RunMetrics, float, Dict[str, Any]]:
+    """Record (Strava o storico) -> (input dell'engine, decoupling, colonne fisse del run_obj)."""
+    phys = dict(phys, **{k: rec[k] for k in PHYS_KEYS if rec.get(k) is not None})
+    watts = _stream(rec, "watts", "raw_watts")
+    hr = _stream(rec, "heartrate", "hr", "raw_hr")
+    temp_c = rec.get("temp_c", rec.get("average_temp"))
+    humidity = rec.get("humidity")
+
+    if is_strava_activity(rec):
+        temp_c = temp_c if temp_c is not None else 20
+        m = activity_metrics(rec, phys, temp_c, humidity or 50)
+        return m, eng.calculate_decoupling(watts, hr), activity_fields(rec, temp_c)
+    return _history_inputs(eng, rec, watts, hr, phys, temp_c, humidity)
+
+
+def score_record(eng, rec: Dict[str, Any], phys: Dict[str, Any]) -> Dict[str, Any]:
+    """Record (Strava o storico) -> run_obj con lo score dell'engine corrente."""
+    m, dec, fields = prepare_record(eng, rec, phys)
+    return build_run_obj(eng, fields, dec, eng.compute_score(m, dec))
+
+
+def score_records(eng, recs: List[Dict[str, Any]], phys: Dict[str, Any]) -> List[Tuple[bool, Dict[str, Any]]]:
+    """
+    Come score_record su una lista, con un solo passaggio vettoriale dell'engine.
+    Ritorna (ok, run_obj) nello stesso ordine; un record non valido dà
+    (False, {"index": i, "error": "..."}) senza fermare gli altri.
+    """
+    out: List[Tuple[bool, Dict[str, Any]]] = [None] * len(recs)
+    ready = []
+    for i, rec in enumerate(recs):
+        try:
+            if not isinstance(rec, dict):
+                raise ValueError("record is not a JSON object")
+            ready.append((i, prepare_record(eng, rec, phys)))
+        except Exception as e:
+            out[i] = (False, {"index": i, "error": str(e)})
+
+    results = eng.compute_score_batch([m for _, (m, _, _) in ready], [dec for _, (_, dec, _) in ready])
+    for (i, (_, dec, fields)), result in zip(ready, results):
+        out[i] = (True, build_run_obj(eng, fields, dec, result))
+    return out
+
+
+def _first(rec: Dict[str, Any], *keys: str, default: Any = None) -> Any:
+    for k in keys:
+        if rec.get(k) is not None:
+            return rec[k]
+    return default
+
+
+def _history_inputs(eng, rec, watts, hr, phys, temp_c: Optional[float], humidity: Optional[float]) -> Tuple[RunMetrics, float, Dict[str, Any]]:
+    dist_km = float(_first(rec, "distance_km", "Dist (km)", default=0) or 0)
+    power = float(_first(rec, "avg_power", "Power", default=0) or 0)
+    avg_hr = float(_first(rec, "avg_hr", "HR", default=0) or 0)
+    moving = int(_first(rec, "duration_sec", "moving_time", default=len(watts)) or 0)
+    # Senza questi lo score sarebbe 0.0 / ROOKIE, indistinguibile da una corsa vera
+    missing = [name for name, v in (("distance_km", dist_km), ("duration_sec", moving), ("avg_power", power), ("avg_hr", avg_hr)) if v <= 0]
+    if missing:
+        raise ValueError(f"missing or zero required field(s): {', '.join(missing)}")
+    if temp_c is None:
+        # "18°C" della colonna meteo, se c'è
+        meteo = str(_first(rec, "meteo_desc", "Meteo", default="")).split("°")[0]
+        try:
+            temp_c = float(meteo)
+        except ValueError:
+            temp_c = 20
+
+    m = RunMetrics(
+        avg_power=power, avg_hr=avg_hr,
+        distance=dist_km * 1000, moving_time=moving,
+        elevation_gain=float(_first(rec, "elevation_gain", "total_elevation_gain", default=0) or 0),
+        weight=phys["weight"], hr_max=phys["hr_max"], hr_rest=phys["hr_rest"],
+        temp_c=temp_c, humidity=humidity or 50,
+        age=phys["age"], sex=phys["sex"]
+    )
+    # Con gli stream si ricalcola il drift, altrimenti quello salvato (in %)
+    if watts and hr:
+        dec = eng.calculate_decoupling(watts, hr)
+    else:
+        dec = float(_first(rec, "decoupling", "Decoupling", default=0) or 0) / 100
+
+    fields = {
+        "id": rec.get("id"),
+        "Data": str(_first(rec, "date", "Data", default=""))[:10],
+        "Dist (km)": round(dist_km, 2),
+        "Power": int(power),
+        "HR": int(avg_hr),
+        "Meteo": f"{temp_c}°C"
+    }
+    return m, dec, fields
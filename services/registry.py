@@ -0,0 +1,147 @@
+import sys
+import atexit
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+from config import Config
+from services.profiler import instrument
+
+logger = logging.getLogger("sCore.Registry")
+
+
+def _close_quietly(obj: Any):
+    close = getattr(obj, "close", None)
+    if callable(close):
+        try:
+            close()
+        except Exception as e:
+            logger.warning(f"Error closing {type(obj).__name__}: {e}")
+
+
+class ServiceRegistry:
+    """
+    Servizi di lunga vita del processo, creati al primo uso e condivisi da
+    tutti i rerun e le sessioni: sessione HTTP (keep-alive verso Strava),
+    client di storage, DatabaseService, StravaService, ScoreEngine e pool di sync.
+
+    close() li chiude in ordine inverso di creazione (pool prima dei client).
+    Sotto Streamlit vive in st.cache_resource (on_release=close), headless
+    è un singleton di modulo chiuso a fine processo: vedi get_registry().
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._services: Dict[str, Any] = {}
+        self._closers: List[Callable[[], None]] = []
+        self.closed = False
+
+    def get(self, name: str, factory: Callable[[], Any], close: Optional[Callable[[Any], None]] = _close_quietly) -> Any:
+        """Istanza 'name', creata con factory() la prima volta."""
+        svc = self._services.get(name)
+        if svc is not None:
+            return svc
+        with self._lock:
+            if name not in self._services:
+                if self.closed:
+                    raise RuntimeError("ServiceRegistry is closed")
+                svc = factory()
+                self._services[name] = svc
+                if close:
+                    self._closers.append(lambda: close(svc))
+                logger.info(f"[REGISTRY] {name} creato")
+            return self._services[name]
+
+    def close(self):
+        with self._lock:
+            closers, self._closers = self._closers[::-1], []
+            self._services.clear()
+            self.closed = True
+        for fn in closers:
+            fn()
+        logger.info("[REGISTRY] servizi chiusi")
+
+    # --- SERVIZI ---
+    @property
+    def http(self):
+        """Sessione requests condivisa: connessioni TLS riusate tra chiamate e rerun."""
+        def build():
+            import requests
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=Config.SYNC_WORKERS + 4)
+            session.mount("https://", adapter)
+            return session
+        return self.get("http", build)
+
+    @property
+    def strava(self):
+        def build():
+            from services.api import StravaService
+            creds = Config.get_strava_creds()
+            return StravaService(creds["client_id"], creds["client_secret"], http=self.http)
+        return self.get("strava", build, close=None)
+
+    @property
+    def db(self):
+        def build():
+            from services.db import DatabaseService
+            if Config.get_storage_backend() == "sqlite":
+                from services.storage import create_storage_client
+                return instrument(DatabaseService(None, None, client=create_storage_client("sqlite")), "db")
+            creds = Config.get_supabase_creds()
+            return instrument(DatabaseService(creds["url"], creds["key"]), "db")
+        return self.get("db", build, close=lambda d: _close_quietly(d.storage))
+
+    @property
+    def engine(self):
+        """ScoreEngine senza stato per corsa: una sola istanza per processo, con il memo degli score."""
+        def build():
+            from engine.core import ScoreEngine
+            from engine.score_memo import ScoreMemo
+            path = Config.SCORE_MEMO_PATH if Config.SCORE_MEMO_PERSIST else None
+            return instrument(ScoreEngine(memo=ScoreMemo(Config.SCORE_MEMO_ENTRIES, path)), "engine")
+        return self.get("engine", build, close=lambda e: e.memo.close())
+
+    @property
+    def sync_worker(self):
+        def build():
+            from services.sync_worker import SyncWorker
+            return SyncWorker()
+        return self.get("sync_worker", build, close=lambda w: w.shutdown())
+
+
+# ============================================================
+# ACCESSO
+# ============================================================
+
+_registry: Optional[ServiceRegistry] = None
+_registry_lock = threading.Lock()
+_cached_registry = None
+
+
+def _streamlit_running() -> bool:
+    # Solo se streamlit è già caricato: il percorso headless non lo importa
+    if "streamlit" not in sys.modules:
+        return False
+    from streamlit import runtime
+    return runtime.exists()
+
+
+def get_registry() -> ServiceRegistry:
+    """Registry del processo (st.cache_resource sotto Streamlit, singleton altrimenti)."""
+    global _registry, _cached_registry
+    if _streamlit_running():
+        if _cached_registry is None:
+            import streamlit as st
+            _cached_registry = st.cache_resource(show_spinner=False, on_release=ServiceRegistry.close)(_build_registry)
+        return _cached_registry()
+
+    with _registry_lock:
+        if _registry is None or _registry.closed:
+            _registry = ServiceRegistry()
+            atexit.register(_registry.close)
+        return _registry
+
+
+def _build_registry() -> ServiceRegistry:
+    return ServiceRegistry()
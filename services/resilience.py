@@ -0,0 +1,261 @@
+import time
+import random
+import logging
+import threading
+from collections import defaultdict
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import urlparse
+import requests
+from config import Config
+from services.profiler import profiled_io
+
+logger = logging.getLogger("sCore.Resilience")
+
+WINDOW_SEC = 15 * 60
+DAY_SEC = 24 * 3600
+
+
+# ============================================================
+# METRICHE (process-wide, lette dalla Dev Console)
+# ============================================================
+
+_metrics_lock = threading.Lock()
+_metrics: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+
+
+def _inc(host: str, key: str, value: float = 1.0):
+    with _metrics_lock:
+        _metrics[host][key] += value
+
+
+def get_metrics() -> Dict[str, Dict[str, float]]:
+    """Per host: requests, retries, wait_s (tempo perso in attesa), errors, breaker_*."""
+    with _metrics_lock:
+        out = {h: dict(v) for h, v in _metrics.items()}
+    for host, br in _breakers.items():
+        out.setdefault(host, {})["breaker_state"] = br.state
+    return out
+
+
+def reset_metrics():
+    with _metrics_lock:
+        _metrics.clear()
+
+
+# ============================================================
+# CIRCUIT BREAKER (uno per host)
+# ============================================================
+
+class CircuitBreaker:
+    """
+    closed -> open dopo N fallimenti consecutivi; open rifiuta subito
+    per 'cooldown' secondi; poi half_open lascia passare UNA prova alla volta
+    (gli altri chiamanti restano rifiutati finché la prova non ha un esito).
+    """
+
+    def __init__(self, host: str, failure_threshold: int = Config.BREAKER_FAILURES, cooldown: float = Config.BREAKER_COOLDOWN_SEC):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probe_at: Optional[float] = None   # prova half_open in corso
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.time() - self.opened_at >= self.cooldown:
+            return "half_open"
+        return "open"
+
+    def _probing(self) -> bool:
+        # Una prova persa (eccezione a metà richiesta) scade dopo un cooldown
+        return self.probe_at is not None and time.time() - self.probe_at < self.cooldown
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "open" or (state == "half_open" and self._probing()):
+                _inc(self.host, "breaker_rejections")
+                return False
+            if state == "half_open":
+                self.probe_at = time.time()
+            return True
+
+    def release(self):
+        """Prova conclusa senza esito sullo stato dell'host (es. 429): la prossima può partire."""
+        with self._lock:
+            self.probe_at = None
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probe_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.probe_at = None
+            self.failures += 1
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                if self.opened_at is None or self.state == "half_open":
+                    _inc(self.host, "breaker_trips")
+                    logger.warning(f"[BREAKER] {self.host} aperto per {self.cooldown:.0f}s dopo {self.failures} errori")
+                self.opened_at = time.time()
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(host: str) -> CircuitBreaker:
+    with _breakers_lock:
+        if host not in _breakers:
+            _breakers[host] = CircuitBreaker(host)
+        return _breakers[host]
+
+
+# ============================================================
+# POLITICHE DI ATTESA
+# ============================================================
+
+def jitter(seconds: float) -> float:
+    return random.uniform(0, min(seconds, Config.RETRY_JITTER_SEC))
+
+
+def backoff_wait(attempt: int, base: float) -> float:
+    """Backoff esponenziale con jitter: base, 2*base, 4*base... (cap RETRY_MAX_WAIT_SEC)."""
+    wait = min(base * (2 ** attempt), Config.RETRY_MAX_WAIT_SEC)
+    return wait + jitter(wait)
+
+
+def strava_retry_after(res) -> Optional[float]:
+    """
+    Secondi prima che il budget Strava si liberi, dagli header di un 429:
+    - Retry-After se presente
+    - limite giornaliero esaurito -> fino alla mezzanotte UTC
+    - limite 15' esaurito -> fino al prossimo quarto d'ora (finestre allineate a :00/:15/:30/:45)
+    None se gli header non dicono nulla (429 "di passaggio").
+    """
+    retry_after = res.headers.get("Retry-After")
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+
+    usage = res.headers.get("X-RateLimit-Usage", "").split(",")
+    limit = res.headers.get("X-RateLimit-Limit", "").split(",")
+    try:
+        u15, uday = int(usage[0]), int(usage[1])
+        l15, lday = int(limit[0]), int(limit[1])
+    except (ValueError, IndexError):
+        return None
+
+    now = time.time()
+    if uday >= lday:
+        return DAY_SEC - (now % DAY_SEC)
+    if u15 >= l15:
+        return WINDOW_SEC - (now % WINDOW_SEC)
+    return None
+
+
+def strava_429_wait(res, attempt: int) -> Optional[float]:
+    """
+    Attesa dopo un 429 Strava, o None = non riprovare qui.
+    Budget esaurito per più di RETRY_MAX_WAIT_SEC (finestra 15' o giornaliera):
+    il thread non dorme, il chiamante rimanda (StravaService.deferred_until,
+    stream 'pending' nella sync). Altrimenti backoff breve.
+    """
+    wait = strava_retry_after(res)
+    if wait is None:
+        return backoff_wait(attempt, Config.RETRY_BASE_SEC)
+    if wait > Config.RETRY_MAX_WAIT_SEC:
+        return None
+    return wait + jitter(1.0)
+
+
+# ============================================================
+# RICHIESTA RESILIENTE
+# ============================================================
+
+class RetryPolicy:
+    def __init__(self, max_retries: int = 3, base: float = Config.RETRY_BASE_SEC,
+                 wait_429: Optional[Callable[[Any, int], Optional[float]]] = None,
+                 use_breaker: bool = True):
+        self.max_retries = max_retries
+        self.base = base
+        self.wait_429 = wait_429
+        self.use_breaker = use_breaker
+
+
+STRAVA_POLICY = RetryPolicy(max_retries=3, wait_429=strava_429_wait)
+WEATHER_POLICY = RetryPolicy(max_retries=2, base=0.5)
+
+
+@profiled_io("http")
+def resilient_request(http, method: str, url: str, policy: RetryPolicy,
+                      on_response: Optional[Callable[[Any], None]] = None, **kw) -> Optional[Any]:
+    """
+    Esegue la richiesta con retry/attese/breaker.
+    Ritorna l'ultima risposta (anche non 200) oppure None se il breaker è
+    aperto o la rete non risponde dopo tutti i tentativi.
+    """
+    host = urlparse(url).netloc
+    breaker = get_breaker(host) if policy.use_breaker else None
+
+    for attempt in range(policy.max_retries):
+        if breaker and not breaker.allow():
+            return None
+
+        _inc(host, "requests")
+        if attempt > 0:
+            _inc(host, "retries")
+
+        try:
+            res = http.request(method, url, **kw)
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Network Error ({host}): {e}")
+            _inc(host, "errors")
+            if breaker:
+                breaker.record_failure()
+            if attempt + 1 < policy.max_retries:
+                _sleep(host, backoff_wait(attempt, policy.base))
+            continue
+
+        if on_response:
+            on_response(res)
+
+        if res.status_code == 429:
+            _inc(host, "rate_limited")
+            if breaker:
+                breaker.release()
+            wait = policy.wait_429(res, attempt) if policy.wait_429 else backoff_wait(attempt, policy.base)
+            if wait is None or attempt + 1 >= policy.max_retries:
+                logger.warning(f"Rate limit {host}: nessun retry utile")
+                return res
+            logger.warning(f"Rate limit {host}: attesa {wait:.1f}s (tentativo {attempt + 1})")
+            _sleep(host, wait)
+            continue
+
+        if res.status_code >= 500:
+            _inc(host, "errors")
+            if breaker:
+                breaker.record_failure()
+            if attempt + 1 < policy.max_retries:
+                _sleep(host, backoff_wait(attempt, policy.base))
+                continue
+            return res
+
+        if breaker:
+            breaker.record_success()
+        return res
+
+    return None
+
+
+def _sleep(host: str, seconds: float):
+    _inc(host, "wait_s", seconds)
+    time.sleep(seconds)
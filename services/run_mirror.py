@@ -0,0 +1,195 @@
+import os
+import contextlib
+import json
+import time
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+from config import Config
+
+logger = logging.getLogger("sCore.Mirror")
+
+# Invalidazione in-process: scritture fatte da questo processo (save_run, feedback AI, ...)
+_dirty_athletes: Set[int] = set()
+_dirty_generation = 0          # bump = tutti i mirror da riallineare
+_seen_generation: Dict[int, int] = {}
+_dirty_lock = threading.Lock()
+
+
+def invalidate_mirror(athlete_id: Optional[int] = None):
+    """Il prossimo accesso al mirror farà la query delta (None = tutti gli atleti)."""
+    global _dirty_generation
+    with _dirty_lock:
+        if athlete_id is None:
+            _dirty_generation += 1
+        else:
+            _dirty_athletes.add(int(athlete_id))
+
+
+class RunMirror:
+    """
+    Copia locale (SQLite) delle righe di riepilogo di runs per un atleta.
+
+    Allineata con query delta su runs.updated_at (watermark = updated_at più
+    recente visto, con un margine di sovrapposizione per i commit concorrenti).
+    Le righe sono salvate come le restituisce Supabase (colonne SQL), così la
+    mappatura verso le chiavi app resta in DatabaseService.
+
+    Le cancellazioni non hanno updated_at: delete_run/reset_history le
+    applicano direttamente (delete/clear); quelle fatte da altri processi
+    arrivano con la riconciliazione periodica degli id (reconcile).
+
+    Un'istanza per atleta e processo: usare get_run_mirror().
+    """
+
+    def __init__(self, athlete_id: int, base_dir: str):
+        self.athlete_id = int(athlete_id)
+        self._warm_lock = threading.Lock()
+        self.warming = False
+        os.makedirs(base_dir, exist_ok=True)
+        self.path = os.path.join(base_dir, f"athlete_{self.athlete_id}.sqlite")
+        with self._conn() as con:
+            con.execute("CREATE TABLE IF NOT EXISTS runs (id INTEGER PRIMARY KEY, date TEXT, updated_at TEXT, row TEXT)")
+            con.execute("CREATE INDEX IF NOT EXISTS idx_runs_date ON runs(date DESC, id DESC)")
+            con.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    @contextlib.contextmanager
+    def _conn(self):
+        con = sqlite3.connect(self.path, timeout=10)
+        try:
+            with con:  # commit/rollback
+                yield con
+        finally:
+            con.close()
+
+    def _meta(self, con, key: str) -> Optional[str]:
+        row = con.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    # --- STATO ---
+    @property
+    def watermark(self) -> Optional[str]:
+        with self._conn() as con:
+            return self._meta(con, "watermark")
+
+    def delta_since(self) -> Optional[str]:
+        """updated_at da cui chiedere il delta (watermark meno la sovrapposizione)."""
+        wm = self.watermark
+        if not wm:
+            return None
+        try:
+            dt = datetime.fromisoformat(wm.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+        return (dt - timedelta(seconds=Config.MIRROR_OVERLAP_SEC)).isoformat()
+
+    def needs_refresh(self) -> bool:
+        with _dirty_lock:
+            dirty = self.athlete_id in _dirty_athletes or _seen_generation.get(self.athlete_id, 0) < _dirty_generation
+        if dirty:
+            return True
+        with self._conn() as con:
+            checked = self._meta(con, "checked_at")
+        return checked is None or time.time() - float(checked) > Config.MIRROR_TTL_SEC
+
+    def is_warm(self) -> bool:
+        """False finché non è stato scaricato la prima volta (anche se l'atleta non ha corse)."""
+        with self._conn() as con:
+            return self._meta(con, "checked_at") is not None
+
+    def needs_reconcile(self) -> bool:
+        with self._conn() as con:
+            done = self._meta(con, "reconciled_at")
+        return done is None or time.time() - float(done) > Config.MIRROR_RECONCILE_SEC
+
+    def try_start_warm(self) -> bool:
+        """True a un solo chiamante: quello che scalda il mirror (finish_warm a fine lavoro)."""
+        with self._warm_lock:
+            if self.warming:
+                return False
+            self.warming = True
+            return True
+
+    def finish_warm(self):
+        with self._warm_lock:
+            self.warming = False
+
+    def is_empty(self) -> bool:
+        with self._conn() as con:
+            return con.execute("SELECT 1 FROM runs LIMIT 1").fetchone() is None
+
+    # --- SCRITTURA ---
+    def start_refresh(self):
+        """Da chiamare PRIMA della query delta: una scrittura concorrente la rimette dirty."""
+        with _dirty_lock:
+            _dirty_athletes.discard(self.athlete_id)
+            _seen_generation[self.athlete_id] = _dirty_generation
+
+    def apply_delta(self, rows: List[Dict[str, Any]]):
+        """Upsert delle righe cambiate, avanza il watermark e segna il mirror come fresco."""
+        with self._conn() as con:
+            con.executemany(
+                "INSERT OR REPLACE INTO runs (id, date, updated_at, row) VALUES (?, ?, ?, ?)",
+                [(r["id"], r.get("date"), r.get("updated_at"), json.dumps(r, default=str)) for r in rows]
+            )
+            stamps = [r["updated_at"] for r in rows if r.get("updated_at")]
+            wm = self._meta(con, "watermark")
+            if stamps and (wm is None or max(stamps) > wm):
+                con.execute("INSERT OR REPLACE INTO meta VALUES ('watermark', ?)", (max(stamps),))
+            con.execute("INSERT OR REPLACE INTO meta VALUES ('checked_at', ?)", (str(time.time()),))
+
+    def reconcile(self, live_ids: List[int]) -> int:
+        """Toglie le righe cancellate altrove (id non più su Supabase). Ritorna quante."""
+        live = set(int(i) for i in live_ids)
+        with self._conn() as con:
+            gone = [r[0] for r in con.execute("SELECT id FROM runs") if r[0] not in live]
+            con.executemany("DELETE FROM runs WHERE id = ?", [(rid,) for rid in gone])
+            con.execute("INSERT OR REPLACE INTO meta VALUES ('reconciled_at', ?)", (str(time.time()),))
+        return len(gone)
+
+    def delete(self, run_ids: List[int]):
+        with self._conn() as con:
+            con.executemany("DELETE FROM runs WHERE id = ?", [(rid,) for rid in run_ids])
+
+    def clear(self):
+        with self._conn() as con:
+            con.execute("DELETE FROM runs")
+            con.execute("DELETE FROM meta")
+
+    # --- LETTURA ---
+    def rows(self) -> List[Dict[str, Any]]:
+        with self._conn() as con:
+            cur = con.execute("SELECT row FROM runs ORDER BY date DESC, id DESC")
+            return [json.loads(r[0]) for r in cur]
+
+    def page(self, limit: int, cursor: Optional[Tuple[str, int]] = None) -> Tuple[List[Dict[str, Any]], Optional[Tuple[str, int]]]:
+        """Stessa paginazione keyset di DatabaseService.get_history_page, in locale."""
+        with self._conn() as con:
+            if cursor:
+                cur = con.execute(
+                    "SELECT row FROM runs WHERE date < ? OR (date = ? AND id < ?) ORDER BY date DESC, id DESC LIMIT ?",
+                    (cursor[0], cursor[0], cursor[1], limit)
+                )
+            else:
+                cur = con.execute("SELECT row FROM runs ORDER BY date DESC, id DESC LIMIT ?", (limit,))
+            data = [json.loads(r[0]) for r in cur]
+        next_cursor = (data[-1]["date"], data[-1]["id"]) if len(data) == limit else None
+        return data, next_cursor
+
+
+_mirrors: Dict[Tuple[str, int], RunMirror] = {}
+_mirrors_lock = threading.Lock()
+
+
+def get_run_mirror(athlete_id: int, base_dir: str) -> RunMirror:
+    """Mirror dell'atleta, creato una volta per processo (schema e lock di warm-up condivisi)."""
+    key = (base_dir, int(athlete_id))
+    mirror = _mirrors.get(key)
+    if mirror is None:
+        with _mirrors_lock:
+            mirror = _mirrors.get(key)
+            if mirror is None:
+                mirror = _mirrors[key] = RunMirror(athlete_id, base_dir)
+    return mirror
@@ -0,0 +1,333 @@
+"""
+API HTTP locale di scoring attorno a ScoreEngine (solo libreria standard).
+
+Endpoint:
+- POST /score         un record (formati di services/record_scoring.py) -> run_obj
+- POST /score/batch   lista di record, o {"runs": [...], "athlete": {weight, ...}}
+                      -> {"results": [...], "errors": N}, un risultato per record
+- GET  /metrics       contatori: richieste, corse, micro-batch, latenze, throughput
+- GET  /healthz       stato e versione dell'engine
+
+Le richieste singole concorrenti non vengono scorate una per una: il
+MicroBatcher le raccoglie (fino a SCORE_API_MAX_BATCH corse, aspettando al
+massimo SCORE_API_MAX_WAIT_MS) e le passa a ScoreEngine.compute_score_batch
+in un solo passaggio vettoriale. Il batch esplicito ci va direttamente.
+Avvio da riga di comando: score_api.py.
+"""
+import json
+import time
+import queue
+import logging
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+from config import Config
+from services.record_scoring import PHYS_KEYS, default_phys, prepare_record, score_records
+from services.strava_sync import build_run_obj
+
+logger = logging.getLogger("sCore.ScoreServer")
+
+LATENCY_SAMPLES = 4096   # richieste recenti su cui si calcolano i percentili
+RATE_WINDOW_SEC = 60     # finestra del throughput
+
+
+class ServerMetrics:
+    """Contatori del server, aggiornati dai thread delle richieste e dal batcher."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self._t0 = time.monotonic()
+        self.requests: Dict[str, int] = {}
+        self.errors = 0
+        self.runs = 0
+        self.batches = 0
+        self.batched_runs = 0
+        self.max_batch = 0
+        self._recent = deque(maxlen=LATENCY_SAMPLES)   # (fine, ms, corse)
+
+    def record_request(self, route: str, ms: float, runs: int, ok: bool):
+        with self._lock:
+            self.requests[route] = self.requests.get(route, 0) + 1
+            self.runs += runs
+            self.errors += not ok
+            if route.startswith("/score"):
+                self._recent.append((time.monotonic(), ms, runs))
+
+    def record_batch(self, size: int):
+        with self._lock:
+            self.batches += 1
+            self.batched_runs += size
+            self.max_batch = max(self.max_batch, size)
+
+    def snapshot(self, queue_depth: int = 0) -> Dict[str, Any]:
+        with self._lock:
+            recent = list(self._recent)
+            snap = {
+                "engine": Config.ENGINE_VERSION,
+                "uptime_sec": round(time.time() - self.started_at, 1),
+                "requests": dict(self.requests),
+                "errors": self.errors,
+                "runs_scored": self.runs,
+                "engine_batches": self.batches,
+                "avg_batch_size": round(self.batched_runs / self.batches, 2) if self.batches else 0,
+                "max_batch_size": self.max_batch,
+                "queue_depth": queue_depth
+            }
+        lat = sorted(ms for _, ms, _ in recent)
+        snap["latency_ms"] = {
+            "samples": len(lat),
+            "p50": _pct(lat, 0.50),
+            "p95": _pct(lat, 0.95),
+            "p99": _pct(lat, 0.99),
+            "max": round(lat[-1], 2) if lat else 0
+        }
+        now = time.monotonic()
+        window = [(t, runs) for t, _, runs in recent if now - t <= RATE_WINDOW_SEC]
+        span = min(RATE_WINDOW_SEC, max(now - self._t0, 1e-6))
+        snap["throughput"] = {
+            "window_sec": round(span, 1),
+            "requests_per_sec": round(len(window) / span, 1),
+            "runs_per_sec": round(sum(r for _, r in window) / span, 1)
+        }
+        return snap
+
+
+def _pct(sorted_ms: List[float], q: float) -> float:
+    if not sorted_ms:
+        return 0
+    return round(sorted_ms[min(int(q * len(sorted_ms)), len(sorted_ms) - 1)], 2)
+
+
+class ScoringError(Exception):
+    """L'engine ha fallito sul micro-batch: la richiesta risponde 500, non uno score finto."""
+
+
+class _Pending:
+    __slots__ = ("metrics", "dec", "done", "result", "error")
+
+    def __init__(self, metrics, dec: float):
+        self.metrics = metrics
+        self.dec = dec
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[Exception] = None
+
+
+class MicroBatcher:
+    """
+    Un thread che svuota la coda delle corse singole a micro-batch: prende la
+    prima corsa, aspetta le altre fino a max_wait_ms o max_batch corse, poi
+    una sola chiamata a compute_score_batch. Con max_wait_ms=0 scora quello
+    che trova già in coda (nessuna latenza aggiunta a richieste isolate).
+    """
+
+    def __init__(self, engine, max_batch: int = Config.SCORE_API_MAX_BATCH,
+                 max_wait_ms: float = Config.SCORE_API_MAX_WAIT_MS, metrics: Optional[ServerMetrics] = None):
+        self.engine = engine
+        self.max_batch = max(int(max_batch), 1)
+        self.max_wait = max(float(max_wait_ms), 0.0) / 1000
+        self.metrics = metrics
+        self._queue: "queue.Queue[Optional[_Pending]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, name="score-batcher", daemon=True)
+        self._thread.start()
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def submit(self, m, dec: float, timeout: float = Config.SCORE_API_TIMEOUT_SEC) -> Tuple:
+        """Tupla di compute_score per una corsa, scorata nel prossimo micro-batch."""
+        item = _Pending(m, dec)
+        self._queue.put(item)
+        if not item.done.wait(timeout):
+            raise TimeoutError("scoring timed out")
+        if item.error is not None:
+            raise ScoringError(f"scoring failed: {item.error}") from item.error
+        return item.result
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+    def _collect(self, first: _Pending) -> Tuple[List[_Pending], bool]:
+        batch, stop = [first], False
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                stop = True
+                break
+            batch.append(item)
+        return batch, stop
+
+    def _loop(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch, stop = self._collect(first)
+            try:
+                results = self.engine.compute_score_batch([p.metrics for p in batch], [p.dec for p in batch])
+            except Exception as e:
+                # Ogni richiesta del batch riceve l'errore (submit lo rilancia)
+                logger.error(f"Error scoring micro-batch: {e}")
+                for p in batch:
+                    p.error = e
+                    p.done.set()
+                results = []
+            for p, result in zip(batch, results):
+                p.result = result
+                p.done.set()
+            if self.metrics:
+                self.metrics.record_batch(len(batch))
+            if stop:
+                return
+
+
+class ScoringService:
+    """Engine + parametri fisici di default + batcher: la logica dietro gli endpoint."""
+
+    def __init__(self, engine=None, phys: Optional[Dict[str, Any]] = None,
+                 max_batch: int = Config.SCORE_API_MAX_BATCH, max_wait_ms: float = Config.SCORE_API_MAX_WAIT_MS):
+        if engine is None:
+            from services.registry import get_registry
+            engine = get_registry().engine
+        self.engine = engine
+        self.phys = phys or default_phys()
+        self.metrics = ServerMetrics()
+        self.batcher = MicroBatcher(engine, max_batch, max_wait_ms, self.metrics)
+
+    def warm_up(self):
+        """Un batch a vuoto prima di aprire la porta: scipy (percentili) si carica qui, non sulla prima richiesta."""
+        self.score_many([{"distance_km": 10, "duration_sec": 3000, "avg_power": 250, "avg_hr": 150}])
+        self.metrics = ServerMetrics()
+        self.batcher.metrics = self.metrics
+
+    def score_one(self, rec: Dict[str, Any]) -> Dict[str, Any]:
+        m, dec, fields = prepare_record(self.engine, rec, self.phys)
+        return build_run_obj(self.engine, fields, dec, self.batcher.submit(m, dec))
+
+    def score_many(self, recs: List[Any], athlete: Optional[Dict[str, Any]] = None) -> List[Tuple[bool, Dict[str, Any]]]:
+        phys = dict(self.phys, **{k: v for k, v in (athlete or {}).items() if k in PHYS_KEYS and v is not None})
+        results = score_records(self.engine, recs, phys)
+        self.metrics.record_batch(sum(ok for ok, _ in results))
+        return results
+
+    def close(self):
+        self.batcher.close()
+
+
+class _RequestError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class ScoreRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive: i client di carico riusano la connessione
+    disable_nagle_algorithm = True  # header e body sono due write: senza, +40 ms di delayed ACK
+    server_version = f"sCoreAPI/{Config.ENGINE_VERSION}"
+
+    @property
+    def service(self) -> ScoringService:
+        return self.server.service
+
+    def do_GET(self):
+        route = urlsplit(self.path).path
+        if route == "/healthz":
+            self._send(200, {"status": "ok", "engine": Config.ENGINE_VERSION})
+        elif route == "/metrics":
+            self._send(200, self.service.metrics.snapshot(self.service.batcher.depth))
+        else:
+            self._send(404, {"error": f"unknown route {route}"})
+
+    def do_POST(self):
+        route = urlsplit(self.path).path
+        t0 = time.perf_counter()
+        runs, ok = 0, False
+        try:
+            body = self._read_json()
+            if route == "/score":
+                if not isinstance(body, dict):
+                    raise _RequestError(400, "record is not a JSON object")
+                payload = self.service.score_one(body)
+                runs, ok = 1, True
+            elif route == "/score/batch":
+                recs, athlete = body, None
+                if isinstance(body, dict):
+                    recs, athlete = body.get("runs"), body.get("athlete")
+                if not isinstance(recs, list):
+                    raise _RequestError(400, "expected a list of records or {\"runs\": [...]}")
+                results = self.service.score_many(recs, athlete if isinstance(athlete, dict) else None)
+                runs = sum(r_ok for r_ok, _ in results)
+                payload = {"results": [r for _, r in results], "errors": len(results) - runs}
+                ok = True
+            else:
+                raise _RequestError(404, f"unknown route {route}")
+            self._send(200, payload)
+        except _RequestError as e:
+            self._send(e.status, {"error": str(e)})
+        except TimeoutError as e:
+            self._send(503, {"error": str(e)})
+        except ScoringError as e:
+            self._send(500, {"error": str(e)})
+        except KeyError as e:
+            self._send(400, {"error": f"missing field {e}"})
+        except Exception as e:
+            # Record malformato (campi non numerici, ...)
+            self._send(400, {"error": str(e)})
+        finally:
+            known = route if route in ("/score", "/score/batch") else "other"
+            self.service.metrics.record_request(known, (time.perf_counter() - t0) * 1000, runs, ok)
+
+    def _read_json(self) -> Any:
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            raise _RequestError(400, "invalid Content-Length")
+        if length > Config.SCORE_API_MAX_BODY:
+            raise _RequestError(413, f"body larger than {Config.SCORE_API_MAX_BODY} bytes")
+        try:
+            return json.loads(self.rfile.read(length) or b"null")
+        except ValueError as e:
+            raise _RequestError(400, f"invalid JSON: {e}")
+
+    def _send(self, status: int, payload: Any):
+        body = json.dumps(payload, default=float, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        if status == 413:
+            # Il body non è stato letto: la connessione non è riusabile
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+
+class ScoreHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128   # backlog di listen(): il default (5) scarta i client di un burst
+
+    def __init__(self, address: Tuple[str, int], service: ScoringService):
+        super().__init__(address, ScoreRequestHandler)
+        self.service = service
+
+    def server_close(self):
+        super().server_close()
+        self.service.close()
+
+
+def create_server(host: str = Config.SCORE_API_HOST, port: int = Config.SCORE_API_PORT, **service_kwargs) -> ScoreHTTPServer:
+    """Server pronto per serve_forever(); port=0 sceglie una porta libera (server_address)."""
+    return ScoreHTTPServer((host, port), ScoringService(**service_kwargs))
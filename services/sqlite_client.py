@@ -0,0 +1,460 @@
+import os
+import json
+import contextlib
+import sqlite3
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from services.storage import APIResponse, split_top
+
+logger = logging.getLogger("sCore.SQLite")
+
+# ============================================================
+# SCHEMA (stesse tabelle/colonne di Supabase, migrazioni v4_2 .. v4_8)
+# ============================================================
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS athletes (
+    id INTEGER PRIMARY KEY,
+    firstname TEXT,
+    lastname TEXT,
+    weight REAL,
+    hr_max INTEGER,
+    hr_rest INTEGER,
+    ftp INTEGER,
+    age INTEGER,
+    sex TEXT,
+    streak INTEGER DEFAULT 0,
+    engine_version TEXT,
+    last_run_date TEXT,
+    updated_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    athlete_id INTEGER,
+    date TEXT,
+    distance_km REAL,
+    duration_sec INTEGER,
+    avg_power REAL,
+    avg_hr REAL,
+    decoupling REAL,
+    score REAL,
+    wcf REAL,
+    wr_pct REAL,
+    rank TEXT,
+    meteo_desc TEXT,
+    score_version TEXT DEFAULT '4.1',
+    quality TEXT,
+    achievements TEXT,
+    trend TEXT,
+    comparison TEXT,
+    stream_status TEXT DEFAULT 'pending',
+    raw_data TEXT,
+    ai_feedback TEXT,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now')),
+    updated_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))
+);
+
+CREATE TABLE IF NOT EXISTS run_streams (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    stream_type TEXT NOT NULL,
+    data TEXT NOT NULL DEFAULT '[]',
+    sample_count INTEGER,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now')),
+    PRIMARY KEY (run_id, stream_type)
+);
+
+CREATE TABLE IF NOT EXISTS athlete_summary (
+    athlete_id INTEGER PRIMARY KEY,
+    total_runs INTEGER NOT NULL DEFAULT 0,
+    total_km REAL NOT NULL DEFAULT 0,
+    best_score REAL,
+    best_run_id INTEGER,
+    last_run_id INTEGER,
+    last_run_date TEXT,
+    last_score REAL,
+    ma_7 REAL,
+    ma_28 REAL,
+    ma7_delta REAL DEFAULT 0,
+    streak INTEGER DEFAULT 0,
+    recent TEXT NOT NULL DEFAULT '[]',
+    updated_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS feedback (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now')),
+    user_id INTEGER,
+    user_name TEXT,
+    type TEXT,
+    message TEXT,
+    rating INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS score_replay (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now')),
+    run_id INTEGER,
+    athlete_id INTEGER,
+    score_version TEXT,
+    score REAL,
+    decoupling REAL,
+    wcf REAL,
+    percentile REAL,
+    tref_sec REAL,
+    details TEXT
+);
+
+CREATE TABLE IF NOT EXISTS achievements_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now')),
+    athlete_id INTEGER,
+    run_id INTEGER,
+    achievement_name TEXT,
+    icon TEXT
+);
+
+-- Trigger updated_at (come trg_runs_updated_at in v4_5)
+CREATE TRIGGER IF NOT EXISTS trg_runs_updated_at
+AFTER UPDATE ON runs FOR EACH ROW WHEN NEW.updated_at IS OLD.updated_at
+BEGIN
+    UPDATE runs SET updated_at = strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now') WHERE id = NEW.id;
+END;
+
+-- Indexes for performance
+CREATE INDEX IF NOT EXISTS idx_runs_athlete_date ON runs(athlete_id, date DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_runs_athlete_updated ON runs(athlete_id, updated_at);
+CREATE INDEX IF NOT EXISTS idx_runs_athlete_score ON runs(athlete_id, score DESC) WHERE score IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_runs_athlete_score_id ON runs(athlete_id, score DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_runs_athlete_distance_id ON runs(athlete_id, distance_km DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_runs_athlete_rank_date ON runs(athlete_id, rank, date DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_runs_stream_pending ON runs(athlete_id) WHERE stream_status = 'pending';
+CREATE INDEX IF NOT EXISTS idx_replay_run_id ON score_replay(run_id);
+CREATE INDEX IF NOT EXISTS idx_achievements_athlete ON achievements_log(athlete_id);
+"""
+
+# Colonne JSONB su Postgres: qui TEXT serializzato
+JSON_COLUMNS: Dict[str, set] = {
+    "runs": {"achievements", "trend", "comparison", "raw_data"},
+    "run_streams": {"data"},
+    "athlete_summary": {"recent"},
+    "score_replay": {"details"},
+}
+
+# Chiave di conflitto per upsert (default "id")
+CONFLICT_KEYS: Dict[str, Tuple[str, ...]] = {
+    "run_streams": ("run_id", "stream_type"),
+    "athlete_summary": ("athlete_id",),
+}
+
+
+class SQLiteClient:
+    """
+    Backend embedded: stesso query builder del client Supabase
+    (table().select().eq()...execute()) tradotto in SQL su un file SQLite.
+    DatabaseService gira invariato, in-process e senza rete.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.RLock()
+        self.con = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.con.row_factory = sqlite3.Row
+        self.con.execute("PRAGMA foreign_keys = ON")
+        if path != ":memory:":
+            self.con.execute("PRAGMA journal_mode = WAL")
+        self.con.executescript(SCHEMA)
+        self.rpcs: Dict[str, Callable[..., Any]] = {}
+        # Trigger AFTER per riga: fn(client, old, new), nella stessa transazione della scrittura
+        self.triggers: Dict[str, List[Callable[..., Any]]] = {}
+        self._tx_depth = 0
+        from services.storage import TABLES
+        self._columns = {
+            t: [r["name"] for r in self.con.execute(f"PRAGMA table_info({t})")]
+            for t in TABLES
+        }
+        # Niente funzioni/trigger PL/pgSQL: RPC v4_6 e riepilogo v4_7 emulati in Python
+        from services.stats_rpc import register_stats_rpcs
+        from services.athlete_summary import register_summary
+        register_stats_rpcs(self)
+        register_summary(self)
+
+    def table(self, name: str) -> "SQLiteQuery":
+        if name not in self._columns:
+            raise RuntimeError(f"relation \"public.{name}\" does not exist")
+        return SQLiteQuery(self, name)
+
+    def rpc(self, name: str, params: Optional[Dict[str, Any]] = None) -> "SQLiteRpc":
+        return SQLiteRpc(self, name, params or {})
+
+    def register_rpc(self, name: str, fn: Callable[["SQLiteClient", Dict[str, Any]], Any]):
+        self.rpcs[name] = fn
+
+    def register_trigger(self, table: str, fn: Callable[["SQLiteClient", Optional[Dict[str, Any]], Optional[Dict[str, Any]]], Any]):
+        self.triggers.setdefault(table, []).append(fn)
+
+    def fire(self, table: str, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]):
+        for fn in self.triggers.get(table, []):
+            fn(self, old, new)
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Commit/rollback solo al livello più esterno (i trigger scrivono dentro la stessa transazione)."""
+        with self._lock:
+            self._tx_depth += 1
+            try:
+                if self._tx_depth == 1:
+                    with self.con:
+                        yield
+                else:
+                    yield
+            finally:
+                self._tx_depth -= 1
+
+    def query(self, sql: str, params: Tuple = ()) -> List[Dict[str, Any]]:
+        """SQL diretto (analisi locali); righe come dict."""
+        with self._lock:
+            return [dict(r) for r in self.con.execute(sql, params)]
+
+    def close(self):
+        with self._lock:
+            self.con.close()
+
+
+class SQLiteRpc:
+    def __init__(self, client: SQLiteClient, name: str, params: Dict[str, Any]):
+        self.client = client
+        self.name = name
+        self.params = params
+
+    def execute(self) -> APIResponse:
+        fn = self.client.rpcs.get(self.name)
+        if fn is None:
+            raise RuntimeError(f"Could not find the function public.{self.name}")
+        data = fn(self.client, self.params)
+        if isinstance(data, dict):
+            data = [data]
+        return APIResponse(data or [])
+
+
+class SQLiteQuery:
+    def __init__(self, client: SQLiteClient, table: str):
+        self.client = client
+        self.name = table
+        self.op = "select"
+        self.columns = "*"
+        self.json_aliases: set = set()
+        self.where: List[str] = []
+        self.params: List[Any] = []
+        self.orders: List[str] = []
+        self._limit: Optional[int] = None
+        self._offset = 0
+        self.payload: Any = None
+        self.count_mode: Optional[str] = None
+
+    # --- operazioni ---
+    def select(self, columns: str = "*", count: Optional[str] = None):
+        self.op = "select"
+        self.count_mode = count
+        cols = [c.strip() for c in columns.split(",") if c.strip()]
+        if "*" in cols:
+            self.columns = "*"
+        else:
+            self.columns = ", ".join(self._column_sql(c) for c in cols)
+        return self
+
+    def insert(self, payload):
+        self.op, self.payload = "insert", payload
+        return self
+
+    def upsert(self, payload, on_conflict: Optional[str] = None):
+        self.op, self.payload = "upsert", payload
+        return self
+
+    def update(self, payload):
+        self.op, self.payload = "update", payload
+        return self
+
+    def delete(self):
+        self.op = "delete"
+        return self
+
+    # --- filtri ---
+    def _f(self, sql: str, *params):
+        self.where.append(sql)
+        self.params.extend(params)
+        return self
+
+    def eq(self, col, val):
+        return self._f(f"{self._col(col)} = ?", val)
+
+    def neq(self, col, val):
+        return self._f(f"{self._col(col)} != ?", val)
+
+    def in_(self, col, vals):
+        vals = list(vals)
+        if not vals:
+            return self._f("0")
+        return self._f(f"{self._col(col)} IN ({', '.join('?' * len(vals))})", *vals)
+
+    def gt(self, col, val):
+        return self._f(f"{self._col(col)} > ?", val)
+
+    def gte(self, col, val):
+        return self._f(f"{self._col(col)} >= ?", val)
+
+    def lt(self, col, val):
+        return self._f(f"{self._col(col)} < ?", val)
+
+    def lte(self, col, val):
+        return self._f(f"{self._col(col)} <= ?", val)
+
+    def is_(self, col, val):
+        if val in (None, "null"):
+            return self._f(f"{self._col(col)} IS NULL")
+        return self._f(f"{self._col(col)} IS ?", val)
+
+    def or_(self, expr: str):
+        """Sottoinsieme PostgREST: 'a.lt.x,and(a.eq.x,b.lt.y)'."""
+        sql, params = self._or_sql(expr, " OR ")
+        return self._f(f"({sql})", *params)
+
+    def order(self, col, desc: bool = False):
+        self.orders.append(f"{self._col(col)} {'DESC' if desc else 'ASC'}")
+        return self
+
+    def limit(self, n: int):
+        self._limit = n
+        return self
+
+    def range(self, start: int, end: int):
+        self._offset, self._limit = start, end - start + 1
+        return self
+
+    # --- traduzione ---
+    def _col(self, col: str) -> str:
+        if col not in self.client._columns[self.name]:
+            raise RuntimeError(f"column {self.name}.{col} does not exist")
+        return f'"{col}"'
+
+    def _column_sql(self, spec: str) -> str:
+        """'col', 'col->key' o 'alias:col->key' (proiezione JSON di PostgREST)."""
+        alias, _, path = spec.rpartition(":")
+        parts = path.replace("->>", "->").split("->")
+        if len(parts) == 1:
+            return self._col(parts[0]) + (f' AS "{alias}"' if alias else "")
+        alias = alias or parts[-1]
+        self.json_aliases.add(alias)
+        return f"json_extract({self._col(parts[0])}, '$.{'.'.join(parts[1:])}') AS \"{alias}\""
+
+    def _or_sql(self, expr: str, joiner: str) -> Tuple[str, List[Any]]:
+        parts, params = [], []
+        for term in split_top(expr):
+            term = term.strip()
+            if term.startswith("and(") and term.endswith(")"):
+                sql, p = self._or_sql(term[4:-1], " AND ")
+                parts.append(f"({sql})")
+                params.extend(p)
+                continue
+            col, op, val = term.split(".", 2)
+            if len(val) > 1 and val[0] == val[-1] == '"':
+                val = val[1:-1]
+            parts.append(f"{self._col(col)} {_SQL_OPS[op]} ?")
+            params.append(val)
+        return joiner.join(parts), params
+
+    def _where_sql(self) -> str:
+        return (" WHERE " + " AND ".join(self.where)) if self.where else ""
+
+    def _encode(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        cols = self.client._columns[self.name]
+        json_cols = JSON_COLUMNS.get(self.name, set())
+        out = {}
+        for k, v in row.items():
+            if k not in cols:
+                raise RuntimeError(f"Could not find the '{k}' column of '{self.name}'")
+            out[k] = json.dumps(v, default=str) if k in json_cols and v is not None else v
+        return out
+
+    def _decode(self, rows) -> List[Dict[str, Any]]:
+        json_cols = JSON_COLUMNS.get(self.name, set())
+        out = []
+        for r in rows:
+            d = dict(r)
+            for k, v in d.items():
+                if isinstance(v, str) and (k in json_cols or k in self.json_aliases) and v[:1] in ("{", "["):
+                    d[k] = json.loads(v)
+            out.append(d)
+        return out
+
+    # --- esecuzione ---
+    def _old_rows(self, where: str, params: List[Any]) -> Dict[Any, Dict[str, Any]]:
+        """Righe prima della scrittura (OLD dei trigger), per chiave di conflitto."""
+        keys = CONFLICT_KEYS.get(self.name, ("id",))
+        rows = self._decode(self.client.con.execute(f'SELECT * FROM "{self.name}"{where}', params).fetchall())
+        return {tuple(r[k] for k in keys): r for r in rows}
+
+    def execute(self) -> APIResponse:
+        c = self.client
+        triggered = bool(c.triggers.get(self.name))
+        keys = CONFLICT_KEYS.get(self.name, ("id",))
+        with c.transaction():
+            if self.op == "select":
+                sql = f'SELECT {self.columns} FROM "{self.name}"{self._where_sql()}'
+                if self.orders:
+                    sql += " ORDER BY " + ", ".join(self.orders)
+                if self._limit is not None or self._offset:
+                    sql += f" LIMIT {self._limit if self._limit is not None else -1} OFFSET {self._offset}"
+                rows = self._decode(c.con.execute(sql, self.params))
+                count = None
+                if self.count_mode:
+                    count = c.con.execute(f'SELECT COUNT(*) FROM "{self.name}"{self._where_sql()}', self.params).fetchone()[0]
+                return APIResponse(rows, count)
+
+            if self.op in ("insert", "upsert"):
+                items = self.payload if isinstance(self.payload, list) else [self.payload]
+                out = []
+                for item in items:
+                    row = self._encode(item)
+                    cols = list(row.keys())
+                    old = None
+                    if triggered and all(k in row for k in keys):
+                        where = " WHERE " + " AND ".join(f'"{k}" = ?' for k in keys)
+                        old = next(iter(self._old_rows(where, [row[k] for k in keys]).values()), None)
+                    sql = f'INSERT INTO "{self.name}" ({", ".join(chr(34) + k + chr(34) for k in cols)}) VALUES ({", ".join("?" * len(cols))})'
+                    if self.op == "upsert":
+                        updates = [k for k in cols if k not in keys]
+                        sql += f' ON CONFLICT ({", ".join(keys)}) DO ' + (
+                            "UPDATE SET " + ", ".join(f'"{k}" = excluded."{k}"' for k in updates) if updates else "NOTHING"
+                        )
+                    sql += " RETURNING *"
+                    new_rows = self._decode(c.con.execute(sql, [row[k] for k in cols]).fetchall())
+                    out.extend(new_rows)
+                    for new in new_rows:
+                        c.fire(self.name, old, new)
+                return APIResponse(out)
+
+            if self.op == "update":
+                olds = self._old_rows(self._where_sql(), self.params) if triggered else {}
+                row = self._encode(self.payload)
+                sets = ", ".join(f'"{k}" = ?' for k in row)
+                sql = f'UPDATE "{self.name}" SET {sets}{self._where_sql()} RETURNING *'
+                rows = self._decode(c.con.execute(sql, list(row.values()) + self.params).fetchall())
+                for new in rows:
+                    c.fire(self.name, olds.get(tuple(new[k] for k in keys)), new)
+                return APIResponse(rows)
+
+            if self.op == "delete":
+                sql = f'DELETE FROM "{self.name}"{self._where_sql()} RETURNING *'
+                rows = self._decode(c.con.execute(sql, self.params).fetchall())
+                for old in rows:
+                    c.fire(self.name, old, None)
+                return APIResponse(rows)
+
+        raise ValueError(f"Unsupported op {self.op}")
+
+
+_SQL_OPS = {"eq": "=", "neq": "!=", "lt": "<", "lte": "<=", "gt": ">", "gte": ">="}
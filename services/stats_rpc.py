@@ -0,0 +1,136 @@
+"""
+Emulazione Python delle RPC di migrations/v4_6_stats_rpc.sql per i backend
+senza Postgres (SQLiteClient, InMemoryClient): stessa firma (client, params)
+e stesso risultato, così DatabaseService chiama client.rpc() ovunque.
+"""
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+RUN_COLUMNS = "id,date,score,distance_km,decoupling"
+
+
+def _day(value) -> Optional[date]:
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except (TypeError, ValueError):
+        return None
+
+
+def _athlete_runs(client, athlete_id: int, since: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Corse dell'atleta dalla più vecchia alla più recente (ordine delle finestre mobili)."""
+    rows = client.table("runs").select(RUN_COLUMNS).eq("athlete_id", athlete_id)\
+        .order("date").order("id").execute().data or []
+    if since:
+        cut = _day(since)
+        rows = [r for r in rows if _day(r.get("date")) and _day(r["date"]) >= cut]
+    return rows
+
+
+def _mean(values: List[float]) -> Optional[float]:
+    return sum(values) / len(values) if values else None
+
+
+def score_trend(rows: List[Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
+    scored = [r for r in rows if r.get("score") is not None]
+    out = []
+    for i, r in enumerate(scored):
+        out.append({
+            "id": r["id"],
+            "date": str(r["date"]),
+            "score": r["score"],
+            "ma_7": _mean([x["score"] for x in scored[max(0, i - 6):i + 1]]),
+            "ma_28": _mean([x["score"] for x in scored[max(0, i - 27):i + 1]])
+        })
+    return out[::-1][:limit]
+
+
+def streak(rows: List[Dict[str, Any]]) -> int:
+    scores = [r.get("score") for r in rows[::-1][:10]]
+    for i in range(1, len(scores)):
+        if scores[i - 1] is not None and scores[i] is not None and scores[i - 1] < scores[i]:
+            return i
+    return max(len(scores), 1)
+
+
+def _period_start(d: date, period: str) -> date:
+    if period == "week":
+        return d - timedelta(days=d.weekday())
+    if period == "year":
+        return d.replace(month=1, day=1)
+    return d.replace(day=1)
+
+
+# --- RPC (client, params) ---
+
+def rpc_athlete_score_trend(client, params: Dict[str, Any]):
+    rows = _athlete_runs(client, params["p_athlete_id"])
+    return score_trend(rows, int(params.get("p_limit", 60)))
+
+
+def rpc_athlete_streak(client, params: Dict[str, Any]):
+    return [{"athlete_streak": streak(_athlete_runs(client, params["p_athlete_id"]))}]
+
+
+def rpc_refresh_athlete_streak(client, params: Dict[str, Any]):
+    s = streak(_athlete_runs(client, params["p_athlete_id"]))
+    client.table("athletes").update({"streak": s}).eq("id", params["p_athlete_id"]).execute()
+    return [{"refresh_athlete_streak": s}]
+
+
+def rpc_athlete_dashboard_stats(client, params: Dict[str, Any]):
+    rows = _athlete_runs(client, params["p_athlete_id"])
+    trend = score_trend(rows, 2)
+    since = _day(params.get("p_since")) if params.get("p_since") else None
+    period = [r for r in rows if since is None or (_day(r.get("date")) and _day(r["date"]) >= since)]
+    scores = [r["score"] for r in period if r.get("score") is not None]
+    decs = [r["decoupling"] for r in period if r.get("decoupling") is not None]
+    last = trend[0] if trend else {}
+    return {
+        "last_score": last.get("score"),
+        "last_date": last.get("date"),
+        "ma_7": last.get("ma_7"),
+        "ma_28": last.get("ma_28"),
+        "ma7_delta": (trend[0]["ma_7"] - trend[1]["ma_7"]) if len(trend) > 1 else 0,
+        "streak": streak(rows),
+        "period_runs": len(period),
+        "period_avg_score": _mean(scores),
+        "period_best_score": max(scores) if scores else None,
+        "period_distance_km": sum(r.get("distance_km") or 0 for r in period) if period else None,
+        "period_avg_decoupling": _mean(decs)
+    }
+
+
+def rpc_athlete_period_summary(client, params: Dict[str, Any]):
+    period = params.get("p_period", "month")
+    buckets: Dict[date, List[Dict[str, Any]]] = {}
+    for r in _athlete_runs(client, params["p_athlete_id"], params.get("p_since")):
+        d = _day(r.get("date"))
+        if d:
+            buckets.setdefault(_period_start(d, period), []).append(r)
+    out = []
+    for start in sorted(buckets, reverse=True):
+        rs = buckets[start]
+        scores = [r["score"] for r in rs if r.get("score") is not None]
+        out.append({
+            "period_start": start.isoformat(),
+            "run_count": len(rs),
+            "avg_score": _mean(scores),
+            "best_score": max(scores) if scores else None,
+            "total_km": sum(r.get("distance_km") or 0 for r in rs),
+            "avg_decoupling": _mean([r["decoupling"] for r in rs if r.get("decoupling") is not None])
+        })
+    return out
+
+
+STATS_RPCS = {
+    "athlete_score_trend": rpc_athlete_score_trend,
+    "athlete_streak": rpc_athlete_streak,
+    "refresh_athlete_streak": rpc_refresh_athlete_streak,
+    "athlete_dashboard_stats": rpc_athlete_dashboard_stats,
+    "athlete_period_summary": rpc_athlete_period_summary,
+}
+
+
+def register_stats_rpcs(client):
+    for name, fn in STATS_RPCS.items():
+        client.register_rpc(name, fn)
@@ -0,0 +1,301 @@
+import logging
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Protocol, Tuple
+from config import Config
+
+logger = logging.getLogger("sCore.Storage")
+
+# Tabelle usate da DatabaseService (schema: migrations/*.sql)
+TABLES = ("athletes", "runs", "run_streams", "athlete_summary", "feedback", "score_replay", "achievements_log")
+
+
+class StorageClient(Protocol):
+    """
+    Query builder del client Supabase (PostgREST), cioè
+
+        client.table(name).select(cols).eq(col, val).order(col, desc=True).limit(n).execute()
+        client.table(name).insert/upsert/update(payload) / .delete() ... .execute()
+        client.rpc(name, params).execute()
+
+    con execute() che ritorna un oggetto con .data (lista di dict) e .count.
+    È il livello sotto PostgRESTStorage, non l'interfaccia di DatabaseService.
+
+    Implementazioni:
+    - supabase.Client              (produzione, rete)
+    - services.sqlite_client.SQLiteClient  (embedded, stesso schema + indici)
+    - offline.memory_db.InMemoryClient     (stand-in per test di carico)
+    """
+
+    def table(self, name: str) -> Any: ...
+
+    def rpc(self, name: str, params: Optional[Dict[str, Any]] = None) -> Any: ...
+
+
+class APIResponse:
+    """Risultato di execute() per i client embedded (SQLiteClient, InMemoryClient)."""
+
+    def __init__(self, data: List[Dict[str, Any]], count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+
+def split_top(expr: str) -> List[str]:
+    """Divide un filtro PostgREST sulle virgole di primo livello: "a.eq.1,and(b.gt.2,c.lt.3)"."""
+    out, depth, cur = [], 0, ""
+    for ch in expr:
+        if ch == "," and depth == 0:
+            out.append(cur)
+            cur = ""
+            continue
+        depth += ch == "("
+        depth -= ch == ")"
+        cur += ch
+    if cur:
+        out.append(cur)
+    return out
+
+
+class Storage(Protocol):
+    """
+    Interfaccia di storage su cui gira DatabaseService: operazioni di dominio
+    per tabella, con righe nelle colonne SQL (migrations/*.sql). La mappatura
+    verso le chiavi app, il mirror e la gestione errori restano in DatabaseService;
+    qui gli errori si propagano come eccezioni.
+
+    Implementazioni:
+    - PostgRESTStorage(client)  su un qualunque StorageClient (Supabase, SQLite, in memoria)
+    """
+
+    # --- athletes / athlete_summary ---
+    def upsert_athlete(self, profile: Dict[str, Any]) -> None: ...
+
+    def get_athlete(self, athlete_id: int) -> Optional[Dict[str, Any]]: ...
+
+    def set_athlete_streak(self, athlete_id: int, streak: int) -> None: ...
+
+    def get_athlete_summary(self, athlete_id: int) -> Optional[Dict[str, Any]]: ...
+
+    # --- runs ---
+    def upsert_run(self, row: Dict[str, Any]) -> None: ...
+
+    def update_runs(self, run_ids: List[int], fields: Dict[str, Any]) -> None: ...
+
+    def delete_runs(self, athlete_id: int, run_ids: Optional[List[int]] = None) -> None: ...
+
+    def run_exists(self, run_id: int) -> bool: ...
+
+    def run_ids(self, athlete_id: int, rank: Optional[str] = None, stream_status: Optional[str] = None) -> List[int]: ...
+
+    def runs_page(self, athlete_id: int, columns: str, filters: Optional[Dict[str, Any]] = None,
+                  sort: str = "date", desc: bool = True, limit: Optional[int] = None,
+                  cursor: Optional[Tuple[Any, int]] = None, with_count: bool = False) -> Tuple[List[Dict[str, Any]], Optional[int]]: ...
+
+    def runs_changed_since(self, athlete_id: int, columns: str, since: Optional[str] = None) -> List[Dict[str, Any]]: ...
+
+    def recent_scores(self, athlete_id: int, limit: int) -> List[float]: ...
+
+    # --- run_streams (e stream legacy in runs.raw_data) ---
+    def upsert_run_streams(self, rows: List[Dict[str, Any]]) -> None: ...
+
+    def get_run_streams(self, run_id: int) -> List[Dict[str, Any]]: ...
+
+    def get_legacy_streams(self, run_id: int) -> Dict[str, Any]: ...
+
+    def legacy_streams_batch(self, after_id: int, limit: int) -> List[Dict[str, Any]]: ...
+
+    # --- feedback / score_replay / achievements_log ---
+    def insert_feedback(self, row: Dict[str, Any]) -> None: ...
+
+    def insert_replay(self, row: Dict[str, Any]) -> None: ...
+
+    def insert_achievement(self, row: Dict[str, Any]) -> None: ...
+
+    # --- aggregati nel DB (migrations/v4_6_stats_rpc.sql, v4_7_athlete_summary.sql) ---
+    def dashboard_stats(self, athlete_id: int, since: Optional[str] = None) -> Dict[str, Any]: ...
+
+    def score_trend(self, athlete_id: int, limit: int) -> List[Dict[str, Any]]: ...
+
+    def period_summary(self, athlete_id: int, period: str, since: Optional[str] = None) -> List[Dict[str, Any]]: ...
+
+    def refresh_streak(self, athlete_id: int) -> None: ...
+
+    def rebuild_athlete_summary(self, athlete_id: Optional[int] = None) -> int: ...
+
+    def close(self) -> None: ...
+
+
+def _rpc_scalar(data: Any, default: Any) -> Any:
+    """Una RPC PostgREST può tornare il valore, [valore] o [{nome: valore}]."""
+    if isinstance(data, list):
+        data = data[0] if data else default
+    return data if data is not None else default
+
+
+class PostgRESTStorage:
+    """Storage sul query builder PostgREST (StorageClient): Supabase, SQLiteClient o InMemoryClient."""
+
+    def __init__(self, client: StorageClient):
+        self.client = client
+
+    # --- athletes / athlete_summary ---
+    def upsert_athlete(self, profile: Dict[str, Any]) -> None:
+        self.client.table("athletes").upsert(profile).execute()
+
+    def get_athlete(self, athlete_id: int) -> Optional[Dict[str, Any]]:
+        res = self.client.table("athletes").select("*").eq("id", athlete_id).execute()
+        return res.data[0] if res.data else None
+
+    def set_athlete_streak(self, athlete_id: int, streak: int) -> None:
+        self.client.table("athletes").update({"streak": streak}).eq("id", athlete_id).execute()
+
+    def get_athlete_summary(self, athlete_id: int) -> Optional[Dict[str, Any]]:
+        res = self.client.table("athlete_summary").select("*").eq("athlete_id", athlete_id).execute()
+        return res.data[0] if res.data else None
+
+    # --- runs ---
+    def upsert_run(self, row: Dict[str, Any]) -> None:
+        self.client.table("runs").upsert(row).execute()
+
+    def update_runs(self, run_ids: List[int], fields: Dict[str, Any]) -> None:
+        if len(run_ids) == 1:
+            self.client.table("runs").update(fields).eq("id", run_ids[0]).execute()
+        elif run_ids:
+            self.client.table("runs").update(fields).in_("id", run_ids).execute()
+
+    def delete_runs(self, athlete_id: int, run_ids: Optional[List[int]] = None) -> None:
+        query = self.client.table("runs").delete().eq("athlete_id", athlete_id)
+        if run_ids is not None:
+            query = query.eq("id", run_ids[0]) if len(run_ids) == 1 else query.in_("id", run_ids)
+        query.execute()
+
+    def run_exists(self, run_id: int) -> bool:
+        res = self.client.table("runs").select("id").eq("id", run_id).execute()
+        return bool(res.data)
+
+    def run_ids(self, athlete_id: int, rank: Optional[str] = None, stream_status: Optional[str] = None) -> List[int]:
+        query = self.client.table("runs").select("id").eq("athlete_id", athlete_id)
+        if rank is not None:
+            query = query.eq("rank", rank)
+        if stream_status is not None:
+            query = query.eq("stream_status", stream_status)
+        return [row["id"] for row in query.execute().data or []]
+
+    def runs_page(self, athlete_id: int, columns: str, filters: Optional[Dict[str, Any]] = None,
+                  sort: str = "date", desc: bool = True, limit: Optional[int] = None,
+                  cursor: Optional[Tuple[Any, int]] = None, with_count: bool = False) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """
+        Corse di un atleta ordinate per (sort, id), keyset dopo cursor = (valore, id).
+        filters: vedi DatabaseService.get_archive_page. limit None = tutte.
+        """
+        filters = filters or {}
+        query = self.client.table("runs")\
+            .select(columns, count="exact" if with_count else None)\
+            .eq("athlete_id", athlete_id)
+        if filters.get("dist_min") is not None:
+            query = query.gte("distance_km", filters["dist_min"])
+        if filters.get("dist_max") is not None:
+            query = query.lt("distance_km", filters["dist_max"])
+        if filters.get("ranks"):
+            query = query.in_("rank", list(filters["ranks"]))
+        if filters.get("date_from"):
+            query = query.gte("date", str(filters["date_from"]))
+        if filters.get("date_to"):
+            # date è un timestamp: "fino al giorno X compreso" = prima del giorno dopo
+            day_after = date.fromisoformat(str(filters["date_to"])[:10]) + timedelta(days=1)
+            query = query.lt("date", day_after.isoformat())
+        if filters.get("score_min") is not None:
+            query = query.gte("score", filters["score_min"])
+        if filters.get("score_max") is not None:
+            query = query.lte("score", filters["score_max"])
+        if cursor:
+            last_val, last_id = cursor
+            op = "lt" if desc else "gt"
+            query = query.or_(f'{sort}.{op}."{last_val}",and({sort}.eq."{last_val}",id.{op}.{last_id})')
+        query = query.order(sort, desc=desc).order("id", desc=desc)
+        if limit is not None:
+            query = query.limit(limit)
+        res = query.execute()
+        return res.data or [], res.count
+
+    def runs_changed_since(self, athlete_id: int, columns: str, since: Optional[str] = None) -> List[Dict[str, Any]]:
+        query = self.client.table("runs").select(columns).eq("athlete_id", athlete_id)
+        if since:
+            query = query.gte("updated_at", since)
+        return query.execute().data or []
+
+    def recent_scores(self, athlete_id: int, limit: int) -> List[float]:
+        res = self.client.table("runs")\
+            .select("score")\
+            .eq("athlete_id", athlete_id)\
+            .order("date", desc=True)\
+            .limit(limit).execute()
+        return [r["score"] for r in res.data or []]
+
+    # --- run_streams (e stream legacy in runs.raw_data) ---
+    def upsert_run_streams(self, rows: List[Dict[str, Any]]) -> None:
+        self.client.table("run_streams").upsert(rows).execute()
+
+    def get_run_streams(self, run_id: int) -> List[Dict[str, Any]]:
+        return self.client.table("run_streams").select("stream_type,data").eq("run_id", run_id).execute().data or []
+
+    def get_legacy_streams(self, run_id: int) -> Dict[str, Any]:
+        res = self.client.table("runs").select("watts:raw_data->watts,hr:raw_data->hr").eq("id", run_id).execute()
+        return res.data[0] if res.data else {}
+
+    def legacy_streams_batch(self, after_id: int, limit: int) -> List[Dict[str, Any]]:
+        res = self.client.table("runs")\
+            .select("id,watts:raw_data->watts,hr:raw_data->hr,details:raw_data->details")\
+            .gt("id", after_id)\
+            .order("id")\
+            .limit(limit).execute()
+        return res.data or []
+
+    # --- feedback / score_replay / achievements_log ---
+    def insert_feedback(self, row: Dict[str, Any]) -> None:
+        self.client.table("feedback").insert(row).execute()
+
+    def insert_replay(self, row: Dict[str, Any]) -> None:
+        self.client.table("score_replay").insert(row).execute()
+
+    def insert_achievement(self, row: Dict[str, Any]) -> None:
+        self.client.table("achievements_log").insert(row).execute()
+
+    # --- aggregati nel DB ---
+    def dashboard_stats(self, athlete_id: int, since: Optional[str] = None) -> Dict[str, Any]:
+        res = self.client.rpc("athlete_dashboard_stats", {"p_athlete_id": athlete_id, "p_since": since}).execute()
+        return _rpc_scalar(res.data, {}) or {}
+
+    def score_trend(self, athlete_id: int, limit: int) -> List[Dict[str, Any]]:
+        return self.client.rpc("athlete_score_trend", {"p_athlete_id": athlete_id, "p_limit": limit}).execute().data or []
+
+    def period_summary(self, athlete_id: int, period: str, since: Optional[str] = None) -> List[Dict[str, Any]]:
+        res = self.client.rpc("athlete_period_summary", {"p_athlete_id": athlete_id, "p_period": period, "p_since": since}).execute()
+        return res.data or []
+
+    def refresh_streak(self, athlete_id: int) -> None:
+        self.client.rpc("refresh_athlete_streak", {"p_athlete_id": athlete_id}).execute()
+
+    def rebuild_athlete_summary(self, athlete_id: Optional[int] = None) -> int:
+        data = _rpc_scalar(self.client.rpc("rebuild_athlete_summary", {"p_athlete_id": athlete_id}).execute().data, 0)
+        if isinstance(data, dict):
+            data = data.get("rebuild_athlete_summary", 0)
+        return int(data or 0)
+
+    def close(self) -> None:
+        close = getattr(self.client, "close", None)
+        if callable(close):
+            close()
+
+
+def create_storage_client(backend: Optional[str] = None) -> StorageClient:
+    """Client per il backend configurato ('supabase' | 'sqlite')."""
+    backend = backend or Config.get_storage_backend()
+    if backend == "sqlite":
+        from services.sqlite_client import SQLiteClient
+        logger.info(f"Storage: SQLite embedded ({Config.SQLITE_PATH})")
+        return SQLiteClient(Config.SQLITE_PATH)
+    if backend == "supabase":
+        from supabase import create_client
+        creds = Config.get_supabase_creds()
+        return create_client(creds["url"], creds["key"])
+    raise ValueError(f"Unknown storage backend: {backend}")
@@ -1,134 +1,379 @@
 import time
 import logging
+from typing import Optional, Dict, List, Any, Tuple
+from config import Config
 from engine.core import RunMetrics
+from services.weather_batch import resolve_weather_batch
+from services.sync_journal import SyncJournal
+from services.stream_scheduler import StreamScheduler, has_stream_data, STREAM_PENDING, STREAM_FETCHED, STREAM_UNAVAILABLE
 
 logger = logging.getLogger("sCore.StravaSync")
 
-def safe_strava_sync(
-    auth_svc,
-    db_svc,
+# Campi del summary Strava che servono per lo scoring (il resto non va nel journal)
+ACTIVITY_FIELDS = (
+    "id", "type", "start_date_local", "start_latlng", "distance", "moving_time",
+    "total_elevation_gain", "average_watts", "average_heartrate", "average_temp",
+    "has_heartrate", "device_watts", "manual"
+)
+
+
+def activity_metrics(s: Dict[str, Any], phys: Dict[str, Any], temp_c: float, humidity: float) -> RunMetrics:
+    """Summary Strava + parametri fisici + meteo -> input dell'engine."""
+    return RunMetrics(
+        avg_power=s.get("average_watts", 0) or 0,
+        avg_hr=s.get("average_heartrate", 0) or 0,
+        distance=s.get("distance", 0) or 0,
+        moving_time=s.get("moving_time", 0) or 0,
+        elevation_gain=s.get("total_elevation_gain", 0) or 0,
+        weight=phys.get("weight") or Config.DEFAULT_WEIGHT,
+        hr_max=phys.get("hr_max") or Config.DEFAULT_HR_MAX,
+        hr_rest=phys.get("hr_rest") or Config.DEFAULT_HR_REST,
+        temp_c=temp_c,
+        humidity=humidity,
+        age=phys.get("age") or Config.DEFAULT_AGE,
+        sex=phys.get("sex") or "M"
+    )
+
+
+def activity_fields(s: Dict[str, Any], temp_c: float) -> Dict[str, Any]:
+    """Colonne del run_obj che vengono dal summary, non dallo score."""
+    return {
+        "id": s["id"],
+        "Data": s["start_date_local"][:10],
+        "Dist (km)": round((s.get("distance", 0) or 0) / 1000, 2),
+        "Power": int(s.get("average_watts", 0) or 0),
+        "HR": int(s.get("average_heartrate", 0) or 0),
+        "Meteo": f"{temp_c}°C"
+    }
+
+
+def build_run_obj(eng, fields: Dict[str, Any], dec: float, result: Tuple) -> Dict[str, Any]:
+    """fields (activity_fields) + decoupling + tupla di compute_score -> run_obj."""
+    score, details, wcf, wr_pct, quality = result
+    rank, _ = eng.get_rank(score)
+    return {
+        "id": fields["id"],
+        "Data": fields["Data"],
+        "Dist (km)": fields["Dist (km)"],
+        "Power": fields["Power"],
+        "HR": fields["HR"],
+        "Decoupling": round(dec * 100, 2),
+        "SCORE": round(score, 2),
+        "WCF": round(wcf, 2),
+        "WR_Pct": round(wr_pct, 1),
+        "Rank": rank,
+        "Quality": quality,
+        "Meteo": fields["Meteo"],
+        "SCORE_DETAIL": details
+    }
+
+
+def score_activity(
     eng,
-    token: str,
-    athlete_id: int,
-    weight: float,
-    hr_max: int,
-    hr_rest: int,
-    age: int,
-    sex: str,
-    days_to_fetch: int = 365,
-):
+    s: Dict[str, Any],
+    watts: List[float],
+    hr: List[float],
+    phys: Dict[str, Any],
+    temp_c: float,
+    humidity: float,
+) -> Dict[str, Any]:
     """
-    Sync robusto Strava:
-    - paginazione completa
-    - deduplica per atleta
-    - 2-pass sync
-    - retry + backoff
-    - non scarta corse senza stream
+    Summary Strava + stream -> run_obj pronto per DatabaseService.save_run
+    (senza raw_watts/raw_hr, che il chiamante aggiunge).
+    Condiviso da sync a job e ingestion push.
     """
+    m = activity_metrics(s, phys, temp_c, humidity)
+    dec = eng.calculate_decoupling(watts, hr)
+    return build_run_obj(eng, activity_fields(s, temp_c), dec, eng.compute_score(m, dec))
 
-    # --------------------------------------------------
-    # 1. Recupera ID già presenti SOLO per questo atleta
-    # --------------------------------------------------
-    existing_ids = set(db_svc.get_run_ids_for_athlete(athlete_id))
-    logger.info(f"[SYNC] Existing runs: {len(existing_ids)}")
+
+class SyncJob:
+    """
+    Sync Strava come job riprendibile.
+
+    Ogni corsa attraversa gli stadi del journal:
+    planned -> fetched (stream parcheggiati su disco) -> scored -> written.
+    Se la sessione cade, il job successivo dello stesso atleta riparte
+    dall'ultimo checkpoint senza riscaricare attività o stream.
+    La riga su DB viene scritta una sola volta, già con lo score: niente
+    più placeholder con SCORE 0.0.
+
+    Gli stream seguono il budget Strava (StreamScheduler): si scaricano solo
+    le corse della finestra corrente, le altre vengono salvate 'pending'
+    e riprese dal job successivo insieme a quelle rimaste 'pending' su DB.
+    """
+
+    def __init__(
+        self,
+        auth_svc,
+        db_svc,
+        eng,
+        token: str,
+        athlete_id: int,
+        weight: float,
+        hr_max: int,
+        hr_rest: int,
+        age: int,
+        sex: str,
+        days_to_fetch: int = 365,
+        journal: Optional[SyncJournal] = None,
+    ):
+        self.auth = auth_svc
+        self.db = db_svc
+        self.eng = eng
+        self.token = token
+        self.athlete_id = athlete_id
+        self.weight = weight
+        self.hr_max = hr_max
+        self.hr_rest = hr_rest
+        self.age = age
+        self.sex = sex
+        self.days_to_fetch = days_to_fetch
+        self.journal = journal or SyncJournal(athlete_id)
+
+        self.resumed = False
+        self.total = 0
+        self.retried = 0
+        self.skipped = 0
+        self.updated = 0
+        self.failed: List[str] = []
+        self.attempts: Dict[str, int] = {}
+        self.fetch_now: set = set()
+        self.deferred = 0
+        self.scheduler: Optional[StreamScheduler] = None
+        self._final_progress: Dict[str, int] = {}
 
     # --------------------------------------------------
-    # 2. Fetch TUTTE le attività (paginazione)
+    # PIANO (nuovo o ripreso dal journal)
     # --------------------------------------------------
-    activities = auth_svc.fetch_activities(token, days_back=days_to_fetch)
-    logger.info(f"[SYNC] Activities fetched: {len(activities)}")
+    def plan(self) -> Dict[str, int]:
+        if self.journal.load() and not self.journal.finished:
+            self.resumed = True
+            self._count_planned()
+            self.skipped = self.journal.skipped
+            logger.info(f"[SYNC] Resume job {self.journal.job_id}: {self.journal.progress()}")
+            self._schedule()
+            return self.journal.progress()
+
+        # 1. ID già presenti SOLO per questo atleta (i placeholder vanno rifatti)
+        existing_ids = set(self.db.get_run_ids_for_athlete(self.athlete_id))
+        existing_ids -= set(self.db.get_placeholder_run_ids(self.athlete_id))
+        logger.info(f"[SYNC] Existing runs: {len(existing_ids)}")
+
+        # 2. Fetch TUTTE le attività (paginazione)
+        activities = self.auth.fetch_activities(self.token, days_back=self.days_to_fetch)
+        logger.info(f"[SYNC] Activities fetched: {len(activities)}")
+
+        # Corse già salvate con stream 'pending' (rimandati da job precedenti)
+        pending_ids = set(self.db.get_run_ids_by_stream_status(self.athlete_id, STREAM_PENDING))
 
-    if not activities:
-        return {"new": 0, "streams": 0, "skipped": 0}
+        planned = []
+        skipped = 0
+        no_data = []
+        for s in activities:
+            if s["id"] in existing_ids:
+                if s["id"] not in pending_ids:
+                    skipped += 1
+                elif not has_stream_data(s):
+                    no_data.append(s["id"])
+                else:
+                    planned.append(dict({k: s[k] for k in ACTIVITY_FIELDS if k in s}, carry_over=True))
+                continue
+            planned.append({k: s[k] for k in ACTIVITY_FIELDS if k in s})
+        # Senza sensori non si spende budget: 'unavailable' subito
+        self.db.mark_stream_status(no_data, STREAM_UNAVAILABLE, self.athlete_id)
 
-    new_runs = []
-    skipped = 0
+        # 3. Ordine di valore: prima recenti, visibili in dashboard e lunghe
+        newest = sorted(planned, key=lambda a: a.get("start_date_local") or "", reverse=True)
+        dashboard_ids = [a["id"] for a in newest[:Config.STREAM_DASHBOARD_RUNS]]
+        planned = StreamScheduler(getattr(self.auth, "rate_limits", None)).rank(planned, dashboard_ids)
+
+        # 4. Meteo batch: una richiesta per cluster di partenza, non una per corsa
+        weather = resolve_weather_batch(planned)
+
+        self.journal.start(planned, weather, skipped)
+        self._count_planned()
+        self.skipped = skipped
+        self._schedule()
+        logger.info(f"[SYNC] Job {self.journal.job_id}: {len(planned)} corse pianificate")
+        return self.journal.progress()
+
+    def _count_planned(self):
+        carry = sum(1 for a in self.journal.activities.values() if a.get("carry_over"))
+        self.total = len(self.journal.order) - carry
+        self.retried = carry
+
+    def _schedule(self):
+        """Finestra corrente dello scheduler sulle corse ancora da scaricare: solo queste chiamano Strava."""
+        acts = self.journal.activities
+        todo = [acts[rid] for rid in self.journal.order
+                if self.journal.stage.get(rid, "planned") == "planned" and has_stream_data(acts[rid])]
+        newest = sorted(acts.values(), key=lambda a: a.get("start_date_local") or "", reverse=True)
+        dashboard_ids = [a["id"] for a in newest[:Config.STREAM_DASHBOARD_RUNS]]
+
+        self.scheduler = StreamScheduler(getattr(self.auth, "rate_limits", None))
+        windows = self.scheduler.schedule(todo, dashboard_ids)
+        self.fetch_now = set(str(s["id"]) for s in windows[0])
 
     # --------------------------------------------------
-    # 3. PASS 1 — salva metadata
+    # AVANZAMENTO (una corsa per step)
     # --------------------------------------------------
-    for s in activities:
-        if s["id"] in existing_ids:
-            skipped += 1
-            continue
-
-        run_obj = {
-            "id": s["id"],
-            "Data": s["start_date_local"][:10],
-            "Dist (km)": round(s.get("distance", 0) / 1000, 2),
-            "Power": int(s.get("average_watts", 0) or 0),
-            "HR": int(s.get("average_heartrate", 0) or 0),
-            "Decoupling": 0.0,   # placeholder
-            "SCORE": 0.0,        # placeholder
-            "WCF": 1.0,
-            "WR_Pct": 0.0,
-            "Rank": "—",
-            "Meteo": "",
-            "SCORE_DETAIL": {},
-            "raw_watts": [],
-            "raw_hr": []
-        }
+    def step(self) -> bool:
+        """
+        Porta avanti la prossima corsa non ancora scritta fino a 'written'.
+        Ritorna False quando non c'è più nulla da fare in questo giro.
+
+        Una corsa che fallisce viene ritentata in coda alle altre, al massimo
+        Config.SYNC_MAX_ATTEMPTS volte; poi il job si chiude comunque e la
+        corsa (non scritta su DB) rientra nel piano della sync successiva.
+        """
+        pending = [rid for rid in self.journal.pending() if rid not in self.failed]
+        if not pending:
+            self._final_progress = self.journal.progress()
+            if self.failed:
+                logger.warning(f"[SYNC] {len(self.failed)} corse non scritte, ripianificate dalla prossima sync: {self.failed}")
+            self.journal.finish()
+            self.journal.clear()
+            return False
+
+        # Prima le corse mai tentate: i retry vanno in coda
+        rid = min(pending, key=lambda r: self.attempts.get(r, 0))
+        try:
+            if self._advance(rid):
+                time.sleep(0.25)  # rate limit safe
+            self.updated += 1
+        except Exception as e:
+            # Resta al suo stadio: il retry (o il prossimo job, se si cade) riparte da lì
+            n = self.attempts[rid] = self.attempts.get(rid, 0) + 1
+            logger.warning(f"[SYNC] Stream fail {rid} (tentativo {n}/{Config.SYNC_MAX_ATTEMPTS}): {e}")
+            if n >= Config.SYNC_MAX_ATTEMPTS:
+                self.failed.append(rid)
+            time.sleep(1.5 * n)
+        return True
+
+    def _advance(self, rid: str) -> bool:
+        """Porta rid a 'written'. True se ha chiamato Strava."""
+        s = self.journal.activities[rid]
+        stage = self.journal.stage.get(rid, "planned")
+        called = False
 
-        db_svc.save_run(run_obj, athlete_id)
-        new_runs.append(s["id"])
+        if stage == "planned":
+            streams, status, called = self._fetch(rid, s)
+            if status == STREAM_PENDING and s.get("carry_over"):
+                # Già su DB come 'pending': niente da riscrivere, la riprende il prossimo job
+                self.journal.mark(rid, "written")
+                return called
+            self.journal.save_streams(rid, {
+                "watts": streams.get("watts", {}).get("data", []),
+                "hr": streams.get("heartrate", {}).get("data", []),
+                "status": status
+            })
+            self.journal.mark(rid, "fetched")
+            stage = "fetched"
 
-    logger.info(f"[SYNC] New runs saved: {len(new_runs)}")
+        if stage == "fetched":
+            streams = self.journal.load_streams(rid)
+            if streams is None:
+                # Stream parcheggiati persi: si torna indietro di uno stadio
+                self.journal.mark(rid, "planned")
+                raise RuntimeError("parked streams missing")
+            run_obj = self._score(s, streams)
+            self.journal.mark(rid, "scored", run=run_obj)
+            stage = "scored"
+
+        if stage == "scored":
+            run_obj = dict(self.journal.scored.get(rid, {}))
+            streams = self.journal.load_streams(rid) or {"watts": [], "hr": []}
+            run_obj["raw_watts"] = streams.get("watts", [])
+            run_obj["raw_hr"] = streams.get("hr", [])
+            run_obj["Streams"] = streams.get("status") or (STREAM_FETCHED if run_obj["raw_watts"] or run_obj["raw_hr"] else STREAM_UNAVAILABLE)
+            if s.get("carry_over"):
+                ok = self.db.update_run_streams(s["id"], run_obj, self.athlete_id)
+            else:
+                ok = self.db.save_run(run_obj, self.athlete_id)
+            if not ok:
+                raise RuntimeError("DB write failed")
+            self.journal.mark(rid, "written")
+            self.journal.drop_streams(rid)
+        return called
+
+    def _fetch(self, rid: str, s: Dict[str, Any]) -> Tuple[Dict[str, Any], str, bool]:
+        """
+        Stream di una corsa secondo il budget -> (stream, stream_status, chiamata fatta).
+        'unavailable' solo se l'attività non ha sensori o Strava non ha stream (404);
+        rimandata, rate limit o errore -> 'pending', riprovata dal prossimo job.
+        """
+        if not has_stream_data(s):
+            return {}, STREAM_UNAVAILABLE, False
+        rate_limited = getattr(self.auth, "rate_limited", None)
+        if rid not in self.fetch_now or (rate_limited and rate_limited()):
+            self.deferred += 1
+            return {}, STREAM_PENDING, False
+        streams = self.auth.fetch_streams(self.token, s["id"])
+        if streams is None:
+            self.deferred += 1
+            return {}, STREAM_PENDING, True
+        return streams, (STREAM_FETCHED if streams else STREAM_UNAVAILABLE), True
+
+    def _score(self, s: Dict[str, Any], streams: Dict[str, List[float]]) -> Dict[str, Any]:
+        temp_c, humidity = self.journal.weather.get(str(s["id"]), (s.get("average_temp") or 20, 50))
+        phys = {
+            "weight": self.weight, "hr_max": self.hr_max, "hr_rest": self.hr_rest,
+            "age": self.age, "sex": self.sex
+        }
+        return score_activity(self.eng, s, streams.get("watts", []), streams.get("hr", []), phys, temp_c, humidity)
 
     # --------------------------------------------------
-    # 4. PASS 2 — streams + score
+    # STATO
     # --------------------------------------------------
-    updated = 0
+    def progress(self) -> Dict[str, int]:
+        # A job chiuso il journal è vuoto: si usa l'ultima fotografia
+        return self.journal.progress() if self.journal.job_id else self._final_progress
 
-    for i, run_id in enumerate(new_runs):
-        try:
-            streams = auth_svc.fetch_streams(token, run_id) or {}
-            watts = streams.get("watts", {}).get("data", [])
-            hr = streams.get("heartrate", {}).get("data", [])
-
-            # recupero activity completa
-            s = next(a for a in activities if a["id"] == run_id)
-
-            m = RunMetrics(
-                avg_power=s.get("average_watts", 0),
-                avg_hr=s.get("average_heartrate", 0),
-                distance=s.get("distance", 0),
-                moving_time=s.get("moving_time", 0),
-                elevation_gain=s.get("total_elevation_gain", 0),
-                weight=weight,
-                hr_max=hr_max,
-                hr_rest=hr_rest,
-                temp_c=s.get("average_temp", 20),
-                humidity=50,
-                age=age,
-                sex=sex
-            )
-
-            dec = eng.calculate_decoupling(watts, hr)
-            score, details, wcf, wr_pct, quality = eng.compute_score(m, dec)
-            rank, _ = eng.get_rank(score)
-
-            db_svc.client.table("runs").update({
-                "score": round(score, 2),
-                "decoupling": round(dec * 100, 2),
-                "wcf": round(wcf, 2),
-                "wr_pct": round(wr_pct, 1),
-                "rank": rank,
-                "raw_data": {
-                    "watts": watts,
-                    "hr": hr,
-                    "details": details
-                }
-            }).eq("id", run_id).execute()
-
-            updated += 1
-            time.sleep(0.25)  # rate limit safe
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "new": self.total,
+            "retried": self.retried,
+            "updated": self.updated,
+            "skipped": self.skipped,
+            "failed": len(self.failed),
+            "failed_ids": list(self.failed),
+            "deferred": self.deferred,
+            "deferred_from": self.scheduler.window_start(1).strftime("%H:%M") if self.deferred and self.scheduler else None,
+            "resumed": self.resumed
+        }
 
-        except Exception as e:
-            logger.warning(f"[SYNC] Stream fail {run_id}: {e}")
-            time.sleep(1.5)
+    def run(self, on_progress=None) -> Dict[str, Any]:
+        self.plan()
+        while self.step():
+            if on_progress:
+                on_progress(self.progress())
+        return self.summary()
 
-    return {
-        "new": len(new_runs),
-        "updated": updated,
-        "skipped": skipped
-    }
+
+def safe_strava_sync(
+    auth_svc,
+    db_svc,
+    eng,
+    token: str,
+    athlete_id: int,
+    weight: float,
+    hr_max: int,
+    hr_rest: int,
+    age: int,
+    sex: str,
+    days_to_fetch: int = 365,
+):
+    """
+    Sync robusto Strava:
+    - paginazione completa
+    - deduplica per atleta
+    - job con journal su disco (riprendibile dopo refresh/crash)
+    - retry + backoff
+    - non scarta corse senza stream
+    """
+    job = SyncJob(
+        auth_svc, db_svc, eng, token, athlete_id,
+        weight, hr_max, hr_rest, age, sex, days_to_fetch
+    )
+    return job.run()
@@ -0,0 +1,114 @@
+"""
+Cache process-wide degli stream delle corse (watts/HR), condivisa da tutte
+le sessioni Streamlit e dai rerun.
+
+Gli stream sono tenuti come array NumPy compatti e in sola lettura: int16
+se i campioni sono interi nel range (il caso di watts e HR Strava), float32
+altrimenti. 2-4 byte per campione invece dei ~30 di una lista Python, e lo
+stesso atleta aperto in due tab occupa la memoria una volta sola.
+Eviction LRU a byte (Config.STREAM_CACHE_MAX_MB); hit/miss/eviction sono
+mostrati nella Dev Console.
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+import numpy as np
+from config import Config
+
+INT16_MIN, INT16_MAX = np.iinfo(np.int16).min, np.iinfo(np.int16).max
+
+
+def compact(values: Any) -> np.ndarray:
+    """Lista di campioni -> array int16/float32 non scrivibile."""
+    arr = np.asarray(values if values is not None else [], dtype=np.float64).ravel()
+    if arr.size and np.all(np.isfinite(arr)) and np.all(arr == np.round(arr)) \
+            and arr.min() >= INT16_MIN and arr.max() <= INT16_MAX:
+        out = arr.astype(np.int16)
+    else:
+        out = arr.astype(np.float32)
+    out.flags.writeable = False
+    return out
+
+
+class StreamCache:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max(int(max_bytes), 0)
+        self._entries: "OrderedDict[int, Dict[str, np.ndarray]]" = OrderedDict()
+        self._sizes: Dict[int, int] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, run_id: int) -> Optional[Dict[str, np.ndarray]]:
+        with self._lock:
+            streams = self._entries.get(run_id)
+            if streams is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(run_id)
+            self.hits += 1
+            # dict nuovo: gli array sono condivisi (read-only), il contenitore no
+            return dict(streams)
+
+    def put(self, run_id: int, streams: Dict[str, Any]) -> Dict[str, np.ndarray]:
+        """Compatta e memorizza gli stream; ritorna la versione compatta."""
+        packed = {kind: compact(data) for kind, data in streams.items()}
+        size = sum(a.nbytes for a in packed.values())
+        with self._lock:
+            self._drop(run_id)
+            if size <= self.max_bytes:
+                self._entries[run_id] = packed
+                self._sizes[run_id] = size
+                self._bytes += size
+                while self._bytes > self.max_bytes:
+                    oldest = next(iter(self._entries))
+                    self._drop(oldest)
+                    self.evictions += 1
+        return dict(packed)
+
+    def invalidate(self, run_ids: Optional[Iterable[int]] = None):
+        """Toglie gli stream riscritti (None = svuota tutto)."""
+        with self._lock:
+            if run_ids is None:
+                self._entries.clear()
+                self._sizes.clear()
+                self._bytes = 0
+            else:
+                for rid in run_ids:
+                    self._drop(rid)
+
+    def _drop(self, run_id: int):
+        if self._entries.pop(run_id, None) is not None:
+            self._bytes -= self._sizes.pop(run_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "runs": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = self.misses = self.evictions = 0
+
+
+_cache: Optional[StreamCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_stream_cache() -> StreamCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = StreamCache(int(Config.STREAM_CACHE_MAX_MB * 1024 * 1024))
+    return _cache
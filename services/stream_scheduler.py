@@ -0,0 +1,116 @@
+import time
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+from config import Config
+
+logger = logging.getLogger("sCore.StreamScheduler")
+
+# Stato stream di una corsa (colonna runs.stream_status)
+STREAM_PENDING = "pending"
+STREAM_FETCHED = "fetched"
+STREAM_UNAVAILABLE = "unavailable"
+
+WINDOW_MINUTES = 15
+
+
+def has_stream_data(s: Dict[str, Any]) -> bool:
+    """
+    False se il summary Strava dice che non ci sono sensori
+    (attività manuale, niente FC né potenza): inutile spendere budget.
+    """
+    if s.get("manual"):
+        return False
+    if "has_heartrate" in s or "device_watts" in s:
+        return bool(s.get("has_heartrate")) or bool(s.get("device_watts"))
+    return True
+
+
+class StreamScheduler:
+    """
+    Ordina i download degli stream per valore e li distribuisce
+    nelle finestre da 15 minuti del rate limit Strava.
+
+    Priorità = recency + corsa visibile in dashboard + corsa lunga
+    (pesi in Config.STREAM_PRIORITY_WEIGHTS).
+    """
+
+    def __init__(self, rate_limits: Optional[Dict[str, Any]] = None, now: Optional[datetime] = None):
+        rl = rate_limits or {}
+        self.limit_15 = rl.get("limit_15min") or Config.STRAVA_LIMIT_15MIN
+        self.limit_day = rl.get("limit_daily") or Config.STRAVA_LIMIT_DAILY
+        self.usage_15 = rl.get("usage_15min", 0)
+        self.usage_day = rl.get("usage_daily", 0)
+        self.deferred_until = rl.get("deferred_until") or 0.0   # dopo un 429 (StravaService)
+        self.now = now or datetime.now()
+
+        # Header vecchi di un'altra finestra non contano più
+        seen_at = rl.get("seen_at")
+        if seen_at and self._window_start(datetime.fromtimestamp(seen_at)) < self._window_start(self.now):
+            self.usage_15 = 0
+
+    # --- PRIORITÀ ---
+    def priority(self, s: Dict[str, Any], dashboard_ids: Iterable[Any] = ()) -> float:
+        w = Config.STREAM_PRIORITY_WEIGHTS
+        try:
+            start = datetime.strptime(s["start_date_local"][:10], "%Y-%m-%d")
+            age_days = max((self.now - start).days, 0)
+        except (KeyError, TypeError, ValueError):
+            age_days = 365
+        recency = 1.0 / (1.0 + age_days / 30.0)
+
+        dashboard = 1.0 if s.get("id") in dashboard_ids else 0.0
+
+        moving = s.get("moving_time", 0) or 0
+        long_run = min(moving / (1.5 * Config.STREAM_LONG_RUN_SEC), 1.0) if moving >= Config.STREAM_LONG_RUN_SEC else 0.0
+
+        return w["recency"] * recency + w["dashboard"] * dashboard + w["long_run"] * long_run
+
+    def rank(self, candidates: List[Dict[str, Any]], dashboard_ids: Iterable[Any] = ()) -> List[Dict[str, Any]]:
+        dash = set(dashboard_ids)
+        return sorted(candidates, key=lambda s: self.priority(s, dash), reverse=True)
+
+    # --- FINESTRE ---
+    def _window_start(self, dt: datetime) -> datetime:
+        return dt.replace(minute=dt.minute - dt.minute % WINDOW_MINUTES, second=0, microsecond=0)
+
+    def window_start(self, k: int) -> datetime:
+        """Inizio della k-esima finestra (0 = quella corrente)."""
+        return self._window_start(self.now) + timedelta(minutes=WINDOW_MINUTES * k)
+
+    def capacity_now(self) -> int:
+        if time.time() < self.deferred_until:
+            return 0
+        reserve = Config.STREAM_BUDGET_RESERVE
+        left_15 = self.limit_15 - self.usage_15 - reserve
+        left_day = self.limit_day - self.usage_day - reserve
+        return max(0, min(left_15, left_day))
+
+    def schedule(self, candidates: List[Dict[str, Any]], dashboard_ids: Iterable[Any] = ()) -> List[List[Dict[str, Any]]]:
+        """
+        Ritorna le finestre: [[corse finestra corrente], [finestra +15'], ...].
+        Solo la prima si scarica subito; le altre restano 'pending' e
+        vengono riprese (e riordinate) dalle sync successive.
+        """
+        ranked = self.rank(candidates, dashboard_ids)
+        reserve = Config.STREAM_BUDGET_RESERVE
+        per_window = max(self.limit_15 - reserve, 1)
+        day_left = max(self.limit_day - self.usage_day - reserve, 0)
+
+        windows = []
+        cap = self.capacity_now()
+        i = 0
+        while i < len(ranked) and day_left > 0:
+            take = min(cap, day_left)
+            windows.append(ranked[i:i + take])
+            i += take
+            day_left -= take
+            cap = per_window
+        if i < len(ranked):
+            # Oltre il budget giornaliero: tutto rimandato a domani
+            windows.append(ranked[i:])
+        if not windows:
+            windows.append([])
+
+        logger.info(f"[STREAMS] {len(ranked)} candidate, {len(windows[0])} ora, {len(ranked) - len(windows[0])} rimandate ({len(windows)} finestre)")
+        return windows
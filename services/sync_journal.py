@@ -0,0 +1,161 @@
+import os
+import json
+import shutil
+import logging
+from datetime import datetime
+from typing import Optional, Dict, List, Any
+from config import Config
+
+logger = logging.getLogger("sCore.SyncJournal")
+
+# Stadi di una corsa dentro un job di sync (in ordine)
+STAGES = ("planned", "fetched", "scored", "written")
+
+
+class SyncJournal:
+    """
+    Journal append-only di un job di sync, uno per atleta.
+
+    Layout su disco (Config.SYNC_JOURNAL_DIR):
+    - athlete_<id>.jsonl          eventi: plan, stage, done
+    - athlete_<id>_streams/<run>  stream scaricati (json), rimossi dopo la scrittura su DB
+
+    Ogni checkpoint è una riga appesa, quindi il costo non cresce con la
+    dimensione del job e un crash perde al massimo l'ultimo evento.
+    """
+
+    def __init__(self, athlete_id: int, base_dir: Optional[str] = None):
+        self.athlete_id = athlete_id
+        self.base_dir = base_dir or Config.SYNC_JOURNAL_DIR
+        self.path = os.path.join(self.base_dir, f"athlete_{athlete_id}.jsonl")
+        self.streams_dir = os.path.join(self.base_dir, f"athlete_{athlete_id}_streams")
+        self._reset()
+
+    def _reset(self):
+        self.job_id: Optional[str] = None
+        self.activities: Dict[str, Dict[str, Any]] = {}
+        self.order: List[str] = []
+        self.weather: Dict[str, List[float]] = {}
+        self.skipped = 0
+        self.stage: Dict[str, str] = {}
+        self.scored: Dict[str, Dict[str, Any]] = {}
+        self.finished = False
+
+    # --- LETTURA ---
+    def load(self) -> bool:
+        """Ricostruisce lo stato rileggendo gli eventi. False se non c'è un job."""
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        ev = json.loads(line)
+                    except ValueError:
+                        # Riga troncata da un crash: ignoriamo solo quella
+                        logger.warning(f"[JOURNAL] Riga corrotta ignorata in {self.path}")
+                        continue
+                    self._apply(ev)
+            return self.job_id is not None
+        except Exception as e:
+            logger.error(f"Error loading sync journal: {e}")
+            return False
+
+    def _apply(self, ev: Dict[str, Any]):
+        kind = ev.get("ev")
+        if kind == "plan":
+            self.job_id = ev["job_id"]
+            self.activities = {str(a["id"]): a for a in ev.get("activities", [])}
+            self.order = [str(a["id"]) for a in ev.get("activities", [])]
+            self.weather = ev.get("weather", {})
+            self.skipped = ev.get("skipped", 0)
+            self.stage = {rid: "planned" for rid in self.order}
+            self.scored = {}
+            self.finished = False
+        elif kind == "stage":
+            rid = str(ev["id"])
+            self.stage[rid] = ev["stage"]
+            if ev["stage"] == "scored":
+                self.scored[rid] = ev.get("run", {})
+            elif ev["stage"] == "written":
+                self.scored.pop(rid, None)
+        elif kind == "done":
+            self.finished = True
+
+    # --- SCRITTURA ---
+    def _append(self, ev: Dict[str, Any]):
+        os.makedirs(self.base_dir, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(ev, default=str) + "\n")
+            f.flush()
+        self._apply(ev)
+
+    def start(self, activities: List[Dict[str, Any]], weather: Dict[Any, Any], skipped: int):
+        """Nuovo job: azzera il journal precedente e registra il piano."""
+        self.clear()
+        job_id = f"{self.athlete_id}-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        self._append({
+            "ev": "plan",
+            "job_id": job_id,
+            "activities": activities,
+            "weather": {str(k): list(v) for k, v in weather.items()},
+            "skipped": skipped
+        })
+
+    def mark(self, run_id: Any, stage: str, run: Optional[Dict[str, Any]] = None):
+        ev = {"ev": "stage", "id": str(run_id), "stage": stage}
+        if run is not None:
+            ev["run"] = run
+        self._append(ev)
+
+    def finish(self):
+        self._append({"ev": "done"})
+
+    def clear(self):
+        """Rimuove journal e stream parcheggiati."""
+        try:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            shutil.rmtree(self.streams_dir, ignore_errors=True)
+        except Exception as e:
+            logger.error(f"Error clearing sync journal: {e}")
+        self._reset()
+
+    # --- STREAM PARCHEGGIATI ---
+    def _stream_path(self, run_id: Any) -> str:
+        return os.path.join(self.streams_dir, f"{run_id}.json")
+
+    def save_streams(self, run_id: Any, streams: Dict[str, Any]):
+        os.makedirs(self.streams_dir, exist_ok=True)
+        tmp = self._stream_path(run_id) + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(streams, f)
+        os.replace(tmp, self._stream_path(run_id))  # atomico: mai file a metà
+
+    def load_streams(self, run_id: Any) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._stream_path(run_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def drop_streams(self, run_id: Any):
+        try:
+            os.remove(self._stream_path(run_id))
+        except OSError:
+            pass
+
+    # --- STATO ---
+    def pending(self) -> List[str]:
+        """ID non ancora scritti su DB, nell'ordine del piano."""
+        return [rid for rid in self.order if self.stage.get(rid) != "written"]
+
+    def progress(self) -> Dict[str, int]:
+        counts = {s: 0 for s in STAGES}
+        for rid in self.order:
+            counts[self.stage.get(rid, "planned")] += 1
+        counts["total"] = len(self.order)
+        return counts
@@ -0,0 +1,146 @@
+import time
+import logging
+import threading
+from collections import deque
+from typing import Optional, Dict, Any, Callable
+from config import Config
+
+logger = logging.getLogger("sCore.SyncWorker")
+
+
+class SyncJobState:
+    """Stato osservabile di un job in coda/in esecuzione (letto dalla dashboard)."""
+
+    def __init__(self, athlete_id: int, job_factory: Callable[[], Any]):
+        self.athlete_id = athlete_id
+        self.job_factory = job_factory
+        self.job = None
+        self.job_key = f"{athlete_id}-{time.time():.3f}"
+        self.status = "queued"   # queued -> planning -> running -> done | error
+        self.progress: Dict[str, int] = {}
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.submitted_at = time.time()
+        self.finished_at: Optional[float] = None
+
+    @property
+    def active(self) -> bool:
+        return self.status in ("queued", "planning", "running")
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "job_key": self.job_key,
+            "status": self.status,
+            "progress": dict(self.progress),
+            "result": self.result,
+            "error": self.error,
+            "submitted_at": self.submitted_at,
+            "finished_at": self.finished_at
+        }
+
+
+class SyncWorker:
+    """
+    Pool di thread del processo che esegue i SyncJob fuori dal rerun Streamlit.
+
+    I job avanzano a step (una corsa per step) e tornano in fondo alla coda
+    dopo ogni step: con più atleti in sync il pool viene diviso round-robin,
+    nessuno monopolizza un thread. Un solo job attivo per atleta.
+    """
+
+    def __init__(self, max_workers: int = Config.SYNC_WORKERS):
+        self._cond = threading.Condition()
+        self._ready = deque()               # athlete_id pronti per uno step
+        self._jobs: Dict[int, SyncJobState] = {}
+        self._stopped = False
+        self._threads = [
+            threading.Thread(target=self._loop, name=f"score-sync-{i}", daemon=True)
+            for i in range(max_workers)
+        ]
+        for t in self._threads:
+            t.start()
+
+    # --- API ---
+    def submit(self, athlete_id: int, job_factory: Callable[[], Any]) -> Dict[str, Any]:
+        """Accoda un job. Se l'atleta ne ha già uno attivo ritorna quello."""
+        with self._cond:
+            cur = self._jobs.get(athlete_id)
+            if cur and cur.active:
+                return cur.snapshot()
+            state = SyncJobState(athlete_id, job_factory)
+            self._jobs[athlete_id] = state
+            self._ready.append(athlete_id)
+            self._cond.notify()
+            logger.info(f"[WORKER] Job accodato per atleta {athlete_id} (coda: {len(self._ready)})")
+            return state.snapshot()
+
+    def status(self, athlete_id: int) -> Optional[Dict[str, Any]]:
+        with self._cond:
+            state = self._jobs.get(athlete_id)
+            return state.snapshot() if state else None
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            return {
+                "workers": len(self._threads),
+                "queued": len(self._ready),
+                "active": sum(1 for s in self._jobs.values() if s.active)
+            }
+
+    def shutdown(self, timeout: float = 5.0):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        for t in self._threads:
+            t.join(timeout)
+
+    # --- LOOP ---
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._ready and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                athlete_id = self._ready.popleft()
+                state = self._jobs.get(athlete_id)
+
+            if state is None or not state.active:
+                continue
+
+            more = self._run_step(state)
+
+            with self._cond:
+                if more:
+                    # In fondo alla coda: gli altri atleti avanzano nel frattempo
+                    self._ready.append(athlete_id)
+                    self._cond.notify()
+
+    def _run_step(self, state: SyncJobState) -> bool:
+        try:
+            if state.job is None:
+                state.status = "planning"
+                state.job = state.job_factory()
+                state.progress = state.job.plan()
+                state.status = "running"
+                return True
+
+            more = state.job.step()
+            state.progress = state.job.progress()
+            if not more:
+                state.result = state.job.summary()
+                state.status = "done"
+                state.finished_at = time.time()
+            return more
+        except Exception as e:
+            logger.error(f"[WORKER] Job atleta {state.athlete_id} fallito: {e}")
+            state.error = str(e)
+            state.status = "error"
+            state.finished_at = time.time()
+            return False
+
+
+def get_sync_worker() -> SyncWorker:
+    """Singleton di processo: condiviso da tutte le sessioni Streamlit (vive nel ServiceRegistry)."""
+    from services.registry import get_registry
+    return get_registry().sync_worker
@@ -0,0 +1,93 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Tuple
+from config import Config
+from services.api import WeatherService
+
+logger = logging.getLogger("sCore.WeatherBatch")
+
+
+def _parse_start(s: Dict[str, Any]):
+    """Ritorna (lat, lon, datetime locale) oppure None se mancano i dati."""
+    latlng = s.get("start_latlng")
+    if not latlng or len(latlng) < 2:
+        return None
+    try:
+        dt = datetime.strptime(s["start_date_local"][:19], "%Y-%m-%dT%H:%M:%S")
+    except (KeyError, TypeError, ValueError):
+        return None
+    return float(latlng[0]), float(latlng[1]), dt
+
+
+def _split_spans(dates: List[datetime]) -> List[Tuple[datetime, datetime]]:
+    """
+    Raggruppa le date (ordinate) in intervalli contigui.
+    Un nuovo intervallo parte se si supera WEATHER_MAX_RANGE_DAYS
+    o se c'è un buco più lungo di WEATHER_MAX_GAP_DAYS.
+    """
+    spans = []
+    start = prev = dates[0]
+    for d in dates[1:]:
+        if (d - start).days >= Config.WEATHER_MAX_RANGE_DAYS or (d - prev).days > Config.WEATHER_MAX_GAP_DAYS:
+            spans.append((start, prev))
+            start = d
+        prev = d
+    spans.append((start, prev))
+    return spans
+
+
+def resolve_weather_batch(activities: List[Dict[str, Any]]) -> Dict[Any, Tuple[float, float]]:
+    """
+    Meteo storico per tutte le attività di una sync con poche richieste.
+
+    - cluster per zona di partenza (griglia WEATHER_CLUSTER_DEG)
+    - una richiesta Open-Meteo per intervallo di date di ogni cluster
+    - ritorna {activity_id: (temp_c, humidity)}
+
+    Le attività senza coordinate o senza dato orario non compaiono
+    nel risultato: il chiamante decide il fallback.
+    """
+    deg = Config.WEATHER_CLUSTER_DEG
+    clusters: Dict[Tuple[int, int], List[Tuple[Any, float, float, datetime]]] = {}
+
+    for s in activities:
+        parsed = _parse_start(s)
+        if not parsed:
+            continue
+        lat, lon, dt = parsed
+        key = (round(lat / deg), round(lon / deg))
+        clusters.setdefault(key, []).append((s["id"], lat, lon, dt))
+
+    resolved: Dict[Any, Tuple[float, float]] = {}
+    requests_made = 0
+
+    for members in clusters.values():
+        # Centroide del cluster
+        c_lat = round(sum(m[1] for m in members) / len(members), 4)
+        c_lon = round(sum(m[2] for m in members) / len(members), 4)
+
+        days = sorted({datetime(m[3].year, m[3].month, m[3].day) for m in members})
+
+        for span_start, span_end in _split_spans(days):
+            hourly = WeatherService.get_weather_range(
+                c_lat, c_lon,
+                span_start.strftime("%Y-%m-%d"),
+                span_end.strftime("%Y-%m-%d")
+            )
+            requests_made += 1
+            if not hourly:
+                continue
+
+            temps = hourly.get("temperature_2m") or []
+            hums = hourly.get("relative_humidity_2m") or []
+            span_end_excl = span_end + timedelta(days=1)
+
+            for run_id, _, _, dt in members:
+                if not (span_start <= dt < span_end_excl):
+                    continue
+                idx = (dt - span_start).days * 24 + min(dt.hour, 23)
+                if idx < len(temps) and idx < len(hums) and temps[idx] is not None and hums[idx] is not None:
+                    resolved[run_id] = (float(temps[idx]), float(hums[idx]))
+
+    logger.info(f"[WEATHER] {len(resolved)}/{len(activities)} attività risolte con {requests_made} richieste ({len(clusters)} cluster)")
+    return resolved
@@ -0,0 +1,120 @@
+"""
+Dati dei grafici sugli stream, di dimensione fissa qualunque sia la durata
+della corsa, calcolati lato server e tenuti in cache per run id.
+
+- Serie temporali (watts/HR nel tempo): downsampling Largest-Triangle-
+  Three-Buckets a Config.CHART_LTTB_POINTS punti per serie. Mantiene picchi
+  e cambi di ritmo che un campione ogni N perde.
+- Power vs HR: densità su griglia rettangolare Config.CHART_BINS
+  (watt x bpm), solo le celle non vuote: al browser arrivano al massimo
+  40x30 rettangoli invece di migliaia di punti.
+
+La cache (LRU, Config.CHART_CACHE_RUNS corse) è valida finché gli array
+sorgente sono gli stessi oggetti: quando la stream cache li rilegge (stream
+riscritti, eviction) il grafico si ricalcola. Solo NumPy: pandas e Altair
+restano in ui/visuals.py.
+"""
+import weakref
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+import numpy as np
+from config import Config
+
+
+def lttb_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """Indici dei punti scelti da LTTB (x = indice del campione, 1 Hz)."""
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    y = np.asarray(y, dtype=np.float64)
+    x = np.arange(n, dtype=np.float64)
+    every = (n - 2) / (n_out - 2)
+    idx = np.empty(n_out, dtype=np.int64)
+    idx[0], idx[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        # Media del bucket successivo (l'ultimo punto per l'ultimo bucket)
+        nxt_end = min(int((i + 2) * every) + 1, n)
+        avg_x = x[end:nxt_end].mean()
+        avg_y = y[end:nxt_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        idx[i + 1] = a
+    return idx
+
+
+def lttb(y, n_out: int = Config.CHART_LTTB_POINTS) -> Tuple[np.ndarray, np.ndarray]:
+    """(secondi, valori) della serie ridotta a n_out punti."""
+    y = np.asarray(y)
+    idx = lttb_indices(y, n_out)
+    return idx, y[idx]
+
+
+def rect_bins(watts, hr, bins: Tuple[int, int] = Config.CHART_BINS) -> Dict[str, np.ndarray]:
+    """Densità Power vs HR: celle non vuote con bordi (w0, w1, h0, h1) e conteggio."""
+    n = min(len(watts), len(hr))
+    w = np.asarray(watts[:n], dtype=np.float64)
+    h = np.asarray(hr[:n], dtype=np.float64)
+    # Watt a 0 (discese, soste) e HR a 0 (sensore perso) schiacciano la scala
+    keep = (w > 0) & (h > 0) & np.isfinite(w) & np.isfinite(h)
+    w, h = w[keep], h[keep]
+    if not len(w):
+        return {k: np.empty(0) for k in ("w0", "w1", "h0", "h1", "count")}
+    counts, w_edges, h_edges = np.histogram2d(w, h, bins=bins)
+    wi, hi = np.nonzero(counts)
+    return {
+        "w0": w_edges[wi], "w1": w_edges[wi + 1],
+        "h0": h_edges[hi], "h1": h_edges[hi + 1],
+        "count": counts[wi, hi].astype(np.int64)
+    }
+
+
+def build_chart_data(streams: Dict[str, Any]) -> Dict[str, Any]:
+    watts = np.asarray(streams.get("watts") if streams.get("watts") is not None else [])
+    hr = np.asarray(streams.get("hr") if streams.get("hr") is not None else [])
+    data: Dict[str, Any] = {"samples": max(len(watts), len(hr))}
+    for kind, values in (("watts", watts), ("hr", hr)):
+        data[kind] = lttb(values) if len(values) else None
+    data["density"] = rect_bins(watts, hr) if len(watts) and len(hr) else None
+    return data
+
+
+# --- CACHE PER RUN ID ---
+_cache: "OrderedDict[Any, Tuple[Tuple, Dict[str, Any]]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _refs(streams: Dict[str, Any]) -> Tuple:
+    # Riferimenti deboli: la cache dei grafici non tiene in vita stream già evicti
+    out = []
+    for kind in ("watts", "hr"):
+        arr = streams.get(kind)
+        try:
+            out.append(weakref.ref(arr))
+        except TypeError:
+            out.append(None)  # liste: nessuna identità stabile, si ricalcola
+    return tuple(out)
+
+
+def _same_source(refs: Tuple, streams: Dict[str, Any]) -> bool:
+    return all(r is not None and r() is streams.get(kind) for r, kind in zip(refs, ("watts", "hr")))
+
+
+def stream_chart_data(run_id: Optional[Any], streams: Dict[str, Any]) -> Dict[str, Any]:
+    """Dati dei grafici stream di una corsa (cache per run id, vedi docstring del modulo)."""
+    if run_id is not None:
+        with _cache_lock:
+            hit = _cache.get(run_id)
+            if hit and _same_source(hit[0], streams):
+                _cache.move_to_end(run_id)
+                return hit[1]
+    data = build_chart_data(streams)
+    if run_id is not None:
+        with _cache_lock:
+            _cache[run_id] = (_refs(streams), data)
+            while len(_cache) > Config.CHART_CACHE_RUNS:
+                _cache.popitem(last=False)
+    return data
@@ -1,15 +1,21 @@
 import streamlit as st
 import pandas as pd
+from services.resilience import get_metrics, reset_metrics
+from services.stream_cache import get_stream_cache
+from services.profiler import HISTORY_KEY, IO_CATEGORIES, summarize
 
 def render_dev_console():
     st.title("🛠 Developer Console")
     st.caption("Internal diagnostics — SCORE Lab")
 
-    tab1, tab2, tab3, tab4 = st.tabs([
+    tab1, tab2, tab3, tab4, tab5, tab6, tab7 = st.tabs([
         "📥 Import",
         "🧮 Formula",
         "❤️ Drift",
-        "🚦 Rate Limit"
+        "🚦 Rate Limit",
+        "🔁 Retry",
+        "🗄 Cache",
+        "⏱ Render"
     ])
 
     with tab1:
@@ -27,7 +33,71 @@ def render_dev_console():
 
     with tab4:
         st.subheader("Rate Limit")
-        st.json(st.session_state.get("rate_limit_headers", {}))
+        st.json(st.session_state.get("dev_rate_limits", {}))
+
+    with tab5:
+        st.subheader("Retry & Circuit Breaker")
+        metrics = get_metrics()
+        if metrics:
+            df = pd.DataFrame.from_dict(metrics, orient="index").fillna(0)
+            st.dataframe(df, use_container_width=True)
+            st.caption("wait_s = secondi spesi in attesa tra un tentativo e l'altro (processo corrente)")
+        else:
+            st.info("Nessuna richiesta HTTP registrata.")
+        if st.button("Azzera metriche"):
+            reset_metrics()
+            st.rerun()
+
+    with tab6:
+        st.subheader("Stream Cache (processo)")
+        cache = get_stream_cache()
+        stats = cache.stats()
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("Corse", stats["runs"])
+        c2.metric("Memoria", f"{stats['bytes'] / 1024 / 1024:.1f} / {stats['max_bytes'] / 1024 / 1024:.0f} MB")
+        c3.metric("Hit rate", f"{stats['hit_rate'] * 100:.0f}%", f"{stats['hits']} hit / {stats['misses']} miss", delta_color="off")
+        c4.metric("Eviction", stats["evictions"])
+        st.progress(min(stats["bytes"] / stats["max_bytes"], 1.0) if stats["max_bytes"] else 0.0)
+        st.caption("Array int16/float32 in sola lettura, condivisi da tutte le sessioni (STREAM_CACHE_MAX_MB)")
+        if st.button("Svuota cache stream"):
+            cache.invalidate()
+            cache.reset_stats()
+            st.rerun()
+
+    with tab7:
+        st.subheader("Render Profiler (sessione)")
+        history = st.session_state.get(HISTORY_KEY) or []
+        runs = [r for r in history if r["name"] == "dashboard"]
+        if not runs:
+            st.info("Nessun rerun della dashboard registrato in questa sessione.")
+        else:
+            last = runs[-1]
+            c1, c2, c3, c4 = st.columns(4)
+            c1.metric("Ultimo rerun", f"{last['total_ms']:.0f} ms")
+            c2.metric("DB", f"{last['db_ms']:.0f} ms")
+            c3.metric("HTTP", f"{last['http_ms']:.0f} ms")
+            c4.metric("Engine", f"{last['engine_ms']:.0f} ms")
+
+            st.markdown("##### Ultimo rerun per blocco")
+            blocks = pd.DataFrame.from_dict(last["blocks"], orient="index")
+            blocks["self_ms"] = blocks["ms"] - blocks[[f"{c}_ms" for c in IO_CATEGORIES]].sum(axis=1)
+            st.dataframe(blocks.sort_values("ms", ascending=False), use_container_width=True)
+            st.caption("ms = tempo del blocco (inclusivo), self_ms = al netto di DB/HTTP/engine (render, pandas, Altair)")
+
+            summary = summarize(history)
+            st.markdown(f"##### Percentili su {summary['runs']} rerun")
+            totals = {"rerun": summary["total"], **summary["io"]}
+            st.dataframe(pd.DataFrame.from_dict(totals, orient="index"), use_container_width=True)
+            st.dataframe(pd.DataFrame(summary["blocks"]).set_index("block"), use_container_width=True)
+            st.line_chart(pd.DataFrame([{c: r[c] for c in ("total_ms", "db_ms", "http_ms", "engine_ms")} for r in runs]))
+
+            fragments = summarize(history, "archive")
+            if fragments["runs"]:
+                st.caption(f"Archivio (fragment da solo): {fragments['runs']} rerun, "
+                           f"p50 {fragments['total']['p50']} ms, p95 {fragments['total']['p95']} ms")
+        if st.button("Azzera storia rerun"):
+            st.session_state.pop(HISTORY_KEY, None)
+            st.rerun()
 
     if st.button("⬅️ Torna alla app"):
         st.session_state.dev_mode = False
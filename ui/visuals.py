@@ -1,8 +1,9 @@
 import streamlit as st
-import pandas as pd
-import altair as alt
 from ui.style import SCORE_COLORS
 
+# pandas/altair (~0.6 s di import) si caricano nei singoli grafici:
+# i badge/cerchi HTML e la landing non li pagano
+
 # --- HELPER COMPONENTS ---
 
 def get_coach_feedback(trend_direction):
@@ -149,6 +150,7 @@ def _apply_chart_style(chart):
     )
 
 def render_benchmark_chart(df):
+    import altair as alt
     st.markdown("##### 📊 Distribuzione Punteggi")
     if df.empty:
         st.info("Dati insufficienti.")
@@ -166,6 +168,8 @@ def render_benchmark_chart(df):
     st.altair_chart(_apply_chart_style(chart), use_container_width=True)
 
 def render_zones_chart(zones):
+    import pandas as pd
+    import altair as alt
     st.markdown("##### ⚡ Zone Potenza")
     if not zones:
         st.info("Dati di potenza non disponibili.")
@@ -188,32 +192,66 @@ def render_zones_chart(zones):
 
     st.altair_chart(_apply_chart_style(chart), use_container_width=True)
 
-def render_scatter_chart(watts, hr):
+def render_scatter_chart(watts, hr, run_id=None):
+    """Densità Power vs HR su griglia fissa (ui/chart_data.py), non i singoli campioni."""
+    import pandas as pd
+    import altair as alt
+    from ui.chart_data import stream_chart_data
     st.markdown("##### ❤️ Power vs HR")
-    if not watts or not hr:
+    data = stream_chart_data(run_id, {"watts": watts, "hr": hr})
+    if data["density"] is None or not len(data["density"]["count"]):
         st.info("Stream dati mancanti.")
         return
 
-    df = pd.DataFrame({'Watts': watts[::10], 'HR': hr[::10]}) # Sampled
+    df = pd.DataFrame(data["density"]).rename(columns={"count": "Secondi"})
     
-    chart = alt.Chart(df).mark_circle(size=60, opacity=0.4).encode(
-        x=alt.X('Watts', title='Power (W)'),
-        y=alt.Y('HR', title='Heart Rate (bpm)', scale=alt.Scale(zero=False)),
-        color=alt.value(SCORE_COLORS['neutral']),
-        tooltip=['Watts', 'HR']
-    ).interactive().properties(
+    chart = alt.Chart(df).mark_rect().encode(
+        x=alt.X('w0:Q', title='Power (W)'),
+        x2='w1:Q',
+        y=alt.Y('h0:Q', title='Heart Rate (bpm)', scale=alt.Scale(zero=False)),
+        y2='h1:Q',
+        color=alt.Color('Secondi:Q', scale=alt.Scale(range=[SCORE_COLORS['ok'], SCORE_COLORS['bad']]), legend=None),
+        tooltip=[alt.Tooltip('w0:Q', title='W da', format='.0f'), alt.Tooltip('h0:Q', title='bpm da', format='.0f'), 'Secondi:Q']
+    ).properties(
         height=300,
         background='rgba(0,0,0,0)'
     )
     
     st.altair_chart(_apply_chart_style(chart), use_container_width=True)
 
+def render_stream_chart(watts, hr, run_id=None):
+    """Watt e HR nel tempo, ridotti con LTTB a un numero fisso di punti."""
+    import pandas as pd
+    import altair as alt
+    from ui.chart_data import stream_chart_data
+    data = stream_chart_data(run_id, {"watts": watts, "hr": hr})
+    parts = [
+        pd.DataFrame({"Minuto": sec / 60, "Valore": vals, "Serie": label})
+        for key, label in (("watts", "Power (W)"), ("hr", "HR (bpm)")) if data[key] is not None
+        for sec, vals in [data[key]]
+    ]
+    if not parts:
+        return
+
+    chart = alt.Chart(pd.concat(parts, ignore_index=True)).mark_line(strokeWidth=1.5).encode(
+        x=alt.X('Minuto:Q', title='Minuti'),
+        y=alt.Y('Valore:Q', title=None, scale=alt.Scale(zero=False)),
+        color=alt.Color('Serie:N', scale=alt.Scale(range=[SCORE_COLORS['neutral'], SCORE_COLORS['bad']]), legend=alt.Legend(orient='bottom', title=None)),
+        tooltip=['Serie', alt.Tooltip('Minuto:Q', format='.1f'), alt.Tooltip('Valore:Q', format='.0f')]
+    ).properties(
+        height=160,
+        background='rgba(0,0,0,0)'
+    )
+
+    st.altair_chart(_apply_chart_style(chart), use_container_width=True)
+
 def render_history_table(df):
+    import pandas as pd
     if df.empty:
         st.text("Nessun dato.")
         return
 
-    cols_to_show = ['Data', 'Dist (km)', 'Power', 'HR', 'SCORE', 'Rank']
+    cols_to_show = ['Data', 'Dist (km)', 'Power', 'HR', 'SCORE', 'Rank', 'Streams']
     available_cols = [c for c in cols_to_show if c in df.columns]
     
     display_df = df[available_cols].copy()
@@ -226,11 +264,14 @@ def render_history_table(df):
         column_config={
             "SCORE": st.column_config.NumberColumn("Score", format="%.2f"),
             "Power": st.column_config.NumberColumn("Watt", format="%d w"),
-             "HR": st.column_config.NumberColumn("FC", format="%d bpm")
+             "HR": st.column_config.NumberColumn("FC", format="%d bpm"),
+            "Streams": st.column_config.TextColumn("Stream", help="pending = in coda per il prossimo budget API, unavailable = nessun sensore")
         }
     )
 
 def render_trend_chart(df):
+    import pandas as pd
+    import altair as alt
     st.markdown("##### 📈 Smart Trend")
     if df.empty:
         st.info("Nessun dato SCORE disponibile.")
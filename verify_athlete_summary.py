@@ -0,0 +1,97 @@
+"""
+Verifica del riepilogo incrementale di athlete_summary (services/athlete_summary.py).
+
+Uso:
+    python verify_athlete_summary.py [--sequences N] [--ops N] [--seed S]
+
+Applica sequenze casuali di scritture su runs (inserimenti, cancellazioni,
+cambi di punteggio/distanza e di data) con fold_run, come fa il trigger, e dopo
+ogni scrittura confronta il riepilogo con rebuild_summary sull'intero storico.
+Fallisce (exit 1) alla prima sequenza che diverge.
+"""
+import random
+import argparse
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+from services.athlete_summary import RECENT_WINDOW, fold_run, rebuild_summary
+
+ATHLETE_ID = 1
+# Campi confrontati (updated_at cambia a ogni scrittura)
+FIELDS = ("total_runs", "total_km", "best_score", "best_run_id", "last_run_id", "last_run_date",
+          "last_score", "ma_7", "ma_28", "ma7_delta", "streak", "recent")
+
+
+# Punteggi continui: a pari punteggio la corsa migliore non è determinata (neanche su Postgres)
+def _run(rng: random.Random, run_id: int, start: date) -> Dict[str, Any]:
+    return {
+        "id": run_id,
+        "athlete_id": ATHLETE_ID,
+        "date": (start + timedelta(days=rng.randint(0, 90))).isoformat(),
+        "score": rng.choice([None, rng.uniform(20, 90)]),
+        "distance_km": round(rng.uniform(2, 25), 2)
+    }
+
+
+def _reload(runs: Dict[int, Dict[str, Any]]):
+    ordered = sorted(runs.values(), key=lambda r: (r["date"], r["id"]), reverse=True)
+    scored = [r for r in ordered if r.get("score") is not None]
+    return ordered[:RECENT_WINDOW], (max(scored, key=lambda r: r["score"]) if scored else None)
+
+
+def _diff(a: Dict[str, Any], b: Dict[str, Any]) -> List[str]:
+    return [f for f in FIELDS if a.get(f) != b.get(f)]
+
+
+def check_sequence(seed: int, n_ops: int) -> Optional[str]:
+    """None se fold_run e rebuild_summary coincidono dopo ogni scrittura, altrimenti la divergenza."""
+    rng = random.Random(seed)
+    start = date(2024, 1, 1)
+    runs: Dict[int, Dict[str, Any]] = {}
+    summary = None
+    next_id = 1
+    for step in range(n_ops):
+        op = rng.choice(["insert", "insert", "delete", "rescore", "redate"]) if runs else "insert"
+        old: Optional[Dict[str, Any]] = None
+        new: Optional[Dict[str, Any]] = None
+        if op == "insert":
+            new = _run(rng, next_id, start)
+            next_id += 1
+        else:
+            old = runs[rng.choice(sorted(runs))]
+            if op == "rescore":
+                new = dict(old, score=rng.choice([None, rng.uniform(20, 90)]),
+                           distance_km=round(rng.uniform(2, 25), 2))
+            elif op == "redate":
+                new = dict(old, date=(start + timedelta(days=rng.randint(0, 90))).isoformat())
+
+        if old:
+            del runs[old["id"]]
+        if new:
+            runs[new["id"]] = new
+        summary = fold_run(summary, ATHLETE_ID, old, new, lambda a: _reload(runs))
+
+        expected = rebuild_summary(ATHLETE_ID, list(runs.values()))
+        bad = _diff(summary, expected)
+        if bad:
+            return f"seed {seed}, scrittura {step + 1} ({op}): {', '.join(bad)}"
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check fold_run against rebuild_summary")
+    parser.add_argument("--sequences", type=int, default=200, help="sequenze casuali")
+    parser.add_argument("--ops", type=int, default=120, help="scritture per sequenza")
+    parser.add_argument("--seed", type=int, default=0, help="seed della prima sequenza")
+    args = parser.parse_args()
+
+    for seed in range(args.seed, args.seed + args.sequences):
+        error = check_sequence(seed, args.ops)
+        if error:
+            print(f"❌ fold_run diverge da rebuild_summary: {error}")
+            exit(1)
+    print(f"✅ {args.sequences} sequenze da {args.ops} scritture: fold_run coincide con rebuild_summary")
+
+
+if __name__ == "__main__":
+    main()
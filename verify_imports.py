@@ -1,34 +1,38 @@
-try:
-    print("--- 1. Base Modules ---")
-    from config import Config
-    print("✅ Config imported")
-    Config.setup_logging()
-    
-    from engine.core import ScoreEngine, RunMetrics
-    print("✅ ScoreEngine imported")
-    
-    from services.api import StravaService, WeatherService
-    print("✅ Services API imported")
-    
-    from services.db import DatabaseService
-    print("✅ DatabaseService imported")
+# Moduli dell'app per gruppo (usati anche da benchmarks/startup_benchmark.py)
+MODULES = [
+    ("1. Base Modules", "config", ["Config"]),
+    ("1. Base Modules", "engine.core", ["ScoreEngine", "RunMetrics"]),
+    ("1. Base Modules", "services.api", ["StravaService", "WeatherService"]),
+    ("1. Base Modules", "services.db", ["DatabaseService"]),
+    ("2. Controllers", "controllers.sync_controller", ["SyncController"]),
+    ("3. Components", "components.header", ["render_header"]),
+    ("3. Components", "components.athlete", ["render_top_section"]),
+    ("3. Components", "components.kpi", ["render_kpi_grid"]),
+    ("4. Views", "views.landing", ["render_landing"]),
+    ("4. Views", "views.dashboard", ["render_dashboard"]),
+]
 
-    print("\n--- 2. Controllers ---")
-    from controllers.sync_controller import SyncController
-    print("✅ SyncController imported")
 
-    print("\n--- 3. Components ---")
-    from components.header import render_header
-    from components.athlete import render_top_section
-    from components.kpi import render_kpi_grid
-    print("✅ UI Components imported")
+def main():
+    import importlib
+    try:
+        group = None
+        for g, module, names in MODULES:
+            if g != group:
+                print(f"\n--- {g} ---")
+                group = g
+            mod = importlib.import_module(module)
+            for name in names:
+                getattr(mod, name)
+            print(f"✅ {module} imported ({', '.join(names)})")
+            if module == "config":
+                mod.Config.setup_logging()
 
-    print("\n--- 4. Views ---")
-    from views.landing import render_landing
-    from views.dashboard import render_dashboard
-    print("✅ Views imported")
-    
-    print("\n🎉 All modules imported successfully.")
-except Exception as e:
-    print(f"\n❌ Import Error: {e}")
-    exit(1)
+        print("\n🎉 All modules imported successfully.")
+    except Exception as e:
+        print(f"\n❌ Import Error: {e}")
+        exit(1)
+
+
+if __name__ == "__main__":
+    main()
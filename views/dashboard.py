@@ -3,22 +3,168 @@ import pandas as pd
 import time
 from datetime import datetime, timedelta
 from config import Config
-from engine.core import ScoreEngine, RunMetrics
+from engine.core import RunMetrics
 from ui.legal import render_legal_section
-from ui.visuals import render_history_table, render_trend_chart, render_scatter_chart, render_zones_chart, render_quality_badge, render_trend_card, get_coach_feedback, quality_circle, trend_circle, comparison_circle
+from ui.visuals import render_history_table, render_trend_chart, render_scatter_chart, render_stream_chart, render_zones_chart, render_quality_badge, render_trend_card, get_coach_feedback, quality_circle, trend_circle, comparison_circle
 from ui.feedback import render_feedback_form
+from services.sync_worker import get_sync_worker
+from services.registry import get_registry
+from views.dashboard_model import get_dashboard_model, bump_history_version
+from services.profiler import profile_rerun, block
 
 # Components
 from components.header import render_header
 from components.athlete import render_top_section
 from components.kpi import render_kpi_grid
 
+@st.fragment(run_every=Config.SYNC_POLL_SECONDS)
+def render_sync_progress(worker, athlete_id, db_svc):
+    """Polling del job in background: ridisegna solo questo blocco finché il job gira."""
+    job = worker.status(athlete_id)
+    if not job or job["job_key"] != st.session_state.get("sync_job_key"):
+        return
+
+    status = job["status"]
+    if status in ("queued", "planning"):
+        st.info(f"⏳ Sync Strava in preparazione (Engine {Config.ENGINE_VERSION})...")
+    elif status == "running":
+        p = job["progress"]
+        total = max(p.get("total", 0), 1)
+        st.progress(p.get("written", 0) / total, text=f"Sync Strava: {p.get('written', 0)}/{p.get('total', 0)} corse salvate")
+    else:
+        st.session_state.sync_job_key = None
+        if status == "done":
+            res = job["result"] or {}
+            if res.get("new", 0) > 0 or res.get("retried", 0) > 0:
+                msg = f"✅ Sync completato: {res['new']} nuove corse, {res['updated']} aggiornate, {res['skipped']} già presenti"
+                if res.get("deferred"):
+                    msg += f" — {res['deferred']} stream in coda dalle {res['deferred_from']}"
+                if res.get("failed"):
+                    msg += f" — {res['failed']} non salvate, riprovate alla prossima sync"
+                st.session_state.sync_message = ("success", msg)
+                _load_first_page(db_svc, athlete_id)  # Refresh data
+            else:
+                st.session_state.sync_message = ("info", f"Database già aggiornato. {res.get('skipped', 0)} corse già presenti.")
+        else:
+            st.session_state.sync_message = ("error", f"❌ Sync fallita: {job['error']}")
+        st.rerun()
+
+def _load_first_page(db_svc, athlete_id):
+    """Prime Config.HISTORY_FIRST_PAGE corse: bastano per KPI, trend e medie mobili."""
+    rows, cursor = db_svc.get_history_page(athlete_id, Config.HISTORY_FIRST_PAGE)
+    st.session_state.data = rows
+    st.session_state.history_cursor = cursor
+    st.session_state.data_athlete_id = athlete_id
+    bump_history_version()
+
+def _history_needs_more(cutoff):
+    """C'è ancora storico da caricare e l'ultima corsa caricata è dentro il periodo mostrato."""
+    if not st.session_state.get("history_cursor"):
+        return False
+    oldest = pd.to_datetime(st.session_state.history_cursor[0], errors='coerce')
+    if pd.isna(oldest):
+        return True
+    if oldest.tzinfo is not None:
+        oldest = oldest.tz_localize(None)
+    return oldest > cutoff
+
+@st.fragment(run_every=Config.HISTORY_POLL_SECONDS)
+def render_history_backfill(db_svc, athlete_id, cutoff):
+    """Carica le pagine più vecchie (keyset) dopo il primo disegno; a fine caricamento ridisegna tutto."""
+    if not _history_needs_more(cutoff):
+        return
+    rows, cursor = db_svc.get_history_page(athlete_id, Config.HISTORY_PAGE_SIZE, st.session_state.history_cursor)
+    st.session_state.data = st.session_state.data + rows
+    st.session_state.history_cursor = cursor
+    bump_history_version()
+    if _history_needs_more(cutoff):
+        st.caption(f"⏳ Caricamento storico: {len(st.session_state.data)} corse...")
+    else:
+        st.rerun()
+
+ARCHIVE_SORTS = {"Data": "date", "Distanza": "distance_km", "SCORE": "score"}
+
+def _archive_go(delta):
+    state = st.session_state.archive_state
+    state["page"] = min(max(state["page"] + delta, 0), len(state["cursors"]) - 1)
+    state["rows"] = None
+
+@st.fragment
+def render_archive(db_svc, athlete_id, rank_labels):
+    """
+    Archivio paginato, filtrato e ordinato nel DB (get_archive_page): ogni pagina
+    costa Config.ARCHIVE_PAGE_SIZE righe lette dall'indice. Filtri e pagine
+    rieseguono solo questo fragment: lo storico della dashboard non si ricarica.
+    """
+    # Nel rerun completo è un blocco; da solo (filtri, pagine) è un rerun "archive"
+    with profile_rerun(st.session_state, "archive"):
+        _render_archive(db_svc, athlete_id, rank_labels)
+
+def _render_archive(db_svc, athlete_id, rank_labels):
+    f1, f2 = st.columns(2)
+    with f1:
+        band = st.selectbox("Distanza", ["Tutte"] + list(Config.ARCHIVE_DISTANCE_BANDS), key="archive_band")
+        ranks = st.multiselect("Rank", rank_labels, key="archive_ranks")
+        sort_label = st.selectbox("Ordina per", list(ARCHIVE_SORTS), key="archive_sort")
+    with f2:
+        period = st.date_input("Periodo", value=[], key="archive_period")
+        score_lo, score_hi = st.slider("SCORE", 0.0, 100.0, (0.0, 100.0), step=1.0, key="archive_score")
+        desc = st.toggle("Decrescente", value=True, key="archive_desc")
+
+    filters = {"ranks": ranks or None}
+    if band != "Tutte":
+        filters["dist_min"], filters["dist_max"] = Config.ARCHIVE_DISTANCE_BANDS[band]
+    if len(period) == 2:
+        filters["date_from"], filters["date_to"] = period[0].isoformat(), period[1].isoformat()
+    if (score_lo, score_hi) != (0.0, 100.0):
+        filters["score_min"], filters["score_max"] = score_lo, score_hi
+
+    # Nuovi filtri/ordinamento: si riparte dalla prima pagina e si ricontano le corse;
+    # storico cambiato (sync, reset): si rilegge la pagina corrente
+    key = (athlete_id, sorted(filters.items()), ARCHIVE_SORTS[sort_label], desc)
+    version = st.session_state.get("history_version", 0)
+    state = st.session_state.get("archive_state")
+    if not state or state["key"] != key:
+        state = {"key": key, "cursors": [None], "page": 0, "total": None, "rows": None, "version": version}
+        st.session_state.archive_state = state
+    if state["version"] != version:
+        state.update(total=None, rows=None, version=version)
+
+    if state["rows"] is None:
+        page = state["page"]
+        rows, next_cursor, total = db_svc.get_archive_page(
+            athlete_id, filters, ARCHIVE_SORTS[sort_label], desc,
+            cursor=state["cursors"][page], with_count=state["total"] is None
+        )
+        state["rows"] = rows
+        if total is not None:
+            state["total"] = total
+        # cursori[i] = inizio della pagina i (None = prima pagina)
+        del state["cursors"][page + 1:]
+        if next_cursor:
+            state["cursors"].append(next_cursor)
+
+    render_history_table(pd.DataFrame(state["rows"]))
+
+    pages = max(-(-(state["total"] or 0) // Config.ARCHIVE_PAGE_SIZE), 1)
+    n1, n2, n3 = st.columns([1, 3, 1])
+    n1.button("◀", key="archive_prev", disabled=state["page"] == 0, on_click=_archive_go, args=(-1,))
+    n2.caption(f"Pagina {state['page'] + 1} di {pages} · {state['total'] or 0} corse")
+    n3.button("▶", key="archive_next", disabled=state["page"] + 1 >= pages, on_click=_archive_go, args=(1,))
+
 def render_dashboard(auth_svc, db_svc):
+    # Tempi per blocco e DB/HTTP/engine di ogni rerun: Dev Console > Render
+    with profile_rerun(st.session_state):
+        _render_dashboard(auth_svc, db_svc)
+
+def _render_dashboard(auth_svc, db_svc):
     # 1. HEADER
-    render_header()
+    with block("render_header"):
+        render_header()
 
     # 2. TOP SECTION (Profile & Controls)
-    phys_params, start_sync, days_to_fetch = render_top_section(auth_svc, db_svc)
+    with block("render_top_section"):
+        phys_params, start_sync, days_to_fetch = render_top_section(auth_svc, db_svc)
     ftp = phys_params.get('ftp', Config.DEFAULT_FTP)
     
     # Context for later use
@@ -26,64 +172,71 @@ def render_dashboard(auth_svc, db_svc):
     athlete_name = f"{ath.get('firstname', 'Atleta')} {ath.get('lastname', '')}"
 
     # --- ENGINE (Sync Logic) ---
+    # La sync gira nel worker di processo: qui si accoda e si osserva
+    worker = get_sync_worker()
+    eng = get_registry().engine
+    athlete_id = ath.get("id")
+
+    # Storico solo dopo il login e solo per questo atleta (senza stream):
+    # prima pagina subito, le più vecchie in background (render_history_backfill)
+    if st.session_state.get("data_athlete_id") != athlete_id:
+        with block("load_first_page"):
+            _load_first_page(db_svc, athlete_id)
+
     if start_sync and not st.session_state.demo_mode:
         token = st.session_state.strava_token["access_token"]
-        athlete_id = ath.get("id")
-        
-        # Import the robust sync function
-        from services.strava_sync import safe_strava_sync
         
-        with st.spinner(f"Sync Strava sicuro (Engine {Config.ENGINE_VERSION})..."):
-            res = safe_strava_sync(
-                auth_svc,
-                db_svc,
-                ScoreEngine(),
-                token,
-                athlete_id,
-                phys_params.get('weight', Config.DEFAULT_WEIGHT),
-                phys_params.get('hr_max', Config.DEFAULT_HR_MAX),
-                phys_params.get('hr_rest', Config.DEFAULT_HR_REST),
-                phys_params.get('age', Config.DEFAULT_AGE),
-                phys_params.get('sex', 'M'),
-                days_to_fetch
-            )
-            
-            if res['new'] > 0:
-                st.success(f"✅ Sync completato: {res['new']} nuove corse, {res['updated']} aggiornate, {res['skipped']} già presenti")
-                time.sleep(1)
-                st.session_state.data = db_svc.get_history()  # Refresh data
-                st.rerun()
-            else:
-                st.info(f"Database già aggiornato. {res['skipped']} corse già presenti.")
+        # Import the robust sync job
+        from services.strava_sync import SyncJob
+
+        job = worker.submit(athlete_id, lambda: SyncJob(
+            auth_svc,
+            db_svc,
+            eng,
+            token,
+            athlete_id,
+            phys_params.get('weight', Config.DEFAULT_WEIGHT),
+            phys_params.get('hr_max', Config.DEFAULT_HR_MAX),
+            phys_params.get('hr_rest', Config.DEFAULT_HR_REST),
+            phys_params.get('age', Config.DEFAULT_AGE),
+            phys_params.get('sex', 'M'),
+            days_to_fetch
+        ))
+        st.session_state.sync_job_key = job["job_key"]
+
+    if "sync_message" in st.session_state:
+        kind, msg = st.session_state.pop("sync_message")
+        getattr(st, kind)(msg)
+
+    job = worker.status(athlete_id) if not st.session_state.demo_mode else None
+    if job and (job["status"] in ("queued", "planning", "running") or job["job_key"] == st.session_state.get("sync_job_key")):
+        st.session_state.sync_job_key = job["job_key"]
+        render_sync_progress(worker, athlete_id, db_svc)
 
     # --- VISUALIZZAZIONE DASHBOARD ---
+    cutoff = datetime.now() - timedelta(days=days_to_fetch)
+    if _history_needs_more(cutoff):
+        render_history_backfill(db_svc, athlete_id, cutoff)
+
     if st.session_state.data:
-        df = pd.DataFrame(st.session_state.data)
-        df['Data'] = pd.to_datetime(df['Data'], errors='coerce')
-        if pd.api.types.is_datetime64_any_dtype(df['Data']) and df['Data'].dt.tz is not None:
-             df['Data'] = df['Data'].dt.tz_localize(None)
-
-        df = df.sort_values("Data", ascending=True)
-        df["SCORE_MA_7"] = df["SCORE"].rolling(7, min_periods=1).mean()
-        df["SCORE_MA_28"] = df["SCORE"].rolling(28, min_periods=1).mean()
-        df = df.sort_values("Data", ascending=False)
-        
-        if 'days_to_fetch' in locals():
-            cutoff = datetime.now() - timedelta(days=days_to_fetch)
-            df = df[df['Data'] > cutoff]
-        
+        # Frame tipizzato, medie mobili, KPI e trend: ricostruiti solo se cambia lo storico o il periodo
+        with block("dashboard_model"):
+            model = get_dashboard_model(db_svc, athlete_id, days_to_fetch)
+        df, trend_df, stats = model.df, model.trend_df, model.stats
+
         if df.empty:
             st.warning("Nessuna corsa nel periodo selezionato.")
         else:
             cur_run = df.iloc[0]
-            cur_score, cur_ma7 = cur_run['SCORE'], cur_run['SCORE_MA_7']
-            delta_val = (cur_ma7 - df.iloc[1]['SCORE_MA_7']) if len(df) > 1 else 0
+            if stats:
+                delta_val = stats.get('ma7_delta') or 0
+            else:
+                delta_val = (cur_run['SCORE_MA_7'] - df.iloc[1]['SCORE_MA_7']) if len(df) > 1 else 0
             
             score_color = "#FFCF96" # Statico
             if delta_val > 0.005: score_color = "#CDFAD5" 
             elif delta_val < -0.005: score_color = "#FF8080" 
 
-            eng = ScoreEngine()
             
             # --- DEBUG TEMPORANEO ---
             if st.checkbox("Mostra Debug Engine", value=False):
@@ -92,7 +245,13 @@ def render_dashboard(auth_svc, db_svc):
             st.divider()
 
             # --- MIDDLE SECTION: METRICHE PRINCIPALI (KPI) ---
-            render_kpi_grid(cur_run, score_color)
+            with block("render_kpi_grid"):
+                render_kpi_grid(cur_run, score_color)
+            if stats.get('total_runs'):
+                st.caption(
+                    f"🏃 {stats['total_runs']} corse · {stats.get('total_km') or 0:.0f} km · "
+                    f"🏆 Best {stats.get('best_score') or 0:.2f} · 🔥 Streak {stats.get('streak') or 0}"
+                )
 
             # --- DEBUG LOGS FOR SCORE FORMULA ---
             with st.expander("⚙️ Score Process Logs (Debug Fomula)", expanded=False):
@@ -120,16 +279,20 @@ def render_dashboard(auth_svc, db_svc):
             cur_comparison = cur_run.get("Comparison", {})
             
             # Fallback
-            if not cur_quality or not cur_trend:
-                scores_hist = df['SCORE'].dropna().tolist()[::-1]
-                feedback = eng.gaming_feedback(scores_hist) if scores_hist else {}
-            else:
-                feedback = {
-                    "quality": {"label": cur_quality, "color": eng.run_quality(cur_run['SCORE'])['color']} if isinstance(cur_quality, str) else cur_quality,
-                    "achievements": cur_achievements,
-                    "trend": cur_trend,
-                    "comparison": cur_comparison
-                }
+            with block("gaming_feedback"):
+                if not cur_quality or not cur_trend:
+                    if stats.get('recent'):
+                        scores_hist = [e['score'] for e in stats['recent'][::-1] if e.get('score') is not None]
+                    else:
+                        scores_hist = df['SCORE'].dropna().tolist()[::-1]
+                    feedback = eng.gaming_feedback(scores_hist) if scores_hist else {}
+                else:
+                    feedback = {
+                        "quality": {"label": cur_quality, "color": eng.run_quality(cur_run['SCORE'])['color']} if isinstance(cur_quality, str) else cur_quality,
+                        "achievements": cur_achievements,
+                        "trend": cur_trend,
+                        "comparison": cur_comparison
+                    }
             
             if feedback:
                 st.markdown("### 🎮 Performance Feedback")
@@ -137,9 +300,10 @@ def render_dashboard(auth_svc, db_svc):
                 # Use Stat Circles Layout
                 st.markdown("<br>", unsafe_allow_html=True)
                 c1, c2, c3 = st.columns(3)
-                with c1: st.markdown(quality_circle(feedback.get("quality", {})), unsafe_allow_html=True)
-                with c2: st.markdown(trend_circle(feedback.get("trend", {})), unsafe_allow_html=True)
-                with c3: st.markdown(comparison_circle(feedback.get("comparison", {})), unsafe_allow_html=True)
+                with block("gaming_circles"):
+                    with c1: st.markdown(quality_circle(feedback.get("quality", {})), unsafe_allow_html=True)
+                    with c2: st.markdown(trend_circle(feedback.get("trend", {})), unsafe_allow_html=True)
+                    with c3: st.markdown(comparison_circle(feedback.get("comparison", {})), unsafe_allow_html=True)
                 st.markdown("<br>", unsafe_allow_html=True)
                 
                 # --- Original details/logs kept below ---
@@ -164,29 +328,39 @@ def render_dashboard(auth_svc, db_svc):
             
             with col_g1:
                 st.markdown("##### 📈 Trend SCORE")
-                if len(df) > 1:
-                    render_trend_chart(df.head(60))
+                with block("trend_chart"):
+                    if not trend_df.empty:
+                        if len(trend_df) > 1:
+                            render_trend_chart(trend_df)
+                    elif len(df) > 1:
+                        render_trend_chart(df.head(60))
             
             with col_g2:
                 st.markdown("##### 📍 Power vs HR")
-                opts = {r['id']: f"{r['Data'].strftime('%Y-%m-%d')} - {r['Dist (km)']}km" for i, r in df.iterrows()}
+                opts = model.run_options
                 sel = st.selectbox("Seleziona attività:", list(opts.keys()), format_func=lambda x: opts[x], key="sel_scatter")
                 run_scatter = df[df['id'] == sel].iloc[0].to_dict()
-                render_scatter_chart(run_scatter.get('raw_watts', []), run_scatter.get('raw_hr', []))
+                # Stream caricati solo per la corsa selezionata
+                with block("run_streams"):
+                    sel_streams = db_svc.get_run_streams(sel)
+                with block("scatter_chart"):
+                    render_scatter_chart(sel_streams['watts'], sel_streams['hr'], run_id=sel)
+                with block("stream_chart"):
+                    render_stream_chart(sel_streams['watts'], sel_streams['hr'], run_id=sel)
                 st.caption(f"Drift: {run_scatter['Decoupling']}%")
 
             with col_g3:
                 st.markdown("##### 📊 Zone Intensità")
-                run_zones = df[df['id'] == sel].iloc[0].to_dict() 
-                zones_c = ScoreEngine().calculate_zones(run_zones.get('raw_watts', []), ftp)
-                render_zones_chart(zones_c)
+                with block("zones_chart"):
+                    zones_c = eng.calculate_zones(sel_streams['watts'], ftp)
+                    render_zones_chart(zones_c)
             
             st.markdown("<br><br>", unsafe_allow_html=True)
             
             # --- SEZIONE DETTAGLI & ARCHIVIO ---
             c_break, c_arch = st.columns([1, 1], gap="large")
             with c_break:
-                with st.expander("🔬 Perché questo punteggio? (Breakdown)", expanded=False):
+                with st.expander("🔬 Perché questo punteggio? (Breakdown)", expanded=False), block("breakdown"):
                     details = cur_run.get("SCORE_DETAIL")
                     if not details or not isinstance(details, dict):
                          # Note: using 0 for optional params to metrics, just fallback
@@ -201,7 +375,7 @@ def render_dashboard(auth_svc, db_svc):
             
             with c_arch:
                 with st.expander("📂 Archivio Attività Completo", expanded=False):
-                    render_history_table(df)
+                    render_archive(db_svc, athlete_id, [eng.get_rank(s)[0] for s in (100, 85, 70, 50, 0)])
 
             st.divider()
 
@@ -216,6 +390,8 @@ def render_dashboard(auth_svc, db_svc):
                     if st.button("Reset Totale Database (Cancella e Ricarica)", type="primary"):
                         if db_svc.reset_history(ath.get("id")):
                              st.session_state.data = []
+                             st.session_state.history_cursor = None
+                             bump_history_version()
                              st.success("Database resettato. Ricarica la pagina per risincronizzare.")
                              time.sleep(2)
                              st.rerun()
@@ -0,0 +1,79 @@
+"""
+Dati derivati della dashboard, costruiti una volta per
+(atleta, versione dello storico, periodo, giorno) e tenuti in session_state.
+
+Prima ogni rerun (anche cambiare la corsa nel selectbox dello scatter)
+ricostruiva il DataFrame dallo storico, riparsava le date, ricalcolava le
+medie mobili, riordinava, filtrava e rifaceva le query di KPI e trend:
+con migliaia di corse era il grosso del tempo di rerun. Ora i rerun
+ridisegnano soltanto; il modello si ricostruisce quando lo storico cambia
+(prima pagina, pagine di backfill, sync, reset: bump_history_version) o
+quando cambia il periodo.
+
+Il modello è condiviso tra i rerun: il render non deve modificarne i DataFrame.
+"""
+import streamlit as st
+import pandas as pd
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Optional
+
+MODEL_KEY = "_dashboard_model"
+
+
+class DashboardModel:
+    def __init__(self, df: pd.DataFrame, trend_df: pd.DataFrame, stats: Dict[str, Any],
+                 run_options: Dict[Any, str], cutoff: datetime):
+        self.df = df                    # corse del periodo, dalla più recente, date naive
+        self.trend_df = trend_df        # ultime 60 corse con medie 7/28 (RPC), vuoto se manca
+        self.stats = stats              # athlete_summary o RPC v4_6
+        self.run_options = run_options  # id -> etichetta del selectbox
+        self.cutoff = cutoff
+
+
+def bump_history_version():
+    """Da chiamare ogni volta che st.session_state.data cambia."""
+    st.session_state.history_version = st.session_state.get("history_version", 0) + 1
+
+
+def get_dashboard_model(db_svc, athlete_id, days_to_fetch: int) -> DashboardModel:
+    key = (athlete_id, st.session_state.get("history_version", 0), days_to_fetch, date.today().isoformat())
+    cached = st.session_state.get(MODEL_KEY)
+    if cached and cached[0] == key:
+        return cached[1]
+    model = build_dashboard_model(st.session_state.data, db_svc, athlete_id, days_to_fetch)
+    st.session_state[MODEL_KEY] = (key, model)
+    return model
+
+
+def _naive_dates(col: pd.Series) -> pd.Series:
+    col = pd.to_datetime(col, errors='coerce')
+    if pd.api.types.is_datetime64_any_dtype(col) and col.dt.tz is not None:
+        col = col.dt.tz_localize(None)
+    return col
+
+
+def build_dashboard_model(rows, db_svc, athlete_id, days_to_fetch: int, now: Optional[datetime] = None) -> DashboardModel:
+    cutoff = (now or datetime.now()) - timedelta(days=days_to_fetch)
+    df = pd.DataFrame(rows)
+    df['Data'] = _naive_dates(df['Data'])
+
+    # KPI header: una lookup per PK su athlete_summary (mantenuta dal trigger v4_7);
+    # RPC v4_6 se la tabella manca, pandas solo se mancano anche le RPC
+    stats = db_svc.get_athlete_summary(athlete_id) or db_svc.get_dashboard_stats(athlete_id)
+    trend_df = pd.DataFrame(db_svc.get_score_trend(athlete_id, 60))
+    if not trend_df.empty:
+        trend_df['Data'] = _naive_dates(trend_df['Data'])
+        trend_df = trend_df[trend_df['Data'] > cutoff]
+
+    # Medie mobili sempre su df: il delta MA7 del header le usa quando stats manca,
+    # anche se il trend RPC ha risposto
+    df = df.sort_values("Data", ascending=True)
+    df["SCORE_MA_7"] = df["SCORE"].rolling(7, min_periods=1).mean()
+    df["SCORE_MA_28"] = df["SCORE"].rolling(28, min_periods=1).mean()
+
+    df = df.sort_values("Data", ascending=False)
+    df = df[df['Data'] > cutoff]
+
+    labels = df['Data'].dt.strftime('%Y-%m-%d') + " - " + df['Dist (km)'].astype(str) + "km"
+    run_options = dict(zip(df['id'].tolist(), labels.tolist()))
+    return DashboardModel(df, trend_df, stats, run_options, cutoff)